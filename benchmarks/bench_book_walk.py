@@ -0,0 +1,55 @@
+"""
+Benchmark do book walking (src/book_walk.py) sobre books sintéticos profundos
+
+    python benchmarks/bench_book_walk.py
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from book_walk import plan_order  # noqa: E402
+
+
+def synthetic_asks(levels, best=0.30, worst=0.99, seed=42):
+    """Asks crescentes de `best` a `worst`, com tamanhos aleatórios"""
+    rng = np.random.default_rng(seed)
+    prices = np.linspace(best, worst, levels)
+    sizes = rng.uniform(5, 500, size=levels).round(2)
+    return prices.tolist(), sizes.tolist()
+
+
+def naive_walk(prices, sizes, quantity):
+    """Referência em Python puro: percorre nível a nível"""
+    remaining, cost = quantity, 0.0
+    for price, size in zip(prices, sizes):
+        take = min(size, remaining)
+        cost += take * price
+        remaining -= take
+        if remaining <= 0:
+            break
+    return cost / (quantity - remaining)
+
+
+def main():
+    print(f"{'níveis':>8} {'qty':>10} {'plan_order (µs)':>16} {'loop puro (µs)':>15} {'VWAP':>8} {'filhas':>7}")
+    for levels in (10, 100, 1_000, 10_000, 100_000):
+        prices, sizes = synthetic_asks(levels)
+        # Pede ~metade da profundidade total: força atravessar muitos níveis
+        quantity = float(sum(sizes)) / 2
+        number = max(10, 20_000 // levels)
+
+        plan = plan_order('BUY', prices, sizes, quantity=quantity, max_children=10)
+        t_plan = timeit.timeit(lambda: plan_order('BUY', prices, sizes, quantity=quantity, max_children=10),
+                               number=number) / number
+        t_naive = timeit.timeit(lambda: naive_walk(prices, sizes, quantity), number=number) / number
+        print(f"{levels:>8} {quantity:>10.0f} {t_plan * 1e6:>16.1f} {t_naive * 1e6:>15.1f} "
+              f"{plan.vwap:>8.4f} {len(plan.children):>7}")
+
+
+if __name__ == "__main__":
+    main()
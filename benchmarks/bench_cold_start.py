@@ -0,0 +1,117 @@
+"""
+Benchmark de partida a frio do bot: tempo de import de src/bot.py e até a primeira
+resposta de /positions, cada execução num interpretador novo
+
+    python benchmarks/bench_cold_start.py --runs 10
+    python benchmarks/bench_cold_start.py --live --wallet 0x...   # Data API real
+    python benchmarks/bench_cold_start.py --max-import-ms 300    # falha (exit 1) se regredir
+
+Sem --live, /positions é servido por um servidor HTTP local, então o número medido é
+só o custo do bot (imports, sessão HTTP), sem a latência da rede.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Executado em cada interpretador novo: imprime os tempos (s) em JSON
+CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+import bot
+imported = time.perf_counter()
+positions = bot.get_positions(os.environ['BENCH_WALLET'])
+fetched = time.perf_counter()
+extra = time.perf_counter()
+if os.environ.get('BENCH_TRADING_STACK'):
+    import py_clob_client.client, order_batch, book_walk, balance_cache
+    extra = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'first_positions': fetched - started,
+    'positions': len(positions or []),
+    'trading_stack': extra - fetched,
+}))
+"""
+
+
+class PositionsHandler(BaseHTTPRequestHandler):
+    body = json.dumps([
+        {'asset': str(i), 'size': 10.0, 'title': f'Market {i}', 'outcome': 'Yes', 'avgPrice': 0.5,
+         'currentValue': 5.0, 'percentPnl': 0.0}
+        for i in range(50)
+    ]).encode()
+
+    def do_GET(self):
+        # Primeira página com posições, as seguintes vazias (fim da paginação)
+        body = self.body if 'offset=0' in self.path or 'offset' not in self.path else b'[]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_once(env, trading_stack):
+    child_env = dict(env)
+    if trading_stack:
+        child_env['BENCH_TRADING_STACK'] = '1'
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=SRC_DIR, env=child_env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summary(label, values_ms):
+    print(f"{label:<28} {statistics.median(values_ms):>9.1f} {min(values_ms):>9.1f} {max(values_ms):>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de partida a frio do bot")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--live', action='store_true', help="Usa a Data API real em vez do servidor local")
+    parser.add_argument('--wallet', default='0x0000000000000000000000000000000000000001')
+    parser.add_argument('--max-import-ms', type=float, help="Limite para a mediana do import (regressão = exit 1)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, BENCH_WALLET=args.wallet)
+    env.pop('PRIVATE_KEY', None)  # modo apenas monitoramento
+    env.pop('TARGET_WALLETS', None)
+
+    server = None
+    if not args.live:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), PositionsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        env['DATA_API_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        run_once(env, False)  # aquece o cache de bytecode e do sistema de arquivos
+        runs = [run_once(env, trading_stack=True) for _ in range(args.runs)]
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(f"{args.runs} execuções ({'Data API real' if args.live else 'servidor local'}), "
+          f"{runs[0]['positions']} posições")
+    print(f"{'etapa (ms)':<28} {'mediana':>9} {'mín':>9} {'máx':>9}")
+    import_ms = [r['import'] * 1000 for r in runs]
+    summary("import bot", import_ms)
+    summary("até 1ª resposta /positions", [r['first_positions'] * 1000 for r in runs])
+    summary("pilha de trading (lazy)", [r['trading_stack'] * 1000 for r in runs])
+
+    if args.max_import_ms is not None and statistics.median(import_ms) > args.max_import_ms:
+        print(f"❌ Regressão: import levou {statistics.median(import_ms):.1f}ms (limite {args.max_import_ms}ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
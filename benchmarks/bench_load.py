@@ -0,0 +1,172 @@
+"""
+Teste de carga de ponta a ponta: o bot em modo daemon contra o simulador local (src/sim_server.py)
+
+O simulador serve carteiras grandes que mudam a `--change-rate` por segundo; o bot roda
+num processo próprio, num diretório temporário, com chave privada descartável e todas as
+URLs apontando para o simulador (nada sai da máquina). Ao final:
+
+- ciclos por segundo (requisições da primeira página de /positions por carteira)
+- latência mudança→ordem: da publicação da mudança no simulador até a ordem chegar
+- latência detecção→ordem: da primeira resposta de /positions que mostrou a mudança até a ordem
+
+    python benchmarks/bench_load.py --wallets 2 --positions 10000 --duration 30
+    python benchmarks/bench_load.py --latency-ms 50 --error-rate 0.02 --change-rate 5
+"""
+
+import argparse
+import json
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from sim_server import SimMarket, SimServer  # noqa: E402
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def bot_env(url, wallets, workdir, args):
+    """Ambiente do processo do bot: tudo no simulador, estado no diretório temporário"""
+    env = dict(os.environ)
+    env.update({
+        'PRIVATE_KEY': '0x' + secrets.token_hex(32),  # descartável: as ordens só chegam ao simulador
+        'TARGET_WALLETS': ','.join(f"{wallet}:{args.amount}" for wallet in wallets),
+        'TARGET_WALLET': wallets[0],
+        'DATA_API_URL': url,
+        'CLOB_HOST': url,
+        'POLYGON_RPC_URL': url,
+        'TELEGRAM_API_URL': url,
+        'TELEGRAM_TOKEN': 'sim',
+        'TELEGRAM_CHAT_ID': '1',
+        'TELEGRAM_MIN_INTERVAL': '0',
+        'DRY_RUN': 'False',
+        'HTTP_RATE_LIMIT': str(args.rate_limit),
+        'HISTORY_DB': os.path.join(workdir, 'history.db'),
+        'CREDS_CACHE_FILE': os.path.join(workdir, '.clob_creds'),
+        'TELEGRAM_SPOOL_FILE': os.path.join(workdir, 'telegram_spool.json'),
+        'METRICS_PORT': '0',
+        'POLL_ADAPTIVE': str(args.adaptive),
+        'PYTHONUNBUFFERED': '1',
+    })
+    for name in ('WS_RECORD_FILE', 'SNAPSHOT_RECORD_FILE', 'DETECTION_MODE'):
+        env.pop(name, None)
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do bot contra o simulador local")
+    parser.add_argument('--wallets', type=int, default=2)
+    parser.add_argument('--positions', type=int, default=10000, help="Posições por carteira")
+    parser.add_argument('--change-rate', type=float, default=2.0, help="Mudanças por segundo nas carteiras")
+    parser.add_argument('--duration', type=float, default=30.0, help="Segundos de medição")
+    parser.add_argument('--interval', type=float, default=0.5, help="--interval do daemon (polling fixo)")
+    parser.add_argument('--adaptive', action='store_true', help="Polling adaptativo (POLL_MIN/MAX_INTERVAL) em vez de --interval")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Latência injetada por requisição")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fração de respostas 429/500 injetadas")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="HTTP_RATE_LIMIT do bot (0 = sem limite)")
+    parser.add_argument('--amount', type=float, default=2.0, help="USDC por compra copiada")
+    parser.add_argument('--log', help="Arquivo para a saída do bot (padrão: descartada)")
+    parser.add_argument('--json', action='store_true', help="Relatório em JSON")
+    args = parser.parse_args()
+
+    market = SimMarket(args.wallets, args.positions)
+    server = SimServer(market, latency_ms=args.latency_ms, error_rate=args.error_rate).start()
+    wallets = list(market.wallets)
+
+    with tempfile.TemporaryDirectory(prefix='bench_load_') as workdir:
+        # Estado inicial igual ao do simulador: o bot só copia o que mudar durante o teste
+        for wallet in wallets:
+            with open(os.path.join(workdir, f"last_positions_{wallet.lower()}.json"), 'w') as f:
+                json.dump(market.initial_state(wallet), f)
+
+        log = open(args.log, 'w') if args.log else subprocess.DEVNULL
+        bot = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, 'bot.py'), '--daemon',
+                                '--interval', str(args.interval)],
+                               cwd=workdir, env=bot_env(server.url, wallets, workdir, args),
+                               stdout=log, stderr=subprocess.STDOUT)
+        try:
+            # Espera o primeiro ciclo (imports, credenciais, pool de assinatura) e o prefetch
+            # de metadados de mercado (lotes de /books, só na inicialização) antes de medir
+            launched = time.monotonic()
+            deadline = launched + 60
+            while market.stats()['first_page_requests'] < len(wallets):
+                if bot.poll() is not None or time.monotonic() > deadline:
+                    raise SystemExit(f"❌ O bot não iniciou (exit {bot.returncode}); use --log para ver a saída")
+                time.sleep(0.1)
+            books_requests = -1
+            while books_requests != market.stats()['books_requests'] and time.monotonic() < deadline:
+                books_requests = market.stats()['books_requests']
+                time.sleep(1.0)
+            startup = time.monotonic() - launched
+
+            before = market.stats()
+            started = time.monotonic()
+            server.start_changes(args.change_rate)
+            time.sleep(args.duration)
+            server.stop_changes()
+            elapsed = time.monotonic() - started
+            time.sleep(max(2.0, args.interval * 2))  # ordens dos últimos ciclos
+            after = market.stats()
+        finally:
+            bot.send_signal(signal.SIGTERM)
+            try:
+                bot.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+            server.stop()
+            if args.log:
+                log.close()
+
+    cycles = (after['first_page_requests'] - before['first_page_requests']) / len(wallets)
+    published = [published for published, _ in after['order_latency']]
+    served = [served for _, served in after['order_latency'] if served is not None]
+    result = {
+        'wallets': args.wallets,
+        'positions_per_wallet': args.positions,
+        'startup_s': startup,
+        'duration_s': elapsed,
+        'cycles': cycles,
+        'cycles_per_second': cycles / elapsed,
+        'changes': after['changes'],
+        'changes_with_order': len(after['order_latency']),
+        'orders': after['orders'],
+        'order_requests': after['order_requests'],
+        'telegram_messages': after['telegram_messages'],
+        'injected_errors': after['injected_errors'],
+        'change_to_order_ms_p50': percentile(published, 0.5) * 1000,
+        'change_to_order_ms_p99': percentile(published, 0.99) * 1000,
+        'detection_to_order_ms_p50': percentile(served, 0.5) * 1000,
+        'detection_to_order_ms_p99': percentile(served, 0.99) * 1000,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"🧪 {args.wallets} carteira(s) x {args.positions} posições, {args.change_rate} mudança(s)/s, "
+          f"latência {args.latency_ms}ms, erros {args.error_rate:.0%}, {elapsed:.1f}s "
+          f"(inicialização: {startup:.1f}s)")
+    print(f"🔁 {cycles:.0f} ciclo(s): {result['cycles_per_second']:.2f} ciclos/s")
+    print(f"🔍 {result['changes']} mudança(s), {result['changes_with_order']} com ordem "
+          f"({result['orders']} ordem(ns) em {result['order_requests']} requisição(ões))")
+    print(f"{'latência (ms)':<22} {'p50':>9} {'p99':>9}")
+    print(f"{'mudança → ordem':<22} {result['change_to_order_ms_p50']:>9.1f} {result['change_to_order_ms_p99']:>9.1f}")
+    print(f"{'detecção → ordem':<22} {result['detection_to_order_ms_p50']:>9.1f} {result['detection_to_order_ms_p99']:>9.1f}")
+    print(f"📨 {result['telegram_messages']} mensagem(ns) no Telegram simulado, "
+          f"{result['injected_errors']} erro(s) injetado(s)")
+    if not result['changes_with_order'] and result['changes']:
+        print("⚠️ Nenhuma ordem recebida: confira a saída do bot com --log")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Detecção incremental via histórico de trades (/activity da Data API)
+
+Em vez de comparar dois snapshots completos de /positions, lê apenas os trades novos
+a partir de um cursor persistido (timestamp + hashes já vistos naquele segundo).
+Ciclos sem atividade custam uma requisição pequena, independente do tamanho do portfólio.
+"""
+
+import json
+import os
+
+import http_client
+from positions import Position
+from state_journal import atomic_write_json
+
+DATA_API_URL = "https://data-api.polymarket.com"  # padrão; o bot passa o DATA_API_URL configurado
+ACTIVITY_PAGE_SIZE = 100
+
+
+def load_cursor(path):
+    """Carrega o cursor {timestamp, hashes} (None se ainda não existir)"""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Erro ao carregar cursor de atividade: {e}")
+    return None
+
+
+def save_cursor(cursor, path):
+    """Salva o cursor de atividade (escrita atômica)"""
+    try:
+        atomic_write_json(path, cursor)
+    except Exception as e:
+        print(f"Erro ao salvar cursor de atividade: {e}")
+
+
+def _fetch_activity(base_url, wallet, **params):
+    params = {'user': wallet, 'type': 'TRADE', **params}
+    response = http_client.get(f"{base_url}/activity", params=params)
+    response.raise_for_status()
+    data = response.json()
+    return data if isinstance(data, list) else []
+
+
+def _trade_key(trade):
+    """Identifica um fill (uma transação pode conter vários)"""
+    return f"{trade.get('transactionHash')}:{trade.get('asset')}:{trade.get('side')}:{trade.get('size')}"
+
+
+def latest_cursor(wallet, base_url=DATA_API_URL):
+    """Cursor apontando para o trade mais recente (ponto de partida na primeira execução)"""
+    trades = _fetch_activity(base_url, wallet, limit=1, sortBy='TIMESTAMP', sortDirection='DESC')
+    if not trades:
+        return {'timestamp': 0, 'hashes': []}
+    return {'timestamp': int(trades[0].get('timestamp', 0)), 'hashes': [_trade_key(trades[0])]}
+
+
+def fetch_new_trades(wallet, cursor, base_url=DATA_API_URL):
+    """Busca os trades posteriores ao cursor, em ordem cronológica. Retorna (trades, novo_cursor)."""
+    start = int(cursor.get('timestamp', 0))
+    seen = set(cursor.get('hashes', []))
+    trades = []
+    offset = 0
+    while True:
+        page = _fetch_activity(base_url, wallet, start=start, limit=ACTIVITY_PAGE_SIZE, offset=offset,
+                               sortBy='TIMESTAMP', sortDirection='ASC')
+        for trade in page:
+            # Trades no segundo do cursor já processados voltam no `start`: ignora pela chave
+            key = _trade_key(trade)
+            if int(trade.get('timestamp', 0)) == start and key in seen:
+                continue
+            trades.append(trade)
+        if len(page) < ACTIVITY_PAGE_SIZE:
+            break
+        offset += ACTIVITY_PAGE_SIZE
+
+    if not trades:
+        return [], cursor
+
+    last_ts = int(trades[-1].get('timestamp', 0))
+    hashes = [_trade_key(t) for t in trades if int(t.get('timestamp', 0)) == last_ts]
+    if last_ts == start:
+        hashes += list(seen)
+    return trades, {'timestamp': last_ts, 'hashes': hashes}
+
+
+def coalesce_trades(trades):
+    """Junta fills consecutivos do mesmo asset e lado (uma ordem grande costuma vir em vários pedaços)"""
+    merged = []
+    for trade in trades:
+        asset = trade.get('asset')
+        side = (trade.get('side') or '').upper()
+        size = float(trade.get('size', 0))
+        price = float(trade.get('price', 0))
+        if merged and merged[-1]['asset'] == asset and merged[-1]['side'] == side:
+            last = merged[-1]
+            total = last['size'] + size
+            last['price'] = (last['price'] * last['size'] + price * size) / total if total else price
+            last['size'] = total
+            continue
+        merged.append({
+            'asset': asset,
+            'side': side,
+            'size': size,
+            'price': price,
+            'title': trade.get('title'),
+            'outcome': trade.get('outcome'),
+        })
+    return merged
+
+
+def trades_to_changes(trades, positions, dust=0.1):
+    """Aplica os fills ao estado {asset: Position} e gera eventos NEW/INCREASE/DECREASE/CLOSED.
+
+    `positions` é atualizado em memória (registros substituídos, nunca alterados).
+    Retorna lista de (tipo, asset, posição_para_alerta, diff).
+    """
+    events = []
+    for fill in coalesce_trades(trades):
+        asset = fill['asset']
+        if not asset or fill['size'] <= 0:
+            continue
+        last = positions.get(asset)
+        last_size = last.size if last else 0.0
+
+        if fill['side'] == 'BUY':
+            new_size = last_size + fill['size']
+            change_type = 'INCREASE' if last else 'NEW'
+            diff = fill['size']
+        elif fill['side'] == 'SELL':
+            if not last:
+                # Venda de algo que não conhecíamos: nada a copiar
+                continue
+            new_size = max(0.0, last_size - fill['size'])
+            change_type = 'CLOSED' if new_size <= dust else 'DECREASE'
+            diff = new_size - last_size if change_type == 'DECREASE' else -last_size
+        else:
+            continue
+
+        title = fill['title'] or (last.title if last else None) or 'Unknown'
+        outcome = fill['outcome'] or (last.outcome if last else None) or 'Unknown'
+        shown_size = 0.0 if change_type == 'CLOSED' else new_size
+        position = Position(asset, shown_size, title, outcome,
+                            avg_price=fill['price'], current_value=shown_size * fill['price'])
+        events.append((change_type, asset, position, diff))
+
+        if change_type == 'CLOSED':
+            positions.pop(asset, None)
+        else:
+            positions[asset] = Position(asset, new_size, title, outcome)
+    return events
@@ -0,0 +1,73 @@
+"""
+Cache local do saldo USDC
+
+Mantém o provider Web3 e o contrato durante todo o processo e só consulta a chain
+quando o valor expira (TTL) ou é invalidado após vendas/erros. Compras concorrentes
+reservam o valor localmente, então nunca comprometemos mais do que o saldo.
+"""
+
+import threading
+import time
+
+from web3 import Web3
+
+
+class BalanceCache:
+    def __init__(self, rpc_url, token_address, token_abi, owner, ttl=60, decimals=6):
+        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.contract = self.w3.eth.contract(address=token_address, abi=token_abi)
+        self.owner = owner
+        self.ttl = ttl
+        self.scale = 10 ** decimals
+
+        self._balance = 0.0
+        self._reserved = 0.0  # valor de ordens em preparação/envio ainda não confirmadas
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _refresh_locked(self):
+        """Lê o saldo da chain (chamar com o lock adquirido)"""
+        try:
+            balance_wei = self.contract.functions.balanceOf(self.owner).call()
+            self._balance = balance_wei / self.scale
+            self._fetched_at = time.monotonic()
+        except Exception as e:
+            print(f"Erro ao verificar saldo: {e}")
+            self._balance = 0.0
+            self._fetched_at = None  # tenta de novo na próxima consulta
+
+    def _ensure_fresh_locked(self):
+        if self._fetched_at is None or time.monotonic() - self._fetched_at > self.ttl:
+            self._refresh_locked()
+
+    def available(self):
+        """Saldo livre (saldo em cache menos reservas pendentes)"""
+        with self._lock:
+            self._ensure_fresh_locked()
+            return self._balance - self._reserved
+
+    def reserve(self, amount):
+        """Reserva `amount` USDC para uma compra. Retorna (ok, saldo_livre_antes_da_reserva)."""
+        with self._lock:
+            self._ensure_fresh_locked()
+            free = self._balance - self._reserved
+            if free < amount:
+                return False, free
+            self._reserved += amount
+            return True, free
+
+    def commit(self, amount):
+        """Ordem enviada: desconta o valor do saldo local e libera a reserva"""
+        with self._lock:
+            self._reserved = max(0.0, self._reserved - amount)
+            self._balance -= amount
+
+    def release(self, amount):
+        """Ordem não enviada: devolve a reserva"""
+        with self._lock:
+            self._reserved = max(0.0, self._reserved - amount)
+
+    def invalidate(self):
+        """Força nova leitura da chain na próxima consulta (após vendas ou erros)"""
+        with self._lock:
+            self._fetched_at = None
@@ -0,0 +1,136 @@
+"""
+Dimensionamento e preço de ordens percorrendo a profundidade do book
+
+Em vez de usar só o primeiro nível, calcula quanto é possível executar dentro de um
+limite de slippage, o preço médio ponderado (VWAP), o preço limite necessário e, quando
+a ordem atravessa vários níveis, divide em ordens filhas. Python puro: books do CLOB têm
+poucas centenas de níveis e o percurso para no último nível usado.
+"""
+
+import math
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FillPlan:
+    side: str
+    best_price: float
+    requested: float        # shares (ou USDC, se o pedido foi por valor)
+    filled_size: float = 0.0
+    vwap: float = 0.0
+    limit_price: float = 0.0
+    requested_notional: bool = False
+    children: list = field(default_factory=list)  # [(preço_limite, shares)]
+
+    @property
+    def slippage(self):
+        """Diferença relativa entre o VWAP e o melhor preço (positiva = pior para nós)"""
+        if not self.best_price or not self.vwap:
+            return 0.0
+        if self.side == 'BUY':
+            return self.vwap / self.best_price - 1
+        return 1 - self.vwap / self.best_price
+
+    @property
+    def unfilled(self):
+        """Parte do pedido sem liquidez dentro do limite de slippage (mesma unidade de `requested`)"""
+        done = self.vwap * self.filled_size if self.requested_notional else self.filled_size
+        return max(0.0, self.requested - done)
+
+    @property
+    def total_value(self):
+        return sum(price * size for price, size in self.children)
+
+    @property
+    def total_size(self):
+        return sum(size for _, size in self.children)
+
+
+def walk_book(prices, sizes, quantity=None, notional=None):
+    """Percorre os níveis (melhor primeiro) até `quantity` shares ou `notional` USDC.
+
+    Retorna (shares de cada nível até o último usado, índice do último nível usado).
+    """
+    by_value = notional is not None
+    target = notional if by_value else quantity
+    taken = []
+    done = 0.0
+    for price, size in zip(prices, sizes):
+        amount = price * size if by_value else size
+        if done + amount >= target:
+            remaining = target - done
+            taken.append(remaining / price if by_value else remaining)
+            break
+        taken.append(size)
+        done += amount
+    # Sem break: o book não tem profundidade suficiente e tudo é usado
+    return taken, len(taken) - 1
+
+
+def plan_order(side, prices, sizes, quantity=None, notional=None, max_slippage=None,
+               min_order_value=1.0, max_children=5):
+    """Monta o plano de execução para `side` contra os níveis do lado oposto (melhor primeiro).
+
+    - `quantity` (shares) ou `notional` (USDC) definem o tamanho desejado.
+    - `max_slippage` (fração) descarta níveis mais distantes do melhor preço que isso.
+    - Cada ordem filha tem valor >= `min_order_value`; no máximo `max_children` filhas
+      (o excedente vai para a última, com o preço limite do nível mais profundo).
+    Tamanhos são arredondados para 2 casas: para cima na compra, para baixo na venda.
+    """
+    side = side.upper()
+    requested = notional if notional is not None else quantity
+    if not len(prices):
+        return FillPlan(side, 0.0, requested, requested_notional=notional is not None)
+
+    best = float(prices[0])
+    plan = FillPlan(side, best, requested, requested_notional=notional is not None)
+
+    if max_slippage is not None:
+        bound = best * (1 + max_slippage) if side == 'BUY' else best * (1 - max_slippage)
+        # Níveis vêm ordenados: o corte é um prefixo
+        depth = 0
+        for price in prices:
+            if (price > bound) if side == 'BUY' else (price < bound):
+                break
+            depth += 1
+        prices, sizes = prices[:depth], sizes[:depth]
+
+    taken, last = walk_book(prices, sizes, quantity=quantity, notional=notional)
+    if last < 0:
+        return plan
+
+    level_prices = prices[:last + 1]
+    filled = float(sum(taken))
+    if filled <= 0:
+        return plan
+
+    plan.filled_size = filled
+    plan.vwap = float(sum(size * price for size, price in zip(taken, level_prices)) / filled)
+    plan.limit_price = float(level_prices[-1])
+
+    # Agrupa níveis em ordens filhas com valor mínimo (uma filha por nível sempre que possível).
+    # Só as primeiras `max_children - 1` filhas são montadas nível a nível; o resto vira a última.
+    rounding = math.ceil if side == 'BUY' else math.floor
+    children = []
+    pending = 0.0
+    level = 0
+    while level <= last and len(children) < max_children - 1:
+        price = float(level_prices[level])
+        pending += float(taken[level])
+        level += 1
+        if pending * price >= min_order_value - 1e-9:
+            children.append([price, pending])
+            pending = 0.0
+    pending += float(sum(taken[level:]))
+    if pending > 0:
+        if children and pending * plan.limit_price < min_order_value - 1e-9:
+            children[-1][1] += pending
+            children[-1][0] = plan.limit_price
+        else:
+            children.append([plan.limit_price, pending])
+
+    for price, size in children:
+        size = rounding(round(size * 100, 6)) / 100
+        if size > 0 and price * size >= min_order_value - 1e-9:
+            plan.children.append((price, size))
+    return plan
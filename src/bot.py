@@ -1,30 +1,112 @@
 import os
 import json
-import requests
+import math
+import signal
+import argparse
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
-from py_clob_client.client import ClobClient
-from py_clob_client.clob_types import OrderArgs
-from py_clob_client.constants import POLYGON
-from py_clob_client.exceptions import PolyApiException
 
-from web3 import Web3
+import http_client
+import activity_feed
+import metrics
+from executor import TradeExecutor
+from scheduler import AdaptiveSchedule, WalletScheduler, WalletTarget
+from orderbook_cache import OrderBookCache
+from state_journal import StateJournal, diff_states
+from positions import Position
+from history_store import HistoryStore
+from market_cache import MarketCache
+from notifier import TelegramNotifier
+from sizing import SIZING_MODES, size_changes
+
+# A pilha de trading (py_clob_client, web3, websockets) é importada só quando usada:
+# no modo apenas monitoramento (sem PRIVATE_KEY) ela nunca é carregada.
 
 # Load environment variables
 load_dotenv()
 
 # --- Configuration & Secrets ---
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")  # sobrescrito no simulador local
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+TELEGRAM_SPOOL_FILE = os.getenv("TELEGRAM_SPOOL_FILE", "telegram_spool.json")  # mensagens ainda não enviadas
+TELEGRAM_MIN_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1"))  # segundos entre mensagens no chat
+TELEGRAM_DRAIN_TIMEOUT = float(os.getenv("TELEGRAM_DRAIN_TIMEOUT", "30"))  # espera pelo envio ao encerrar
 TARGET_WALLET = os.getenv("TARGET_WALLET")
+TARGET_WALLETS = os.getenv("TARGET_WALLETS")  # várias carteiras: "0xabc:2.5,0xdef" (valor por trade opcional)
 
 # Trading Config
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
+CLOB_HOST = os.getenv("CLOB_HOST", "https://clob.polymarket.com")  # sobrescrito no simulador local
 POLYGON_RPC_URL = os.getenv("POLYGON_RPC_URL", "https://polygon-rpc.com")
-MAX_TRADE_AMOUNT = float(os.getenv("MAX_TRADE_AMOUNT", "10"))
+MAX_TRADE_AMOUNT = float(os.getenv("MAX_TRADE_AMOUNT", "10"))  # teto de USDC por compra copiada
 FIXED_TRADE_AMOUNT = float(os.getenv("FIXED_TRADE_AMOUNT", "1"))
+SIZING_MODE = os.getenv("SIZING_MODE", "fixed")  # "fixed", "position" ou "portfolio" (ver src/sizing.py)
+COPY_BANKROLL = float(os.getenv("COPY_BANKROLL", "0"))  # banca do modo portfolio em USDC (0 = saldo livre)
 DRY_RUN = os.getenv("DRY_RUN", "True").lower() == "true"
+BALANCE_TTL = float(os.getenv("BALANCE_TTL", "60"))  # segundos até reler o saldo USDC da chain
+ORDERBOOK_TTL = float(os.getenv("ORDERBOOK_TTL", "2"))  # segundos de validade de um book buscado via REST
+MAX_SLIPPAGE = float(os.getenv("MAX_SLIPPAGE", "0.05"))  # distância máxima do melhor preço (fração) ao percorrer o book
+MAX_CHILD_ORDERS = int(os.getenv("MAX_CHILD_ORDERS", "5"))  # ordens filhas por trade quando o book é raso
+BATCH_ORDERS = os.getenv("BATCH_ORDERS", "True").lower() == "true"  # envia as ordens do ciclo em lote
+ORDER_SIGN_WORKERS = int(os.getenv("ORDER_SIGN_WORKERS", str(os.cpu_count() or 1)))  # processos de assinatura
+CREDS_CACHE_FILE = os.getenv("CREDS_CACHE_FILE", ".clob_creds")  # credenciais de API derivadas (criptografadas)
+CREDS_CACHE_TTL = float(os.getenv("CREDS_CACHE_TTL", str(7 * 24 * 3600)))  # segundos até derivar novamente
+WARMUP_SIGNING = os.getenv("WARMUP_SIGNING", "True").lower() == "true"  # prepara a assinatura de ordens na inicialização
+
+# Daemon Config
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "2"))  # segundos entre ciclos no modo --daemon
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "8"))  # carteiras consultadas em paralelo
+DETECTION_MODE = os.getenv("DETECTION_MODE", "positions")  # "positions" (snapshot) ou "activity" (trades incrementais)
+POLL_ADAPTIVE = os.getenv("POLL_ADAPTIVE", "False").lower() == "true"  # intervalo por carteira conforme a atividade (substitui --interval e os intervalos do --push)
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "1"))  # intervalo logo após uma mudança
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "30"))  # teto do recuo em períodos sem mudança
+POLL_BACKOFF = float(os.getenv("POLL_BACKOFF", "1.5"))  # multiplicador do intervalo a cada consulta sem mudança
+POLL_REQUEST_BUDGET = float(os.getenv("POLL_REQUEST_BUDGET", "0"))  # requisições/s para polling (0 = 80% do HTTP_RATE_LIMIT)
+
+# Push Config (--push: WebSocket do CLOB)
+CLOB_WS_URL = os.getenv("CLOB_WS_URL", "wss://ws-subscriptions-clob.polymarket.com/ws/market")
+PUSH_FALLBACK_INTERVAL = float(os.getenv("PUSH_FALLBACK_INTERVAL", "30"))  # polling sem atividade no WebSocket
+PUSH_RECHECK_WINDOW = float(os.getenv("PUSH_RECHECK_WINDOW", "15"))  # segundos de polling rápido após uma negociação
+WS_RECORD_FILE = os.getenv("WS_RECORD_FILE")  # grava os frames recebidos (JSONL) para replay offline
+SNAPSHOT_RECORD_FILE = os.getenv("SNAPSHOT_RECORD_FILE")  # grava cada snapshot de /positions (JSONL) para src/replay.py
+
+# Data API Config
+DATA_API_URL = os.getenv("DATA_API_URL", "https://data-api.polymarket.com")  # sobrescrito em benchmarks/simulações
+POSITIONS_PAGE_SIZE = int(os.getenv("POSITIONS_PAGE_SIZE", "500"))  # posições por página em /positions
+POSITIONS_FETCH_CONCURRENCY = int(os.getenv("POSITIONS_FETCH_CONCURRENCY", "4"))  # páginas buscadas em paralelo
+
+# Detection Config
+VECTOR_DIFF_MIN_POSITIONS = int(os.getenv("VECTOR_DIFF_MIN_POSITIONS", "0"))  # posições (atual + anterior) para usar o diff numpy (0 = desligado)
+
+# State Config
+STATE_COMPACT_EVERY = int(os.getenv("STATE_COMPACT_EVERY", "100"))  # linhas do journal antes de reescrever o snapshot
+HISTORY_DB = os.getenv("HISTORY_DB", "history.db")  # histórico SQLite de posições, mudanças e ordens ("" desativa)
+MARKET_CACHE_FILE = os.getenv("MARKET_CACHE_FILE", "market_cache.json")  # metadados de mercado ("" = só em memória)
+MARKET_CACHE_TTL = float(os.getenv("MARKET_CACHE_TTL", str(6 * 3600)))  # segundos até reler o tick size de um asset
+MARKET_CACHE_SIZE = int(os.getenv("MARKET_CACHE_SIZE", "50000"))  # assets mantidos no cache (LRU)
+
+# Metrics Config
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # /metrics do Prometheus no modo daemon (0 desativa)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_SUMMARY_FILE = os.getenv("METRICS_SUMMARY_FILE", "metrics_summary.json")  # resumo da execução única ("" desativa)
+
+# Execution Config
+MAX_CONCURRENT_TRADES = int(os.getenv("MAX_CONCURRENT_TRADES", "4"))  # assets processados em paralelo por ciclo
+
+# HTTP Config (sessão compartilhada com keep-alive)
+HTTP_RATE_LIMIT = float(os.getenv("HTTP_RATE_LIMIT", "10"))  # requisições/segundo no processo (0 = sem limite)
+http_client.configure(
+    pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+    pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "20")),
+    timeout=float(os.getenv("HTTP_TIMEOUT", "30")),
+    max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+    backoff_factor=float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5")),
+    rate_limit=HTTP_RATE_LIMIT,
+)
 
 # USDC Config (Polygon)
 USDC_ADDRESS = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"
@@ -44,233 +126,531 @@ def init_clob_client():
         print("⚠️ PRIVATE_KEY não configurada. Modo apenas monitoramento.")
         return None
     
+    from py_clob_client.client import ClobClient
+    from py_clob_client.signer import Signer
+    from order_batch import WarmOrderBuilder
+
     try:
         # Deriva endereço da chave privada para garantir
-        w3 = Web3()
-        account = w3.eth.account.from_key(PRIVATE_KEY)
-        my_address = account.address
+        my_address = Signer(PRIVATE_KEY, 137).address()
         print(f"🔑 Inicializando para carteira: {my_address}")
 
         client = ClobClient(
-            host="https://clob.polymarket.com",
+            host=CLOB_HOST,
             key=PRIVATE_KEY,
             chain_id=137, # Polygon Mainnet
             signature_type=0, # EOA (MetaMask, chave privada direta)
             funder=my_address # Explicitamente define o funder
         )
-        # Tenta derivar credenciais (necessário para alguns endpoints)
-        try:
-            creds = client.create_or_derive_api_creds()
+        # Mesmo builder da biblioteca, mas com signer/domínio EIP-712 reaproveitados entre ordens
+        client.builder = WarmOrderBuilder(client.signer, sig_type=0, funder=my_address)
+        # Tick size, neg risk e fee rate do cache de mercados (rede só para assets desconhecidos)
+        get_market_cache().attach(client)
+        # Credenciais do cache não são verificadas na partida: se expiraram, o primeiro envio renova e repete
+        for name in ('post_order', 'post_orders', 'get_order'):
+            setattr(client, name, _retry_on_auth(client, getattr(client, name)))
+
+        # Credenciais do cache local; deriva (e verifica) só se ausentes ou expiradas
+        creds = get_creds_cache().load(my_address)
+        if creds is not None:
             client.set_api_creds(creds)
-            print("🔑 Credenciais de API derivadas e configuradas.")
-            
-            # Verifica se está funcionando
-            client.get_api_keys()
-            print("✅ Autenticação verificada com sucesso.")
-            
-        except Exception as e:
-            print(f"❌ ERRO CRÍTICO: Falha ao configurar credenciais de API: {e}")
-            return None
+            print("🔑 Credenciais de API carregadas do cache local.")
+        else:
+            try:
+                creds = client.create_or_derive_api_creds()
+                client.set_api_creds(creds)
+                print("🔑 Credenciais de API derivadas e configuradas.")
+                
+                # Verifica se está funcionando
+                client.get_api_keys()
+                print("✅ Autenticação verificada com sucesso.")
+                get_creds_cache().save(my_address, creds)
+                
+            except Exception as e:
+                print(f"❌ ERRO CRÍTICO: Falha ao configurar credenciais de API: {e}")
+                return None
+
+        if WARMUP_SIGNING and not DRY_RUN:
+            # A primeira ordem não paga a montagem do signer e do domínio EIP-712
+            client.builder.warm_up()
             
         return client
     except Exception as e:
         print(f"Erro ao inicializar ClobClient: {e}")
         return None
 
+# Cache das credenciais de API (arquivo criptografado com chave derivada da PRIVATE_KEY)
+_creds_cache = None
+
+def get_creds_cache():
+    global _creds_cache
+    if _creds_cache is None:
+        from creds_cache import CredsCache
+        _creds_cache = CredsCache(CREDS_CACHE_FILE, PRIVATE_KEY, ttl=CREDS_CACHE_TTL)
+    return _creds_cache
+
+_creds_lock = threading.Lock()
+
+def refresh_api_creds(client, error, stale=None):
+    """Erro de autenticação do CLOB: descarta o cache e deriva novas credenciais.
+
+    Retorna True se o cliente tem credenciais novas. Com `stale` (as credenciais usadas na
+    chamada que falhou), não deriva de novo se outra thread já as trocou.
+    """
+    from py_clob_client.exceptions import PolyApiException
+
+    if not isinstance(error, PolyApiException) or error.status_code not in (401, 403):
+        return False
+    with _creds_lock:
+        if stale is not None and client.creds is not stale:
+            return True
+        print("🔑 Erro de autenticação: renovando credenciais de API...")
+        metrics.inc('creds_refresh_total')
+        get_creds_cache().invalidate()
+        try:
+            creds = client.create_or_derive_api_creds()
+            client.set_api_creds(creds)
+            get_creds_cache().save(client.get_address(), creds)
+            return True
+        except Exception as e:
+            print(f"❌ Falha ao renovar credenciais de API: {e}")
+            return False
+
+def _retry_on_auth(client, call):
+    """Chamada autenticada do cliente repetida uma vez, com credenciais novas, após um 401/403.
+
+    Uma ordem recusada por autenticação não foi aceita pelo CLOB, então reenviá-la é seguro.
+    """
+    from py_clob_client.exceptions import PolyApiException
+
+    def wrapper(*args, **kwargs):
+        creds = client.creds
+        try:
+            return call(*args, **kwargs)
+        except PolyApiException as e:
+            if not refresh_api_creds(client, e, stale=creds):
+                raise
+            return call(*args, **kwargs)
+    return wrapper
+
+# Cache de saldo USDC (provider/contrato Web3 mantidos durante todo o processo)
+_balance_cache = None
+_balance_cache_lock = threading.Lock()
+
+def get_balance_cache(client):
+    """Retorna o cache de saldo da nossa carteira (criado na primeira compra)"""
+    global _balance_cache
+    if _balance_cache is None:
+        with _balance_cache_lock:
+            if _balance_cache is None:
+                from balance_cache import BalanceCache
+                _balance_cache = BalanceCache(POLYGON_RPC_URL, USDC_ADDRESS, USDC_ABI,
+                                              client.get_address(), ttl=BALANCE_TTL)
+    return _balance_cache
+
 def get_usdc_balance(client):
-    """Verifica saldo de USDC na carteira"""
-    try:
-        w3 = Web3(Web3.HTTPProvider(POLYGON_RPC_URL))
-        if not w3.is_connected():
-            print("⚠️ Não foi possível conectar ao RPC Polygon.")
-            return 0
-            
-        my_address = client.get_address()
-        contract = w3.eth.contract(address=USDC_ADDRESS, abi=USDC_ABI)
-        
-        # Balance vem em Wei (6 decimais para USDC)
-        balance_wei = contract.functions.balanceOf(my_address).call()
-        balance_usdc = balance_wei / 1_000_000 # USDC tem 6 casas decimais
-        
-        return balance_usdc
-    except Exception as e:
-        print(f"Erro ao verificar saldo: {e}")
-        return 0
+    """Verifica saldo livre de USDC na carteira (usa o cache local)"""
+    return get_balance_cache(client).available()
 
-def get_my_position_size(client, asset_id):
-    """Busca o tamanho da nossa posição para um asset específico"""
+def fetch_my_positions(client):
+    """Busca todas as nossas posições e indexa por asset ({asset_id: size}). None em caso de erro."""
     try:
         my_address = client.get_address()
-        url = "https://data-api.polymarket.com/positions"
+        url = f"{DATA_API_URL}/positions"
         params = {'user': my_address}
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
         
-        response = requests.get(url, params=params, headers=headers, timeout=30)
+        response = http_client.get(url, params=params)
         response.raise_for_status()
         
-        positions = response.json()
-        for pos in positions:
-            if pos.get('asset') == asset_id:
-                return float(pos.get('size', 0))
-        return 0
+        return {
+            pos['asset']: float(pos.get('size', 0))
+            for pos in response.json()
+            if pos.get('asset')
+        }
     except Exception as e:
         print(f"⚠️ Erro ao buscar posição própria: {e}")
-        return 0
+        return None
+
+class OwnPositions:
+    """Snapshot das nossas posições para um ciclo, carregado uma única vez (na primeira venda)"""
+
+    def __init__(self, client):
+        self.client = client
+        self._sizes = None
+        self._lock = threading.Lock()
+
+    def size(self, asset_id):
+        """Tamanho da nossa posição em `asset_id` (0 se não tivermos ou se a busca falhar)"""
+        with self._lock:
+            if self._sizes is None:
+                # Em caso de erro não guarda nada: a próxima venda tenta de novo
+                self._sizes = fetch_my_positions(self.client)
+                if self._sizes is None:
+                    return 0
+            return self._sizes.get(asset_id, 0)
 
-def execute_trade(client, asset_id, side, title, outcome=None):
-    """Executa uma ordem de compra/venda"""
+    def reduce(self, asset_id, sold_size):
+        """Atualiza o snapshot após uma venda enviada"""
+        with self._lock:
+            if self._sizes is not None and asset_id in self._sizes:
+                self._sizes[asset_id] = max(0.0, self._sizes[asset_id] - sold_size)
+
+def execute_trade(client, asset_id, side, title, outcome=None, own_positions=None, trade_amount=None,
+                  order_batch=None, change_id=None, sell_size=None):
+    """Executa uma ordem de compra/venda
+
+    `own_positions` é o snapshot das nossas posições no ciclo (evita baixar o portfólio a cada venda).
+    `trade_amount` é o valor da compra (padrão: FIXED_TRADE_AMOUNT, limitado a MAX_TRADE_AMOUNT).
+    `sell_size` é quanto vender, em shares (padrão: a posição inteira).
+    Com `order_batch`, as ordens são apenas enfileiradas e enviadas em lote ao final do ciclo.
+    `change_id` liga as ordens à mudança registrada no histórico.
+    """
     if not client:
         return
+    from py_clob_client.clob_types import OrderArgs
+    from py_clob_client.exceptions import PolyApiException
+    from book_walk import plan_order
+
+    trade_amount = min(trade_amount or FIXED_TRADE_AMOUNT, MAX_TRADE_AMOUNT)
+    if own_positions is None:
+        own_positions = OwnPositions(client)
         
+    reserved = 0  # USDC reservado no cache de saldo para esta compra
     try:
-        # 1. Busca Orderbook para pegar preço atual
-        # O lado oposto: Se quero COMPRAR (BUY), olho o preço de VENDA (ASK)
-        book_side = "sell" if side == "BUY" else "buy"
-        orderbook = client.get_order_book(asset_id)
-        
-        price = 0
-        if book_side == "sell" and orderbook.asks:
-            price = float(orderbook.asks[0].price) # Melhor preço de venda
-        elif book_side == "buy" and orderbook.bids:
-            price = float(orderbook.bids[0].price) # Melhor preço de compra
+        # 1. Pega a profundidade do book local (REST só em miss ou book expirado)
+        # O lado oposto: Se quero COMPRAR (BUY), olho os preços de VENDA (ASKS)
+        with metrics.span('get_order_book'):
+            prices, sizes = orderbook_cache.depth(client, asset_id, side)
             
-        if price <= 0:
-            print(f"❌ Preço inválido para {title}: {price}")
+        if not prices:
+            print(f"❌ Preço inválido para {title}: book vazio")
             return
 
-        import math
-        
-        # 2. Calcula tamanho da ordem (Shares)
+        # 2. Calcula tamanho e preço percorrendo o book (VWAP, limite de slippage, ordens filhas)
         if side.upper() == "BUY":
-            # COMPRA: Usa valor fixo
-            balance = get_usdc_balance(client)
-            print(f"💰 Saldo Atual: ${balance:.2f} USDC")
-            
-            if balance < FIXED_TRADE_AMOUNT:
-                print(f"⚠️ Saldo insuficiente! Necessário: ${FIXED_TRADE_AMOUNT}, Disponível: ${balance:.2f}")
-                send_telegram_message(f"⚠️ *FALHA NO COPY TRADE*\nSaldo insuficiente.\nNecessário: ${FIXED_TRADE_AMOUNT}\nDisponível: ${balance:.2f}")
-                return
-            
-            # Size = Valor Fixo / Preço
-            # Arredondamos para CIMA para garantir que o total seja >= $1.00 (mínimo da Polymarket)
-            size = FIXED_TRADE_AMOUNT / price
-            size = math.ceil(size * 100) / 100  # Arredonda para cima com 2 casas decimais
+            # COMPRA: Usa valor fixo (tamanhos arredondados para CIMA: total >= mínimo de $1.00)
+            with metrics.span('plan_order'):
+                plan = plan_order(side, prices, sizes, notional=trade_amount, max_slippage=MAX_SLIPPAGE,
+                                  max_children=MAX_CHILD_ORDERS)
             
         else:
-            # VENDA: Vende TUDO que temos dessa posição
-            my_size = get_my_position_size(client, asset_id)
+            # VENDA: `sell_size` shares (dimensionado pelo ciclo) ou TUDO que temos dessa posição
+            with metrics.span('own_positions'):
+                my_size = own_positions.size(asset_id)
             print(f"📊 Nossa posição atual: {my_size} shares")
             
             if my_size <= 0:
                 print(f"⚠️ Não temos posição para vender em '{title}'")
                 return
             
+            quantity = my_size if sell_size is None else min(sell_size, my_size)
             # Arredonda para baixo para não tentar vender mais do que temos
-            size = math.floor(my_size * 100) / 100
+            with metrics.span('plan_order'):
+                plan = plan_order(side, prices, sizes, quantity=math.floor(quantity * 100) / 100,
+                                  max_slippage=MAX_SLIPPAGE, max_children=MAX_CHILD_ORDERS)
         
-        if size <= 0:
-            print("❌ Tamanho da ordem calculado é 0.")
+        if not plan.children:
+            # Verifica valor mínimo ($1) dentro do limite de slippage
+            print(f"⚠️ Valor executável muito baixo em '{title}' dentro de {MAX_SLIPPAGE:.0%} de slippage (mínimo $1.00)")
             return
 
-        # Verifica valor mínimo ($1)
-        total_value = size * price
-        if total_value < 1.0:
-            print(f"⚠️ Valor total muito baixo: ${total_value:.2f} (mínimo $1.00)")
-            return
+        size = round(plan.total_size, 2)
+        total_value = plan.total_value
+        price = plan.limit_price
+        if plan.unfilled > 0:
+            print(f"⚠️ Book raso: {plan.unfilled:.2f} {'USDC' if side.upper() == 'BUY' else 'shares'} sem liquidez dentro do limite de slippage")
+
+        if side.upper() == "BUY":
+            # Reserva o valor no saldo local: compras simultâneas não comprometem o mesmo USDC
+            with metrics.span('get_usdc_balance'):
+                ok, balance = get_balance_cache(client).reserve(total_value)
+            print(f"💰 Saldo Disponível: ${balance:.2f} USDC")
+            
+            if not ok:
+                print(f"⚠️ Saldo insuficiente! Necessário: ${total_value:.2f}, Disponível: ${balance:.2f}")
+                metrics.inc('orders_total', side='BUY', result='insufficient_balance')
+                send_telegram_message(f"⚠️ *FALHA NO COPY TRADE*\nSaldo insuficiente.\nNecessário: ${total_value:.2f}\nDisponível: ${balance:.2f}")
+                return
+            reserved = total_value
 
         outcome_str = f" ({outcome})" if outcome else ""
         action_emoji = "🟢" if side.upper() == "BUY" else "🔴"
-        print(f"{action_emoji} Preparando Trade: {side} {size} shares de '{title}'{outcome_str} @ {price} (Total: ${total_value:.2f})")
+        print(f"{action_emoji} Preparando Trade: {side} {size} shares de '{title}'{outcome_str} @ {price} "
+              f"(VWAP: {plan.vwap:.4f}, slippage: {plan.slippage:.2%}, {len(plan.children)} ordem(ns), Total: ${total_value:.2f})")
         
+        history = get_history_store()
         if DRY_RUN:
             print("🚧 DRY RUN: Ordem não enviada.")
+            metrics.inc('orders_total', len(plan.children), side=side.upper(), result='dry_run')
+            if history is not None:
+                for child_price, child_size in plan.children:
+                    history.record_order(change_id, asset_id, side.upper(), child_price, child_size,
+                                         best_price=plan.best_price, plan_vwap=plan.vwap, status='dry_run')
             return
 
-        # 3. Envia Ordem
-        order_args = OrderArgs(
-            price=price,
-            size=size,
-            side=side.upper(),
-            token_id=asset_id
-        )
-        
-        resp = client.create_and_post_order(order_args)
-        print(f"✅ Ordem Enviada! ID: {resp.get('orderID')}")
-        
-        action_text = "COMPRA" if side.upper() == "BUY" else "VENDA"
-        send_telegram_message(f"🤖 *COPY TRADE - {action_text}*\n{side} {size} de {title}\nOutcome: {outcome or 'N/A'}\nPreço: {price}\nTotal: ${total_value:.2f}")
+        # 3. Envia Ordens (uma por faixa de preço do plano)
+        orders = [
+            OrderArgs(
+                price=child_price,
+                size=child_size,
+                side=side.upper(),
+                token_id=asset_id
+            )
+            for child_price, child_size in plan.children
+        ]
+        held = reserved  # reserva liquidada em settle (que pode rodar depois, no envio do lote)
+
+        def settle(results):
+            """Aplica o resultado do envio: saldo, snapshot de posições, book e alerta"""
+            posted_size = 0.0
+            posted_value = 0.0
+            errors = []
+            for (child_price, child_size), (resp, error) in zip(plan.children, results):
+                if history is not None:
+                    history.record_order(change_id, asset_id, side.upper(), child_price, child_size, resp, error,
+                                         best_price=plan.best_price, plan_vwap=plan.vwap)
+                if error is None:
+                    print(f"✅ Ordem Enviada! ID: {resp.get('orderID')} ({child_size} @ {child_price})")
+                    posted_size += child_size
+                    posted_value += child_price * child_size
+                    metrics.inc('orders_total', side=side.upper(), result='posted')
+                else:
+                    errors.append(error)
+                    metrics.inc('orders_total', side=side.upper(), result='error')
+
+            if side.upper() == "BUY":
+                # Desconta localmente: próximas compras do ciclo não precisam de RPC
+                get_balance_cache(client).commit(posted_value)
+                if held > posted_value:
+                    get_balance_cache(client).release(held - posted_value)
+            else:
+                own_positions.reduce(asset_id, posted_size)
+            orderbook_cache.invalidate(asset_id)
+
+            if (side.upper() == "SELL" and posted_size) or errors:
+                if _balance_cache is not None:
+                    # Venda executada libera USDC (ou erro deixou o saldo incerto): relê da chain na próxima compra
+                    _balance_cache.invalidate()
+
+            for error in errors:
+                if 'tick' in str(error).lower():
+                    # Tick size do mercado mudou (preço perto de 0 ou 1): relê na próxima ordem
+                    get_market_cache().invalidate(asset_id)
+                print(f"❌ Erro ao enviar ordem de '{title}': {error}")
+                send_telegram_message(f"❌ *ERRO NO COPY TRADE*\n{str(error)}")
+
+            if posted_size:
+                action_text = "COMPRA" if side.upper() == "BUY" else "VENDA"
+                send_telegram_message(f"🤖 *COPY TRADE - {action_text}*\n{side} {round(posted_size, 2)} de {title}\nOutcome: {outcome or 'N/A'}\nPreço: {price} (VWAP {plan.vwap:.4f})\nTotal: ${posted_value:.2f}")
+
+        if order_batch is not None:
+            # Envio em lote ao final do ciclo
+            order_batch.add(orders, settle)
+            reserved = 0
+            return
+
+        reserved = 0
+        results = []
+        for order_args in orders:
+            try:
+                with metrics.span('create_and_post_order'):
+                    results.append((client.create_and_post_order(order_args), None))
+            except Exception as e:
+                results.append((None, e))
+        settle(results)
         
     except PolyApiException as e:
+        # errors_total já contado pelo span da etapa que falhou
         if e.status_code == 404:
             print(f"⚠️ Orderbook não encontrado para {title} (Mercado fechado/resolvido?)")
         else:
             print(f"❌ Erro API Polymarket: {e}")
             send_telegram_message(f"❌ *ERRO API POLYMARKET*\n{str(e)}")
+            if _balance_cache is not None:
+                _balance_cache.invalidate()
             
     except Exception as e:
         print(f"❌ Erro ao executar trade: {e}")
         send_telegram_message(f"❌ *ERRO NO COPY TRADE*\n{str(e)}")
+        if _balance_cache is not None:
+            _balance_cache.invalidate()
+
+    finally:
+        # Ordem não enviada (dry run, erro): devolve a reserva
+        if reserved > 0:
+            get_balance_cache(client).release(reserved)
+
+# Pool de assinatura de ordens (processos só sobem no warm_up do modo daemon; sem ele, assina no processo atual)
+_signing_pool = None
+
+def get_signing_pool(client):
+    """Retorna o pool de assinatura da nossa carteira"""
+    global _signing_pool
+    if _signing_pool is None:
+        from order_batch import SigningPool
+        _signing_pool = SigningPool(PRIVATE_KEY, 137, 0, client.get_address(), workers=ORDER_SIGN_WORKERS)
+    return _signing_pool
 
-# Arquivo para salvar estado das posições
+# Cache de order books (alimentado pelo REST e, no modo --push, pelo WebSocket)
+orderbook_cache = OrderBookCache(ORDERBOOK_TTL)
+
+# Executor de copy trades e agendador de carteiras (compartilhados entre ciclos no modo daemon)
+trade_executor = TradeExecutor(MAX_CONCURRENT_TRADES)
+wallet_scheduler = WalletScheduler(POLL_CONCURRENCY)
+
+# Estado das posições de quando o bot seguia uma carteira só (hoje: last_positions_<carteira>.json)
 POSITIONS_FILE = 'last_positions.json'
+# Cursor do histórico de trades da mesma época (hoje: activity_cursor_<carteira>.json)
+ACTIVITY_CURSOR_FILE = 'activity_cursor.json'
+
+# Campos da Data API usados no diff, nos alertas e no trade (o resto é descartado na ingestão)
+def _fetch_positions_page(wallet, offset, limit):
+    """Busca uma página de posições (limit/offset)"""
+    params = {
+        'user': wallet,
+        'limit': limit,
+        'offset': offset
+    }
+    response = http_client.get(f"{DATA_API_URL}/positions", params=params)
+    response.raise_for_status()
+    data = response.json()
+    return data if isinstance(data, list) else []
+
+def iter_positions(wallet=None):
+    """Gera as posições da carteira página por página, já como registros Position.
+
+    A primeira página é buscada sozinha; se vier cheia, as seguintes são buscadas em lotes
+    de POSITIONS_FETCH_CONCURRENCY páginas em paralelo. Erros de rede são propagados.
+    """
+    wallet = wallet or TARGET_WALLET
+    limit = POSITIONS_PAGE_SIZE
+    seen = set()
 
-def get_positions():
-    """Busca posições atuais do usuário via Data API"""
+    def slim(page):
+        """Converte a página em Position (campos usados apenas); retorna as posições de assets novos"""
+        new_positions = []
+        for pos in page:
+            asset = pos.get('asset')
+            if asset and asset not in seen:
+                seen.add(asset)
+                new_positions.append(Position.from_api(pos))
+        return new_positions
+
+    first_page = _fetch_positions_page(wallet, 0, limit)
+    yield from slim(first_page)
+    if len(first_page) < limit:
+        return
+
+    offset = limit
+    with ThreadPoolExecutor(max_workers=POSITIONS_FETCH_CONCURRENCY) as pool:
+        while True:
+            offsets = [offset + i * limit for i in range(POSITIONS_FETCH_CONCURRENCY)]
+            futures = [pool.submit(_fetch_positions_page, wallet, o, limit) for o in offsets]
+            for future in futures:
+                page = future.result()
+                new_positions = slim(page)
+                yield from new_positions
+                # Página incompleta = fim da lista; página sem nada novo = API ignorando o offset
+                if len(page) < limit or not new_positions:
+                    return
+            offset = offsets[-1] + limit
+
+def get_positions(wallet=None):
+    """Busca posições atuais do usuário via Data API (todas as páginas)"""
     try:
-        url = "https://data-api.polymarket.com/positions"
-        
-        params = {
-            'user': TARGET_WALLET
-        }
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Retorna lista de posições
-        return data if isinstance(data, list) else []
-        
+        return list(iter_positions(wallet))
     except Exception as e:
         print(f"Erro ao buscar posições: {e}")
-        return []
+        return None
 
-def load_last_positions():
-    """Carrega últimas posições conhecidas (asset -> {size, title, outcome})"""
-    try:
-        if os.path.exists(POSITIONS_FILE):
-            with open(POSITIONS_FILE, 'r') as f:
-                data = json.load(f)
-                # Migração: Se for formato antigo (apenas size), converte
-                if data and isinstance(list(data.values())[0], (int, float)):
-                    print("📦 Migrando formato antigo de posições...")
-                    return {}  # Reseta para o novo formato
-                return data
-        return {}
-    except:
-        return {}
-
-def save_last_positions(positions_map):
-    """Salva estado atual das posições"""
+# Histórico SQLite (aberto no primeiro uso; None se desativado)
+_history_store = None
+_history_store_lock = threading.Lock()
+
+def get_history_store():
+    global _history_store
+    if _history_store is None and HISTORY_DB:
+        # Chamado pelas threads do executor: uma única conexão SQLite por processo
+        with _history_store_lock:
+            if _history_store is None:
+                _history_store = HistoryStore(HISTORY_DB)
+    return _history_store
+
+# Metadados de mercado (título, outcome, tick size, neg risk, fee rate), carregados no primeiro uso
+_market_cache = None
+_market_cache_lock = threading.Lock()
+
+def get_market_cache():
+    global _market_cache
+    if _market_cache is None:
+        with _market_cache_lock:
+            if _market_cache is None:
+                _market_cache = MarketCache(MARKET_CACHE_FILE or None, ttl=MARKET_CACHE_TTL,
+                                            max_entries=MARKET_CACHE_SIZE)
+    return _market_cache
+
+def warm_markets(clob_client, changes):
+    """Antes dos trades: metadados e books dos assets que serão operados, numa requisição em lote.
+
+    Assets novos (posição recém-aberta) ainda não passaram pelo prefetch; o lote de `/books`
+    traz tick size e neg risk e já alimenta o cache de books. O fee rate de um mercado novo
+    fica para a montagem da ordem, em paralelo nas threads do executor.
+    """
+    for change in changes:
+        get_market_cache().remember(change['asset'], change['title'], change['outcome'])
+    assets = list(dict.fromkeys(change['asset'] for change in changes
+                                if change.get('copy') is None or not change['copy'].skip))
+    if not assets or DRY_RUN:
+        return
+    books = get_market_cache().fetch(clob_client, assets)
+    for summary in books:
+        if orderbook_cache.get(summary.asset_id) is None:
+            orderbook_cache.put_snapshot(summary.asset_id, summary.bids, summary.asks)
+
+# Motor de diff vetorizado (numpy só é importado quando algum snapshot é grande)
+_diff_engine = None
+_diff_engine_lock = threading.Lock()
+
+def get_diff_engine():
+    global _diff_engine
+    if _diff_engine is None:
+        with _diff_engine_lock:
+            if _diff_engine is None:
+                from diff_engine import DiffEngine
+                _diff_engine = DiffEngine(dust=0.1)
+    return _diff_engine
+
+# Journals de estado por arquivo de posições (snapshot + deltas)
+_state_journals = {}
+
+def get_state_journal(path):
+    journal = _state_journals.get(path)
+    if journal is None:
+        journal = _state_journals[path] = StateJournal(path, compact_every=STATE_COMPACT_EVERY,
+                                                       encode=Position.to_state, decode=Position.from_state)
+    return journal
+
+def load_last_positions(path=POSITIONS_FILE):
+    """Carrega últimas posições conhecidas (asset -> Position com size, title, outcome)"""
+    return get_state_journal(path).load()
+
+def save_last_positions(positions_map, previous_map, path=POSITIONS_FILE):
+    """Registra no journal só o que mudou desde `previous_map` (nada é escrito se nada mudou)"""
     try:
-        with open(POSITIONS_FILE, 'w') as f:
-            json.dump(positions_map, f)
+        get_state_journal(path).save(positions_map, previous_map)
     except Exception as e:
         print(f"Erro ao salvar posições: {e}")
 
-def format_position_update(position, change_type, diff_size=0):
+def format_position_update(position, change_type, diff_size=0, wallet=None):
     """Formata alerta de mudança de posição"""
+    wallet = wallet or TARGET_WALLET
     try:
-        title = position.get('title', 'Unknown Market')
-        outcome = position.get('outcome', 'Unknown')
-        current_size = float(position.get('size', 0))
-        avg_price = float(position.get('avgPrice', 0))
-        current_value = float(position.get('currentValue', 0))
-        pnl = float(position.get('percentPnl', 0)) * 100
+        title = position.title
+        outcome = position.outcome
+        current_size = position.size
+        avg_price = position.avg_price
+        current_value = position.current_value
+        pnl = position.percent_pnl * 100
         
         # Emojis e Textos
         if change_type == 'NEW':
@@ -298,7 +678,7 @@ def format_position_update(position, change_type, diff_size=0):
         message = f"""
 {emoji} {header}
 
-👤 *Wallet:* {TARGET_WALLET[:6]}...
+👤 *Wallet:* {wallet[:6]}...
 🎯 *Market:* {title}
 💰 *Outcome:* {outcome} ({price_cents}¢)
 📝 *Action:* {action_text}
@@ -306,158 +686,588 @@ def format_position_update(position, change_type, diff_size=0):
 💵 *Current Value:* ${current_value:.2f}
 📈 *P/L:* {pnl:+.1f}%
 
-[Ver no Polymarket](https://polymarket.com/profile/{TARGET_WALLET})
+[Ver no Polymarket](https://polymarket.com/profile/{wallet})
 """
         return message
     except Exception as e:
         print(f"Erro ao formatar mensagem: {e}")
         return None
 
+# Fila do Telegram (envio em thread própria, um digest por ciclo)
+_notifier = None
+
+def get_notifier():
+    global _notifier
+    if _notifier is None:
+        _notifier = TelegramNotifier(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, spool_path=TELEGRAM_SPOOL_FILE,
+                                     min_interval=TELEGRAM_MIN_INTERVAL, api_url=TELEGRAM_API_URL)
+    return _notifier
+
 def send_telegram_message(message):
-    """Envia mensagem via Telegram"""
+    """Enfileira mensagem para o Telegram (enviada no digest do ciclo, sem bloquear o trading)"""
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
         print("Telegram credentials not set.")
         return False
+    get_notifier().enqueue(message)
+    return True
+
+def make_change(change_type, asset, position, diff, detected_at, target=None):
+    """Monta o evento de mudança consumido por handle_change"""
+    if position.title == 'Unknown' or position.outcome == 'Unknown':
+        # Trade sem título (activity) ou estado antigo: completa com o cache de mercados
+        position.title, position.outcome = get_market_cache().label(asset, position.title, position.outcome)
+    return {
+        'type': change_type,
+        'asset': asset,
+        'side': 'BUY' if change_type in ('NEW', 'INCREASE') else 'SELL',
+        'position': position,
+        'diff': diff,
+        'title': position.title,
+        'outcome': position.outcome,
+        'detected_at': detected_at,
+        'wallet': target.wallet if target else TARGET_WALLET,
+        'trade_amount': target.trade_amount if target else FIXED_TRADE_AMOUNT
+    }
+
+def diff_positions(current_positions_map, last_positions_map):
+    """Diferença entre dois estados em Python puro: ([(tipo, asset, diff)], [asset fechado])"""
+    changes = []
+    for asset, pos in current_positions_map.items():
+        last = last_positions_map.get(asset)
+        if last is None:
+            changes.append(('NEW', asset, 0))
+            continue
+        # Considera mudança apenas se for significativa (> 0.1 shares para evitar ruído de arredondamento)
+        diff = pos.size - last.size
+        if diff > 0.1:
+            changes.append(('INCREASE', asset, diff))
+        elif diff < -0.1:
+            changes.append(('DECREASE', asset, diff))
+    closed = [asset for asset in last_positions_map if asset not in current_positions_map]
+    return changes, closed
+
+def detect_changes(current_positions_map, last_positions_map, target=None, next_state=None):
+    """Compara os dois estados e retorna a lista de mudanças (NEW/INCREASE/DECREASE/CLOSED)
+
+    Com VECTOR_DIFF_MIN_POSITIONS, snapshots a partir desse tamanho usam o motor vetorizado
+    de diff_engine; `next_state` é o estado que substituirá `last_positions_map` no próximo
+    ciclo, e herda o snapshot em colunas já calculado.
+    """
+    detected_at = time.perf_counter()
+    if VECTOR_DIFF_MIN_POSITIONS and len(current_positions_map) + len(last_positions_map) >= VECTOR_DIFF_MIN_POSITIONS:
+        engine = get_diff_engine()
+        wallet = target.wallet if target else TARGET_WALLET
+        snapshot, diffs, closed = engine.diff(wallet, current_positions_map, last_positions_map)
+        if next_state is not None:
+            # Mesmo sem mudança acima do ruído o estado é substituído: o cache segue o próximo "anterior"
+            engine.remember(wallet, next_state, snapshot)
+    else:
+        diffs, closed = diff_positions(current_positions_map, last_positions_map)
+
+    changes = []
+    for change_type, asset, diff in diffs:
+        pos = current_positions_map[asset]
+        if change_type == 'NEW':
+            print(f"Nova posição encontrada: {pos.title}")
+        elif change_type == 'INCREASE':
+            print(f"Aumento de posição: {pos.title}")
+        else:
+            # COPY TRADE - SELL (vende proporcionalmente)
+            print(f"Redução de posição: {pos.title}")
+        changes.append(make_change(change_type, asset, pos, diff, detected_at, target))
+
+    # Posições Fechadas (Zeradas): estavam no last_map mas não estão no current_map
+    for asset in closed:
+        last = last_positions_map[asset]
+        title, outcome = get_market_cache().label(asset, last.title, last.outcome)
+        print(f"🚪 Posição FECHADA: {title} ({outcome})")
         
+        # Posição zerada para formatação
+        closed_pos = Position(asset, 0.0, title, outcome)
+        # COPY TRADE - SELL ALL (vende tudo que temos)
+        changes.append(make_change('CLOSED', asset, closed_pos, -last.size, detected_at, target))
+
+    return changes
+
+def handle_change(clob_client, change, own_positions=None, order_batch=None):
+    """Envia o alerta de uma mudança e executa o copy trade correspondente"""
+    msg = format_position_update(change['position'], change['type'], change['diff'], change['wallet'])
+    if msg: send_telegram_message(msg)
+
+    history = get_history_store()
+    change_id = history.record_change(change) if history is not None else None
+
+    copy = change.get('copy')
+    if clob_client and copy is not None and copy.skip:
+        print(f"⏭️ Copy trade de '{change['title']}' ignorado: {copy.skip}")
+    elif clob_client:
+        if change['type'] == 'CLOSED':
+            print(f"🔴 Executando venda total de: {change['title']}")
+        execute_trade(clob_client, change['asset'], change['side'], change['title'], change['outcome'],
+                      own_positions=own_positions,
+                      trade_amount=copy.notional if copy is not None else change['trade_amount'],
+                      order_batch=order_batch, change_id=change_id,
+                      sell_size=copy.shares if copy is not None else None)
+
+    latency_ms = (time.perf_counter() - change['detected_at']) * 1000
+    print(f"⏱️ {change['type']} '{change['title']}' concluída em {latency_ms:.0f}ms após a detecção")
+
+def size_cycle_changes(clob_client, changes, own_positions, targets):
+    """Dimensiona de uma vez todas as mudanças do ciclo (SIZING_MODE); o resultado vai em change['copy']"""
+    def bankroll():
+        return COPY_BANKROLL or get_usdc_balance(clob_client)
+
+    portfolio_values = {target.wallet: target.portfolio_value for target in targets}
+    sizes = size_changes(changes, SIZING_MODE, max_amount=MAX_TRADE_AMOUNT, own_size=own_positions.size,
+                         bankroll=bankroll, portfolio_values=portfolio_values)
+    for change, size in zip(changes, sizes):
+        change['copy'] = size
+
+def parse_targets():
+    """Lê as carteiras seguidas de TARGET_WALLETS ("0xabc:2.5,0xdef") ou, na falta, de TARGET_WALLET.
+
+    O valor após ':' é o tamanho do copy trade daquela carteira (padrão: FIXED_TRADE_AMOUNT).
+    Cada carteira tem seu arquivo de estado, seja qual for o número de carteiras: assim adicionar
+    ou remover uma carteira nunca faz outra perder o estado.
+    """
+    entries = [e.strip() for e in (TARGET_WALLETS or TARGET_WALLET or "").split(',') if e.strip()]
+    targets = []
+    for entry in entries:
+        wallet, _, amount = entry.partition(':')
+        wallet = wallet.strip()
+        targets.append(WalletTarget(
+            wallet=wallet,
+            trade_amount=float(amount) if amount else FIXED_TRADE_AMOUNT,
+            positions_file=f"last_positions_{wallet.lower()}.json",
+            cursor_file=f"activity_cursor_{wallet.lower()}.json"
+        ))
+    return targets
+
+def migrate_legacy_state(targets):
+    """Estado de quando uma carteira só usava POSITIONS_FILE/ACTIVITY_CURSOR_FILE vai para os arquivos dela.
+
+    Sem mover o estado antigo, as posições abertas da carteira voltariam como NEW (e seriam
+    compradas de novo). A dona é a de TARGET_WALLET, se estiver na lista, senão a primeira.
+    """
+    if not targets:
+        return
+    owner = next((t for t in targets if TARGET_WALLET and t.wallet.lower() == TARGET_WALLET.lower()), targets[0])
+    legacy = [(POSITIONS_FILE, owner.positions_file),
+              (f"{POSITIONS_FILE}.journal", f"{owner.positions_file}.journal")]
+    if any(os.path.exists(new) for _, new in legacy) or not any(os.path.exists(old) for old, _ in legacy):
+        return
+    for old, new in legacy + [(ACTIVITY_CURSOR_FILE, owner.cursor_file)]:
+        if os.path.exists(old) and not os.path.exists(new):
+            os.replace(old, new)
+    print(f"📦 Estado de {POSITIONS_FILE} movido para {owner.positions_file} ({owner.label})")
+
+def poll_wallet(target):
+    """Detecta mudanças de uma carteira. Retorna (mudanças, novo_estado, novo_cursor, posições) ou None se falhar.
+
+    `posições` são os registros completos (preço médio, valor atual) vistos na consulta, usados
+    no histórico; o estado guarda só size, título e outcome.
+    """
+    if DETECTION_MODE == 'activity':
+        return poll_wallet_activity(target)
+    return poll_wallet_positions(target)
+
+_record_lock = threading.Lock()
+
+def record_snapshot(wallet, positions):
+    """Acrescenta um snapshot {ts, wallet, positions} ao SNAPSHOT_RECORD_FILE"""
+    line = json.dumps({'ts': time.time(), 'wallet': wallet, 'positions': [pos.to_api() for pos in positions]})
     try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        
-        data = {
-            'chat_id': TELEGRAM_CHAT_ID,
-            'text': message,
-            'parse_mode': 'Markdown',
-            'disable_web_page_preview': True
-        }
-        
-        response = requests.post(url, json=data, timeout=10)
-        response.raise_for_status()
-        print("Mensagem enviada com sucesso!")
-        return True
+        with _record_lock, open(SNAPSHOT_RECORD_FILE, 'a') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        print(f"⚠️ Erro ao gravar snapshot: {e}")
+
+def poll_wallet_positions(target):
+    """Modo snapshot: busca todas as posições e compara com o estado anterior"""
+    # Busca posições atuais na API, página por página, direto para o mapa {asset_id: dados_posicao}
+    try:
+        with metrics.span('get_positions'):
+            current_positions_map = {pos.asset: pos for pos in iter_positions(target.wallet)}
     except Exception as e:
-        print(f"Erro ao enviar mensagem: {e}")
-        return False
+        # Falha na API: não compara contra lista vazia (evitaria alertas falsos de fechamento)
+        print(f"Erro ao buscar posições de {target.label}: {e}")
+        return None
+    print(f"[{target.label}] Encontradas {len(current_positions_map)} posições ativas")
+    target.portfolio_value = sum(pos.current_value for pos in current_positions_map.values())
+    if SNAPSHOT_RECORD_FILE:
+        record_snapshot(target.wallet, current_positions_map.values())
+
+    # Se não tiver estado anterior, assume vazio para alertar sobre as posições atuais
+    if not target.last_positions:
+        print(f"[{target.label}] Primeira execução: Alertando sobre posições atuais...")
+
+    # Estado {asset: Position(size, title, outcome)} para a próxima comparação (necessário para detectar fechamentos)
+    new_state = {asset: pos.state() for asset, pos in current_positions_map.items()}
+
+    with metrics.span('diff'):
+        changes = detect_changes(current_positions_map, target.last_positions, target, next_state=new_state)
+    return changes, new_state, None, current_positions_map
+
+def poll_wallet_activity(target):
+    """Modo incremental: lê apenas os trades novos desde o cursor e aplica ao estado em memória"""
+    try:
+        if target.activity_cursor is None:
+            # Primeira execução neste modo: parte do trade mais recente, sem alertar o histórico
+            with metrics.span('get_activity'):
+                cursor = activity_feed.latest_cursor(target.wallet, base_url=DATA_API_URL)
+                new_state = dict(target.last_positions)
+                if not new_state:
+                    # Estado base para classificar vendas/fechamentos dos próximos trades
+                    new_state = {pos.asset: pos.state() for pos in iter_positions(target.wallet)}
+            print(f"[{target.label}] Cursor de atividade inicializado em {cursor['timestamp']}")
+            return [], new_state, cursor, {}
+
+        with metrics.span('get_activity'):
+            trades, cursor = activity_feed.fetch_new_trades(target.wallet, target.activity_cursor,
+                                                           base_url=DATA_API_URL)
+    except Exception as e:
+        print(f"Erro ao buscar atividade de {target.label}: {e}")
+        return None
+
+    if not trades:
+        return [], target.last_positions, cursor, {}
+
+    print(f"[{target.label}] {len(trades)} trade(s) novo(s)")
+    detected_at = time.perf_counter()
+    # Registros são substituídos (não alterados) por trades_to_changes: cópia rasa basta
+    new_state = dict(target.last_positions)
+    changes = [
+        make_change(change_type, asset, position, diff, detected_at, target)
+        for change_type, asset, position, diff in activity_feed.trades_to_changes(trades, new_state)
+    ]
+    # Preço do fill como preço da posição no histórico (fechadas entram com size 0)
+    positions = {change['asset']: change['position'] for change in changes if change['type'] != 'CLOSED'}
+    return changes, new_state, cursor, positions
+
+# Carteiras cujos assets já passaram pelo prefetch de mercados
+_prefetched_wallets = set()
+
+def run_cycle(clob_client, targets):
+    """Executa um ciclo de detecção em todas as carteiras: busca posições, compara e copia trades.
+
+    O estado de cada carteira é atualizado em memória e persistido apenas quando muda.
+    Retorna quantas carteiras foram consultadas com sucesso.
+    """
+    metrics.inc('cycles_total')
+    with metrics.span('cycle'):
+        return _run_cycle(clob_client, targets)
+
+def _run_cycle(clob_client, targets):
+    # 1 e 2. Busca posições e detecta mudanças (carteiras em paralelo)
+    with metrics.span('poll'):
+        results = wallet_scheduler.poll(targets, poll_wallet)
+    changes = [change for _, result in results if result for change in result[0]]
+    for change in changes:
+        metrics.inc('changes_total', type=change['type'])
+
+    # 3. Alertas + copy trades: assets diferentes em paralelo, mesmo asset em ordem
+    if changes:
+        # Nossas posições: no máximo uma busca por ciclo, feita só se houver venda
+        own_positions = OwnPositions(clob_client) if clob_client else None
+        if clob_client:
+            # Tamanhos de todas as ordens do ciclo antes de qualquer envio
+            with metrics.span('sizing'):
+                size_cycle_changes(clob_client, changes, own_positions, targets)
+            with metrics.span('warm_markets'):
+                warm_markets(clob_client, changes)
+        # Ordens do ciclo: planejadas em paralelo pelo executor, assinadas e enviadas juntas no fim
+        order_batch = None
+        if clob_client and BATCH_ORDERS and not DRY_RUN:
+            from order_batch import OrderBatch
+            order_batch = OrderBatch(clob_client, get_signing_pool(clob_client))
+        with metrics.span('trades'):
+            trade_executor.run(changes, lambda change: handle_change(clob_client, change, own_positions, order_batch))
+        if order_batch is not None:
+            started = time.perf_counter()
+            order_count = len(order_batch)
+            try:
+                with metrics.span('batch_submit'):
+                    order_batch.submit()
+            except Exception as e:
+                # O estado do ciclo é salvo mesmo assim: reprocessar as mudanças reenviaria as ordens
+                print(f"❌ Erro no envio do lote de ordens: {e}")
+            if order_count:
+                print(f"⏱️ Lote de {order_count} ordem(ns) assinado e enviado em {(time.perf_counter() - started) * 1000:.0f}ms")
+    else:
+        print("Nenhuma mudança nas posições.")
+
+    # 4. Salva novo estado das carteiras que mudaram
+    polled = 0
+    prefetch = {}
+    with metrics.span('save_state'):
+        for target, result in results:
+            target.last_poll_ok = result is not None
+            if result is None:
+                # Falha já contada em errors_total pelo span da consulta (get_positions/get_activity)
+                continue
+            polled += 1
+            changes_found, new_state, cursor, positions = result
+            target.last_change_count = len(changes_found)
+            if new_state != target.last_positions:
+                if get_history_store() is not None:
+                    delta = diff_states(target.last_positions, new_state)
+                    # Registros completos da consulta; o estado não tem preço médio nem valor atual
+                    changed = {asset: positions.get(asset, pos) for asset, pos in delta.get('set', {}).items()}
+                    get_history_store().record_positions(target.wallet, changed, delta.get('del', ()))
+                save_last_positions(new_state, target.last_positions, target.positions_file)
+            # Igual ou não, o novo estado vira o "anterior": é ele que o motor de diff guardou em cache
+            target.last_positions = new_state
+            if target.wallet not in _prefetched_wallets:
+                # Primeira consulta da carteira: todos os assets dela; depois, só os das mudanças (warm_markets)
+                prefetch[target.wallet] = target.last_positions
+            if cursor is not None and cursor != target.activity_cursor:
+                # Cursor salvo depois do estado: um crash entre os dois só reprocessa trades, nunca os perde
+                activity_feed.save_cursor(cursor, target.cursor_file)
+                target.activity_cursor = cursor
+
+    # Metadados dos assets das carteiras em segundo plano, fora do caminho dos trades
+    if prefetch and get_market_cache().prefetch_async(clob_client if not DRY_RUN else None, prefetch.values()):
+        _prefetched_wallets.update(prefetch)
+
+    # 5. Alertas do ciclo viram um digest, enviado em segundo plano
+    if _notifier is not None:
+        _notifier.flush()
+
+    # 6. Histórico do ciclo numa transação
+    if _history_store is not None:
+        try:
+            with metrics.span('history_flush'):
+                _history_store.flush()
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar histórico: {e}")
+    return polled
+
+# Sinaliza encerramento do modo daemon (SIGTERM/SIGINT)
+_stop_event = threading.Event()
+# Acorda o daemon antes do fim do intervalo (encerramento ou negociação vista no WebSocket)
+_wake_event = threading.Event()
+# asset -> carteiras que o têm (refeito a cada ciclo; lido pela thread do WebSocket)
+_asset_holders = {}
+
+def _handle_shutdown(signum, frame):
+    """Pede encerramento limpo do daemon ao fim do ciclo atual"""
+    print(f"🛑 Sinal {signum} recebido. Encerrando após o ciclo atual...")
+    _stop_event.set()
+    _wake_event.set()
+
+def _on_market_trade(asset_id, event):
+    """Negociação em um asset seguido: antecipa a próxima checagem só das carteiras que o têm"""
+    holders = _asset_holders.get(asset_id)
+    if not holders:
+        return
+    now = time.monotonic()
+    for target in holders:
+        target.market_activity_at = now
+    _wake_event.set()
+
+def _index_holders(targets):
+    """Mapa asset -> carteiras que o têm, a partir do estado em memória"""
+    holders = {}
+    for target in targets:
+        for asset in target.last_positions:
+            holders.setdefault(asset, []).append(target)
+    return holders
+
+def _push_reschedule(targets, interval, now):
+    """Push sem --adaptive: `interval` enquanto houver negociação recente nos assets da carteira, senão o fallback"""
+    for target in targets:
+        recent = now - target.market_activity_at <= PUSH_RECHECK_WINDOW
+        target.next_poll_at = now + (interval if recent else PUSH_FALLBACK_INTERVAL)
+
+def poll_cost(target):
+    """Requisições de uma consulta da carteira (páginas de /positions; 1 no modo activity)"""
+    if DETECTION_MODE == 'activity':
+        return 1
+    return max(1, math.ceil(len(target.last_positions) / POSITIONS_PAGE_SIZE))
+
+def make_schedule():
+    """Agenda adaptativa com o orçamento de requisições do polling"""
+    budget = POLL_REQUEST_BUDGET or HTTP_RATE_LIMIT * 0.8  # o resto fica para Telegram e nossas posições
+    return AdaptiveSchedule(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, backoff=POLL_BACKOFF, budget=budget)
+
+def run_daemon(clob_client, targets, interval, push=False, adaptive=False):
+    """Loop persistente: cliente e estado ficam em memória, polling a cada `interval` segundos.
+
+    Com `push`, assina o WebSocket do CLOB para os assets das carteiras. Cada negociação
+    dispara uma checagem imediata só das carteiras que têm o asset, seguida de polling rápido
+    delas por PUSH_RECHECK_WINDOW segundos (a Data API atualiza com atraso); carteiras sem
+    atividade caem para PUSH_FALLBACK_INTERVAL.
+
+    Com `adaptive`, cada carteira tem seu próprio intervalo (AdaptiveSchedule): curto após
+    mudanças, recuando sem atividade; negociações no WebSocket antecipam as carteiras do
+    asset. Em ambos os modos, um Retry-After/rate limit da Data API adia as próximas consultas.
+    """
+    global _asset_holders
+    signal.signal(signal.SIGTERM, _handle_shutdown)
+    signal.signal(signal.SIGINT, _handle_shutdown)
+
+    feed = None
+    if push:
+        from ws_feed import MarketFeed
+        feed = MarketFeed(CLOB_WS_URL, on_trade=_on_market_trade, record_path=WS_RECORD_FILE,
+                          book_cache=orderbook_cache)
+        feed.start()
+
+    mode = " + push WebSocket" if push else ""
+    schedule = None
+    if adaptive:
+        schedule = make_schedule()
+        schedule.start(targets, time.monotonic())
+        pacing = f"adaptativo {schedule.min_interval}s-{schedule.max_interval}s"
+    else:
+        pacing = f"intervalo: {interval}s"
+    print(f"🔁 Modo daemon ativo ({len(targets)} carteira(s), {pacing}{mode})")
+
+    handled_at = time.monotonic()  # negociações do WebSocket até aqui já anteciparam suas carteiras
+    while not _stop_event.is_set():
+        started = time.monotonic()
+        if schedule is not None:
+            due = schedule.due(targets, started)
+        elif feed is not None:
+            due = [target for target in targets if target.next_poll_at <= started]
+        else:
+            due = targets
+        if due:
+            try:
+                run_cycle(clob_client, due)
+            except Exception as e:
+                print(f"❌ Erro no ciclo de monitoramento: {e}")
+            now = time.monotonic()
+            if schedule is not None:
+                for target in due:
+                    schedule.record(target, poll_cost(target), len(targets), now)
+            elif feed is not None:
+                _push_reschedule(due, interval, now)
+
+        if feed is not None:
+            _asset_holders = _index_holders(targets)
+            feed.set_assets(_asset_holders)
+
+        # Data API pediu para esperar (Retry-After ou cota esgotada)
+        cooldown = http_client.cooldown_remaining(DATA_API_URL)
+        if cooldown and schedule is not None:
+            schedule.defer(targets, time.monotonic() + cooldown)
+
+        if schedule is not None:
+            wait = schedule.next_wait(targets, time.monotonic())
+            elapsed = 0.0
+        elif feed is not None:
+            wait = max(0.0, min(target.next_poll_at for target in targets) - time.monotonic())
+            elapsed = 0.0
+        else:
+            wait = interval
+            elapsed = time.monotonic() - started
+        wait = max(wait - elapsed, cooldown)
+        if cooldown:
+            print(f"⏳ Data API pediu {cooldown:.1f}s de espera")
+
+        _wake_event.wait(max(0.0, wait))
+        _wake_event.clear()
+        if feed is None or _stop_event.is_set():
+            continue
+        # Negociação vista no WebSocket: só as carteiras com o asset são consultadas já
+        now = time.monotonic()
+        active = [target for target in targets if target.market_activity_at > handled_at]
+        handled_at = now
+        if active:
+            if schedule is not None:
+                schedule.tighten(active, now)
+            else:
+                for target in active:
+                    target.next_poll_at = now
+            cooldown = http_client.cooldown_remaining(DATA_API_URL)
+            for target in active:
+                target.next_poll_at = max(target.next_poll_at, now + cooldown)
+
+    if feed is not None:
+        feed.stop()
+    print("👋 Daemon encerrado.")
 
 def main():
+    global DETECTION_MODE, SIZING_MODE
+    parser = argparse.ArgumentParser(description="Monitor e copy trader de posições do Polymarket")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Roda continuamente em vez de executar um único ciclo")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f"Intervalo entre ciclos no modo daemon, em segundos (padrão: {POLL_INTERVAL})")
+    parser.add_argument('--push', action='store_true',
+                        help="Modo daemon disparado pelo WebSocket do CLOB (polling vira fallback)")
+    parser.add_argument('--detection', choices=('positions', 'activity'), default=DETECTION_MODE,
+                        help="Motor de detecção: snapshots de /positions ou trades incrementais de /activity")
+    parser.add_argument('--adaptive', action=argparse.BooleanOptionalAction, default=POLL_ADAPTIVE,
+                        help="Intervalo de polling por carteira conforme a atividade (daemon); substitui --interval (padrão: POLL_ADAPTIVE, desligado)")
+    parser.add_argument('--sizing', choices=SIZING_MODES, default=SIZING_MODE,
+                        help="Tamanho dos copy trades: valor fixo ou proporcional à posição/carteira seguida")
+    args = parser.parse_args()
+    DETECTION_MODE = args.detection
+    SIZING_MODE = args.sizing
+
     print(f"Iniciando monitoramento de posições - {datetime.now()}")
     
-    if not TARGET_WALLET:
-        print("TARGET_WALLET not set in .env")
+    targets = parse_targets()
+    if not targets:
+        print("TARGET_WALLET (ou TARGET_WALLETS) not set in .env")
         return
 
-    # Inicializa cliente de trading
-    clob_client = init_clob_client()
-
-    # 1. Busca posições atuais na API
-    current_positions_list = get_positions()
-    print(f"Encontradas {len(current_positions_list)} posições ativas")
-    
-    # Cria mapa {asset_id: dados_posicao}
-    current_positions_map = {}
-    for pos in current_positions_list:
-        asset = pos.get('asset')
-        if asset:
-            current_positions_map[asset] = pos
-
-    # 2. Carrega estado anterior
-    last_positions_map = load_last_positions()
-    
-    # Se não tiver estado anterior, assume vazio para alertar sobre as posições atuais
-    if not last_positions_map:
-        print("Primeira execução: Alertando sobre posições atuais...")
+    # Estado anterior de cada carteira (mantido em memória a partir daqui)
+    migrate_legacy_state(targets)
+    for target in targets:
+        target.last_positions = load_last_positions(target.positions_file)
+        if DETECTION_MODE == 'activity':
+            target.activity_cursor = activity_feed.load_cursor(target.cursor_file)
 
+    if TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
+        # Reenvia mensagens que ficaram no spool da execução anterior
+        get_notifier().flush()
 
-    # 3. Compara estados para detectar mudanças
-    changes_detected = False
-    
-    # Verifica Novas e Aumentos
-    for asset, pos in current_positions_map.items():
-        current_size = float(pos.get('size', 0))
-        
-        if asset not in last_positions_map:
-            # Nova Posição
-            print(f"Nova posição encontrada: {pos.get('title')}")
-            msg = format_position_update(pos, 'NEW')
-            if msg: send_telegram_message(msg)
-            
-            # COPY TRADE
-            if clob_client:
-                execute_trade(clob_client, asset, "BUY", pos.get('title'), pos.get('outcome'))
-                
-            changes_detected = True
-            
-        else:
-            # Posição Existente - Verifica mudança de tamanho
-            last_data = last_positions_map.get(asset, {})
-            last_size = float(last_data.get('size', 0) if isinstance(last_data, dict) else last_data)
-            diff = current_size - last_size
-            
-            # Considera mudança apenas se for significativa (> 0.1 shares para evitar ruído de arredondamento)
-            if diff > 0.1:
-                print(f"Aumento de posição: {pos.get('title')}")
-                msg = format_position_update(pos, 'INCREASE', diff)
-                if msg: send_telegram_message(msg)
-                
-                # COPY TRADE
-                if clob_client:
-                    execute_trade(clob_client, asset, "BUY", pos.get('title'), pos.get('outcome'))
-                    
-                changes_detected = True
-            elif diff < -0.1:
-                print(f"Redução de posição: {pos.get('title')}")
-                msg = format_position_update(pos, 'DECREASE', diff)
-                if msg: send_telegram_message(msg)
-                
-                # COPY TRADE - SELL (vende proporcionalmente)
-                if clob_client:
-                    execute_trade(clob_client, asset, "SELL", pos.get('title'), pos.get('outcome'))
-                    
-                changes_detected = True
-
-    # Verifica Posições Fechadas (Zeradas)
-    # Se estava no last_map mas não está no current_map (ou size=0), foi vendida tudo
-    for asset, last_data in last_positions_map.items():
-        if asset not in current_positions_map:
-            # Posição foi encerrada - Reconstruir objeto pos para notificação
-            last_size = last_data.get('size', 0) if isinstance(last_data, dict) else last_data
-            last_title = last_data.get('title', 'Unknown') if isinstance(last_data, dict) else 'Unknown'
-            last_outcome = last_data.get('outcome', 'Unknown') if isinstance(last_data, dict) else 'Unknown'
-            
-            print(f"🚪 Posição FECHADA: {last_title} ({last_outcome})")
-            
-            # Cria objeto fake para formatação
-            closed_pos = {
-                'title': last_title,
-                'outcome': last_outcome,
-                'size': 0,
-                'avgPrice': 0,
-                'currentValue': 0,
-                'percentPnl': 0
-            }
-            msg = format_position_update(closed_pos, 'CLOSED', -last_size)
-            if msg: send_telegram_message(msg)
-            
-            # COPY TRADE - SELL ALL (vende tudo que temos)
-            if clob_client:
-                print(f"🔴 Executando venda total de: {last_title}")
-                execute_trade(clob_client, asset, "SELL", last_title, last_outcome)
-                
-            changes_detected = True
+    # Inicializa cliente de trading
+    clob_client = init_clob_client()
 
-    if not changes_detected:
-        print("Nenhuma mudança nas posições.")
+    metrics_server = None
+    try:
+        if args.daemon or args.push:
+            if clob_client and WARMUP_SIGNING and BATCH_ORDERS and not DRY_RUN:
+                # Processo longo: sobe os processos de assinatura antes do primeiro lote
+                get_signing_pool(clob_client).warm_up()
+            if METRICS_PORT:
+                try:
+                    metrics_server = metrics.serve(METRICS_PORT, METRICS_HOST)
+                    print(f"📊 Métricas em http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+                except OSError as e:
+                    print(f"⚠️ Não foi possível abrir o endpoint de métricas: {e}")
+            run_daemon(clob_client, targets, args.interval, push=args.push, adaptive=args.adaptive)
+            return
 
-    # 4. Salva novo estado
-    # Salva {asset: {size, title, outcome}} para a próxima comparação (necessário para detectar fechamentos)
-    new_state = {
-        k: {
-            'size': float(v.get('size', 0)),
-            'title': v.get('title', 'Unknown'),
-            'outcome': v.get('outcome', 'Unknown')
-        } 
-        for k, v in current_positions_map.items()
-    }
-    save_last_positions(new_state)
-    print("Monitoramento concluído")
+        # Execução única (cron)
+        if run_cycle(clob_client, targets) < len(targets):
+            print("⚠️ Falha ao buscar posições de alguma carteira. Estado anterior mantido para ela.")
+        print("Monitoramento concluído")
+        if METRICS_SUMMARY_FILE:
+            try:
+                metrics.write_summary(METRICS_SUMMARY_FILE)
+                print(f"📊 Resumo de métricas salvo em {METRICS_SUMMARY_FILE}")
+            except OSError as e:
+                print(f"⚠️ Erro ao salvar resumo de métricas: {e}")
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        wallet_scheduler.shutdown()
+        trade_executor.shutdown()
+        if _signing_pool is not None:
+            _signing_pool.shutdown()
+        if _history_store is not None:
+            _history_store.close()
+        if _market_cache is not None:
+            _market_cache.close(timeout=10)  # prefetch em andamento; o resto fica para a próxima execução
+        if _notifier is not None:
+            # Espera a fila esvaziar; o que sobrar fica no spool
+            _notifier.close(timeout=TELEGRAM_DRAIN_TIMEOUT)
+        http_client.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,84 @@
+"""
+Cache local das credenciais de API do CLOB
+
+As credenciais derivadas da chave privada são estáveis, então não há motivo para
+derivá-las (e verificá-las) a cada execução. Ficam num arquivo criptografado com
+AES-GCM, chave derivada (HKDF) da própria chave privada, com validade `ttl`.
+O cache não é verificado na partida: quando o CLOB responde com erro de autenticação,
+o bot o descarta, deriva credenciais novas e repete a chamada uma vez.
+"""
+
+import json
+import os
+import time
+
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+from py_clob_client.clob_types import ApiCreds
+
+CACHE_VERSION = 1
+
+
+class CredsCache:
+    def __init__(self, path, private_key, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        key_bytes = bytes.fromhex(private_key[2:] if private_key.startswith('0x') else private_key)
+        self._key = HKDF(key_bytes, 32, b'polymarket-operator', SHA256, context=b'clob-api-creds')
+
+    def load(self, address):
+        """Credenciais em cache para `address` ou None (ausente, expirado, corrompido ou de outra carteira)"""
+        try:
+            with open(self.path, 'r') as f:
+                envelope = json.load(f)
+            if envelope.get('version') != CACHE_VERSION:
+                return None
+            cipher = AES.new(self._key, AES.MODE_GCM, nonce=bytes.fromhex(envelope['nonce']))
+            plain = cipher.decrypt_and_verify(bytes.fromhex(envelope['data']), bytes.fromhex(envelope['tag']))
+            payload = json.loads(plain)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Cache de credenciais ilegível ({e}). Derivando novamente...")
+            return None
+
+        if payload.get('address', '').lower() != address.lower():
+            return None
+        if payload.get('expires_at', 0) <= time.time():
+            return None
+        return ApiCreds(
+            api_key=payload['api_key'],
+            api_secret=payload['api_secret'],
+            api_passphrase=payload['api_passphrase'],
+        )
+
+    def save(self, address, creds):
+        """Grava as credenciais (escrita atômica, arquivo legível só pelo dono)"""
+        payload = json.dumps({
+            'address': address,
+            'api_key': creds.api_key,
+            'api_secret': creds.api_secret,
+            'api_passphrase': creds.api_passphrase,
+            'expires_at': time.time() + self.ttl,
+        }).encode()
+        cipher = AES.new(self._key, AES.MODE_GCM)
+        data, tag = cipher.encrypt_and_digest(payload)
+        envelope = {'version': CACHE_VERSION, 'nonce': cipher.nonce.hex(), 'tag': tag.hex(), 'data': data.hex()}
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(envelope, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar o cache de credenciais: {e}")
+
+    def invalidate(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ Não foi possível remover o cache de credenciais: {e}")
@@ -0,0 +1,110 @@
+"""
+Detecção de mudanças vetorizada para snapshots grandes de posições
+
+Cada snapshot vira duas colunas: ids inteiros dos assets (internados uma vez por
+processo) e tamanhos em float64. NEW/INCREASE/DECREASE/CLOSED saem de operações em
+arrays contra o limite de ruído (`dust`), sem percorrer dicts posição a posição.
+O snapshot anterior de cada carteira fica em cache e só é reconstruído quando o
+estado salvo muda.
+"""
+
+import threading
+from operator import attrgetter
+
+import numpy as np
+
+NEW, INCREASE, DECREASE = 0, 1, 2
+_size = attrgetter('size')
+KIND_NAMES = ('NEW', 'INCREASE', 'DECREASE')
+
+
+class AssetInterner:
+    """Mapeia asset_id (string longa) -> inteiro estável no processo"""
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def intern(self, assets):
+        ids = self._ids
+        try:
+            # Caminho rápido: todos os assets já vistos (lookups em C, direto para o array)
+            return np.fromiter(map(ids.get, assets), dtype=np.int64, count=len(assets))
+        except TypeError:
+            with self._lock:
+                return np.array([ids.setdefault(asset, len(ids)) for asset in assets], dtype=np.int64)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class PositionSnapshot:
+    """Snapshot em colunas, na mesma ordem do dict de origem"""
+    __slots__ = ('assets', 'keys', 'sizes')
+
+    def __init__(self, positions_map, interner):
+        self.assets = list(positions_map)
+        self.keys = interner.intern(self.assets)
+        # Registros Position: size já é float desde a ingestão
+        self.sizes = np.fromiter(map(_size, positions_map.values()), dtype=np.float64, count=len(self.assets))
+
+    def dense(self, universe):
+        """Tamanho por id internado (NaN = asset ausente)"""
+        sizes = np.full(universe, np.nan)
+        sizes[self.keys] = self.sizes
+        return sizes
+
+
+def diff_snapshots(previous, current, universe, dust=0.1):
+    """Compara dois snapshots.
+
+    Retorna (índices em `current`, tipos NEW/INCREASE/DECREASE, diferenças de size,
+    índices em `previous` das posições fechadas). A ordem segue `current`.
+    """
+    last = previous.dense(universe)[current.keys]
+    is_new = np.isnan(last)
+    diff = current.sizes - np.where(is_new, 0.0, last)
+    increase = ~is_new & (diff > dust)
+    decrease = ~is_new & (diff < -dust)
+
+    changed = np.flatnonzero(is_new | increase | decrease)
+    kinds = np.where(is_new[changed], NEW, np.where(increase[changed], INCREASE, DECREASE))
+    diffs = np.where(is_new[changed], 0.0, diff[changed])
+
+    closed = np.flatnonzero(np.isnan(current.dense(universe)[previous.keys]))
+    return changed, kinds, diffs, closed
+
+
+class DiffEngine:
+    def __init__(self, dust=0.1):
+        self.dust = dust
+        self.interner = AssetInterner()
+        self._previous = {}  # carteira -> (dict de estado, snapshot dele)
+        self._lock = threading.Lock()
+
+    def snapshot(self, positions_map):
+        return PositionSnapshot(positions_map, self.interner)
+
+    def _previous_snapshot(self, wallet, last_positions_map):
+        with self._lock:
+            cached = self._previous.get(wallet)
+        if cached is not None and cached[0] is last_positions_map:
+            return cached[1]
+        snapshot = self.snapshot(last_positions_map)
+        self.remember(wallet, last_positions_map, snapshot)
+        return snapshot
+
+    def remember(self, wallet, state_map, snapshot):
+        """Associa `snapshot` ao dict de estado que será o "anterior" do próximo ciclo"""
+        with self._lock:
+            self._previous[wallet] = (state_map, snapshot)
+
+    def diff(self, wallet, current_positions_map, last_positions_map):
+        """Retorna (snapshot atual, [(tipo, asset, diff)], [asset fechado])"""
+        previous = self._previous_snapshot(wallet, last_positions_map)
+        current = self.snapshot(current_positions_map)
+        changed, kinds, diffs, closed = diff_snapshots(previous, current, len(self.interner), self.dust)
+        assets = current.assets
+        changes = [(KIND_NAMES[kind], assets[index], diff)
+                   for index, kind, diff in zip(changed.tolist(), kinds.tolist(), diffs.tolist())]
+        return current, changes, [previous.assets[index] for index in closed.tolist()]
@@ -0,0 +1,64 @@
+"""
+Execução concorrente das mudanças detectadas em um ciclo
+
+Mudanças de assets diferentes rodam em paralelo (até `max_workers` ao mesmo tempo);
+mudanças do mesmo asset rodam em sequência, na ordem em que foram detectadas.
+"""
+
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class TradeExecutor:
+    """Pool limitado de threads que processa mudanças agrupadas por asset"""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max(1, int(max_workers))
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='trade')
+        return self._pool
+
+    @staticmethod
+    def _run_group(handler, group):
+        """Processa em ordem as mudanças de um único asset. Retorna o tempo gasto por mudança."""
+        timings = []
+        for change in group:
+            started = time.perf_counter()
+            try:
+                handler(change)
+            except Exception as e:
+                print(f"❌ Erro ao processar mudança em {change.get('title')}: {e}")
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def run(self, changes, handler):
+        """Executa `handler(change)` para cada mudança e bloqueia até todas terminarem"""
+        if not changes:
+            return
+
+        groups = OrderedDict()
+        for change in changes:
+            groups.setdefault(change['asset'], []).append(change)
+
+        started = time.perf_counter()
+        if len(groups) == 1 or self.max_workers == 1:
+            # Sem ganho em paralelizar: evita o overhead do pool
+            timings = [t for group in groups.values() for t in self._run_group(handler, group)]
+        else:
+            pool = self._get_pool()
+            futures = [pool.submit(self._run_group, handler, group) for group in groups.values()]
+            wait(futures)
+            timings = [t for f in futures for t in f.result()]
+
+        wall = time.perf_counter() - started
+        print(f"⏱️ {len(changes)} mudança(s) em {len(groups)} asset(s) processadas em {wall * 1000:.0f}ms "
+              f"(sequencial seria ~{sum(timings) * 1000:.0f}ms)")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
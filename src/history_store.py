@@ -0,0 +1,230 @@
+"""
+Histórico em SQLite: posições das carteiras seguidas, mudanças detectadas e nossas ordens
+
+Os registros de um ciclo são acumulados em memória (as threads do executor também
+registram ordens) e gravados numa única transação ao final do ciclo. O banco usa WAL,
+então consultas de análise podem rodar enquanto o bot grava:
+
+    python src/history_store.py pnl
+    python src/history_store.py slippage --days 30
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    ts REAL NOT NULL,
+    wallet TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    size REAL NOT NULL,
+    avg_price REAL,
+    current_value REAL,
+    title TEXT,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_positions_wallet_ts ON positions (wallet, ts);
+CREATE INDEX IF NOT EXISTS idx_positions_asset ON positions (asset_id, ts);
+
+CREATE TABLE IF NOT EXISTS changes (
+    id TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    wallet TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    side TEXT NOT NULL,
+    diff REAL,
+    size REAL,
+    ref_price REAL,
+    title TEXT,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_changes_wallet_ts ON changes (wallet, ts);
+CREATE INDEX IF NOT EXISTS idx_changes_asset ON changes (asset_id, ts);
+CREATE INDEX IF NOT EXISTS idx_changes_ts ON changes (ts);
+
+CREATE TABLE IF NOT EXISTS orders (
+    ts REAL NOT NULL,
+    change_id TEXT,
+    asset_id TEXT NOT NULL,
+    side TEXT NOT NULL,
+    price REAL NOT NULL,
+    size REAL NOT NULL,
+    best_price REAL,
+    plan_vwap REAL,
+    order_id TEXT,
+    status TEXT,
+    making_amount REAL,
+    taking_amount REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_orders_asset ON orders (asset_id, ts);
+CREATE INDEX IF NOT EXISTS idx_orders_change ON orders (change_id);
+CREATE INDEX IF NOT EXISTS idx_orders_ts ON orders (ts);
+"""
+
+# Quanto cada ordem executou de fato (respostas do CLOB): BUY entrega USDC (making) e recebe
+# shares (taking); SELL o inverso. Ordens de dry run e com erro ficam de fora.
+FILLS_CTE = """
+WITH fills AS (
+    SELECT change_id, asset_id, side, ts,
+           COALESCE(CASE WHEN side = 'BUY' THEN taking_amount ELSE making_amount END, 0) AS shares,
+           COALESCE(CASE WHEN side = 'BUY' THEN making_amount ELSE taking_amount END, 0) AS usdc
+    FROM orders
+    WHERE error IS NULL AND status IS NOT 'dry_run'
+)
+"""
+
+# Resultado das nossas ordens por mercado: custo das compras, receita das vendas e
+# PnL realizado (vendas menos o custo médio das shares vendidas)
+PNL_QUERY = FILLS_CTE + """
+SELECT asset_id, title, outcome,
+       bought, cost, sold, proceeds,
+       bought - sold AS net_shares,
+       proceeds - CASE WHEN bought > 0 THEN cost / bought * sold ELSE 0 END AS realized_pnl
+FROM (
+    SELECT f.asset_id,
+           MAX(c.title) AS title,
+           MAX(c.outcome) AS outcome,
+           SUM(CASE WHEN f.side = 'BUY' THEN f.shares ELSE 0 END) AS bought,
+           SUM(CASE WHEN f.side = 'BUY' THEN f.usdc ELSE 0 END) AS cost,
+           SUM(CASE WHEN f.side = 'SELL' THEN f.shares ELSE 0 END) AS sold,
+           SUM(CASE WHEN f.side = 'SELL' THEN f.usdc ELSE 0 END) AS proceeds
+    FROM fills f LEFT JOIN changes c ON c.id = f.change_id
+    WHERE f.ts >= ?
+    GROUP BY f.asset_id
+    HAVING bought > 0 OR sold > 0
+)
+ORDER BY realized_pnl
+"""
+
+# Slippage do copy trade: nosso preço médio executado contra o preço da carteira seguida
+# na detecção (positivo = pior para nós)
+SLIPPAGE_QUERY = FILLS_CTE + """
+SELECT c.wallet, c.asset_id, c.title, c.side, c.ref_price,
+       SUM(f.usdc) / SUM(f.shares) AS our_price,
+       CASE WHEN c.side = 'BUY'
+            THEN SUM(f.usdc) / SUM(f.shares) / c.ref_price - 1
+            ELSE 1 - SUM(f.usdc) / SUM(f.shares) / c.ref_price END AS slippage,
+       MAX(f.ts) - c.ts AS delay
+FROM changes c JOIN fills f ON f.change_id = c.id
+WHERE c.ref_price > 0 AND c.ts >= ?
+GROUP BY c.id
+HAVING SUM(f.shares) > 0
+ORDER BY slippage DESC
+"""
+
+
+class HistoryStore:
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._pending = {'positions': [], 'changes': [], 'orders': []}
+        self._lock = threading.Lock()
+
+    # --- Registro (em memória até flush) ---
+
+    def record_positions(self, wallet, positions, removed=()):
+        """Estado das posições que mudaram no ciclo (removidas entram com size 0)"""
+        now = time.time()
+        rows = [
+            (now, wallet, asset, pos.size, pos.avg_price or None, pos.current_value or None, pos.title, pos.outcome)
+            for asset, pos in positions.items()
+        ]
+        rows.extend((now, wallet, asset, 0.0, None, None, None, None) for asset in removed)
+        with self._lock:
+            self._pending['positions'].extend(rows)
+
+    def record_change(self, change):
+        """Registra uma mudança detectada; retorna o id usado para ligar as ordens a ela"""
+        position = change['position']
+        size = position.size
+        # Preço da carteira seguida: valor atual por share, senão o preço médio
+        ref_price = position.current_value / size if size > 0 and position.current_value > 0 else position.avg_price
+        change_id = uuid.uuid4().hex
+        with self._lock:
+            self._pending['changes'].append((
+                change_id, time.time(), change['wallet'], change['asset'], change['type'], change['side'],
+                change['diff'], size, ref_price, change['title'], change['outcome'],
+            ))
+        return change_id
+
+    def record_order(self, change_id, asset_id, side, price, size, resp=None, error=None,
+                     best_price=None, plan_vwap=None, status=None):
+        """Registra uma ordem enviada (ou a tentativa, com `error`)"""
+        resp = resp if isinstance(resp, dict) else {}
+        with self._lock:
+            self._pending['orders'].append((
+                time.time(), change_id, asset_id, side, price, size, best_price, plan_vwap,
+                resp.get('orderID'), status or resp.get('status'),
+                _float_or_none(resp.get('makingAmount')), _float_or_none(resp.get('takingAmount')),
+                str(error) if error is not None else None,
+            ))
+
+    def flush(self):
+        """Grava tudo que foi registrado no ciclo numa transação"""
+        with self._lock:
+            pending, self._pending = self._pending, {'positions': [], 'changes': [], 'orders': []}
+        if not any(pending.values()):
+            return
+        with self._conn:
+            self._conn.executemany("INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", pending['positions'])
+            self._conn.executemany("INSERT OR IGNORE INTO changes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   pending['changes'])
+            self._conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   pending['orders'])
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    # --- Consultas ---
+
+    def market_pnl(self, since=0):
+        return self._conn.execute(PNL_QUERY, (since,)).fetchall()
+
+    def copy_slippage(self, since=0):
+        return self._conn.execute(SLIPPAGE_QUERY, (since,)).fetchall()
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas sobre o histórico do bot")
+    parser.add_argument('report', choices=('pnl', 'slippage'))
+    parser.add_argument('--db', default='history.db')
+    parser.add_argument('--days', type=float, help="Só os últimos N dias")
+    args = parser.parse_args()
+
+    since = time.time() - args.days * 86400 if args.days else 0
+    store = HistoryStore(args.db)
+    started = time.perf_counter()
+    if args.report == 'pnl':
+        rows = store.market_pnl(since)
+        print(f"{'mercado':<50} {'compradas':>10} {'custo':>10} {'vendidas':>10} {'receita':>10} {'PnL real.':>10}")
+        for asset_id, title, outcome, bought, cost, sold, proceeds, _, realized in rows:
+            label = f"{title or asset_id[:20]} ({outcome or '?'})"[:50]
+            print(f"{label:<50} {bought:>10.2f} {cost:>10.2f} {sold:>10.2f} {proceeds:>10.2f} {realized:>10.2f}")
+    else:
+        rows = store.copy_slippage(since)
+        print(f"{'mercado':<50} {'lado':>5} {'ref':>7} {'nosso':>7} {'slippage':>9} {'atraso':>8}")
+        for wallet, asset_id, title, side, ref_price, our_price, slippage, delay in rows:
+            label = (title or asset_id[:20])[:50]
+            print(f"{label:<50} {side:>5} {ref_price:>7.3f} {our_price:>7.3f} {slippage:>9.2%} {delay:>7.1f}s")
+    print(f"{len(rows)} linha(s) em {(time.perf_counter() - started) * 1000:.1f}ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
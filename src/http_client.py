@@ -0,0 +1,203 @@
+"""
+Sessão HTTP compartilhada (keep-alive + pool de conexões por host + retry com backoff)
+
+Todas as chamadas à Data API e ao Telegram passam por aqui, reaproveitando
+conexões TCP/TLS em vez de abrir uma nova a cada requisição.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Status que valem nova tentativa (erros do servidor). 429 volta direto para quem chamou:
+# o scheduler adia as consultas e o notifier respeita o retry_after, sem prender a thread aqui
+RETRY_STATUS = (500, 502, 503, 504)
+
+_config = {
+    'pool_connections': 10,  # número de hosts com pool próprio
+    'pool_maxsize': 20,      # conexões mantidas por host
+    'timeout': 30,
+    'max_retries': 3,
+    'backoff_factor': 0.5,
+    'rate_limit': 0,         # requisições/segundo no processo inteiro (0 = sem limite)
+}
+_session = None
+_lock = threading.Lock()
+_cooldowns = {}  # host -> instante (monotonic) antes do qual a API pediu para não ser chamada
+
+
+class RateLimiter:
+    """Token bucket thread-safe: no máximo `rate` requisições/segundo, com rajada de até `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiter = None
+
+
+class CountingRetry(Retry):
+    """Retry do urllib3 que conta cada nova tentativa em `http_retries_total`"""
+
+    def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+        reason = str(response.status) if response is not None else type(error).__name__
+        metrics.inc('http_retries_total', reason=reason)
+        return super().increment(method, url, response, error, *args, **kwargs)
+
+
+def configure(**options):
+    """Ajusta tamanhos de pool, timeout, retry e rate limit. Recria a sessão na próxima chamada."""
+    global _session, _limiter
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise ValueError(f"Opções HTTP desconhecidas: {', '.join(sorted(unknown))}")
+
+    with _lock:
+        _config.update(options)
+        _limiter = RateLimiter(_config['rate_limit']) if _config['rate_limit'] > 0 else None
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _build_session():
+    retry = CountingRetry(
+        total=_config['max_retries'],
+        backoff_factor=_config['backoff_factor'],
+        status_forcelist=RETRY_STATUS,
+        # Só métodos idempotentes: um POST repetido após 5xx pode duplicar a mensagem do Telegram
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        # Esperas longas (Retry-After) ficam com _note_rate_limit/cooldown_remaining, não com o retry
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=_config['pool_connections'],
+        pool_maxsize=_config['pool_maxsize'],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Retorna a sessão compartilhada do processo (criada sob demanda)"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get(url, params=None, timeout=None, **kwargs):
+    """GET pela sessão compartilhada"""
+    if _limiter is not None:
+        _limiter.acquire()
+    started = time.perf_counter()
+    try:
+        response = get_session().get(url, params=params, timeout=timeout or _config['timeout'], **kwargs)
+    finally:
+        metrics.observe('http_request_seconds', time.perf_counter() - started, host=urlsplit(url).netloc)
+    _note_rate_limit(url, response)
+    return response
+
+
+def post(url, json=None, timeout=None, **kwargs):
+    """POST pela sessão compartilhada"""
+    if _limiter is not None:
+        _limiter.acquire()
+    started = time.perf_counter()
+    try:
+        response = get_session().post(url, json=json, timeout=timeout or _config['timeout'], **kwargs)
+    finally:
+        metrics.observe('http_request_seconds', time.perf_counter() - started, host=urlsplit(url).netloc)
+    _note_rate_limit(url, response)
+    return response
+
+
+def _note_rate_limit(url, response):
+    """Guarda o tempo de espera pedido pelo host: Retry-After (429/503) ou cota esgotada (X-RateLimit-*)"""
+    headers = response.headers
+    delay = 0.0
+    if response.status_code in (429, 503):
+        delay = _seconds_until(headers.get('Retry-After'), default=1.0)
+    remaining = headers.get('X-RateLimit-Remaining') or headers.get('RateLimit-Remaining')
+    if remaining is not None and _to_float(remaining, 1.0) <= 0:
+        delay = max(delay, _seconds_until(headers.get('X-RateLimit-Reset') or headers.get('RateLimit-Reset'),
+                                          default=1.0))
+    if delay <= 0:
+        return
+    host = urlsplit(url).netloc
+    until = time.monotonic() + delay
+    with _lock:
+        _cooldowns[host] = max(_cooldowns.get(host, 0.0), until)
+    metrics.inc('http_rate_limited_total', host=host)
+
+
+def cooldown_remaining(url):
+    """Segundos que ainda faltam antes de chamar o host de `url` de novo (0 se liberado)"""
+    with _lock:
+        until = _cooldowns.get(urlsplit(url).netloc, 0.0)
+    return max(0.0, until - time.monotonic())
+
+
+def _seconds_until(value, default):
+    """Retry-After/Reset: segundos, timestamp Unix ou data HTTP"""
+    if value is None:
+        return default
+    number = _to_float(value, None)
+    if number is None:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+    if number > 1e9:
+        return max(0.0, number - time.time())
+    return max(0.0, number)
+
+
+def _to_float(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def close():
+    """Fecha as conexões abertas (usado no encerramento do daemon)"""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
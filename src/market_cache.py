@@ -0,0 +1,302 @@
+"""
+Cache persistente de metadados de mercado por asset_id (token do CLOB)
+
+Título e outcome (alertas) vêm das posições da Data API; tick size, neg risk e condition_id
+(montagem das ordens) vêm do CLOB em lote, pelo endpoint de múltiplos books (`/books`,
+até BOOKS_PER_REQUEST tokens por requisição). O fee rate é lido por asset só quando vamos
+operá-lo (na montagem da ordem, nas threads do executor) e reaproveitado entre os tokens
+do mesmo mercado (condition_id).
+
+O tick size muda quando o preço se aproxima de 0 ou 1, então expira após `ttl`; neg risk,
+condition_id e fee rate são fixos do mercado. Entradas menos usadas saem quando o cache
+passa de `max_entries` (LRU). O arquivo é regravado (escrita atômica) só quando algo mudou.
+
+`attach(client)` faz `get_tick_size`, `get_neg_risk` e `get_fee_rate_bps` do ClobClient
+consultarem o cache antes da rede; `create_order` e o OrderBatch passam a montar ordens
+sem requisições extras para assets já conhecidos.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+import metrics
+from state_journal import atomic_write_json
+
+BOOKS_PER_REQUEST = 100
+
+
+@dataclass(slots=True)
+class MarketInfo:
+    title: str = None
+    outcome: str = None
+    condition_id: str = None
+    tick_size: str = None
+    neg_risk: bool = None
+    fee_rate_bps: int = None
+    fetched_at: float = 0.0  # quando o tick size foi lido do CLOB (epoch)
+
+
+class MarketCache:
+    def __init__(self, path=None, ttl=6 * 3600, max_entries=50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # asset -> MarketInfo, menos usado primeiro
+        self._by_condition = {}        # condition_id -> {asset}
+        self._client = None
+        self._dirty = False
+        self._worker = None
+        self._lock = threading.RLock()
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ Cache de mercados ilegível ({e}). Começando vazio...")
+            return
+        fields = MarketInfo.__dataclass_fields__
+        for asset, raw in data.items():
+            info = MarketInfo(**{key: value for key, value in raw.items() if key in fields})
+            self._entries[asset] = info
+            self._index(asset, info)
+        self._evict()
+
+    def save(self):
+        """Grava o cache se algo mudou desde a última gravação"""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            data = {asset: asdict(info) for asset, info in self._entries.items()}
+            self._dirty = False
+        try:
+            atomic_write_json(self.path, data)
+        except OSError as e:
+            print(f"⚠️ Erro ao salvar cache de mercados: {e}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- Entradas (chamadas com self._lock) ---
+
+    def _entry(self, asset):
+        info = self._entries.get(asset)
+        if info is None:
+            info = self._entries[asset] = MarketInfo()
+            self._evict()
+        else:
+            self._entries.move_to_end(asset)
+        return info
+
+    def _index(self, asset, info):
+        if info.condition_id:
+            self._by_condition.setdefault(info.condition_id, set()).add(asset)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            asset, info = self._entries.popitem(last=False)
+            siblings = self._by_condition.get(info.condition_id)
+            if siblings is not None:
+                siblings.discard(asset)
+                if not siblings:
+                    del self._by_condition[info.condition_id]
+
+    def _fresh(self, info, now=None):
+        return info.tick_size is not None and (now or time.time()) - info.fetched_at < self.ttl
+
+    # --- Consultas ---
+
+    def get(self, asset):
+        """MarketInfo do asset (None se nunca visto)"""
+        with self._lock:
+            info = self._entries.get(asset)
+            if info is not None:
+                self._entries.move_to_end(asset)
+            return info
+
+    def by_condition(self, condition_id):
+        """Assets conhecidos de um mercado: {asset: MarketInfo}"""
+        with self._lock:
+            return {asset: self._entries[asset] for asset in self._by_condition.get(condition_id, ())}
+
+    def label(self, asset, title='Unknown', outcome='Unknown'):
+        """(título, outcome), completando com o cache o que vier vazio ou 'Unknown'"""
+        if title not in (None, 'Unknown') and outcome not in (None, 'Unknown'):
+            return title, outcome
+        info = self.get(asset)
+        if info is not None:
+            title = title if title not in (None, 'Unknown') else info.title or 'Unknown'
+            outcome = outcome if outcome not in (None, 'Unknown') else info.outcome or 'Unknown'
+        return title or 'Unknown', outcome or 'Unknown'
+
+    def remember(self, asset, title, outcome):
+        """Guarda título/outcome de uma posição (valores 'Unknown' são ignorados)"""
+        known_title = title if title not in (None, 'Unknown') else None
+        known_outcome = outcome if outcome not in (None, 'Unknown') else None
+        if known_title is None and known_outcome is None:
+            return
+        with self._lock:
+            info = self._entries.get(asset)
+            if info is not None and info.title == (known_title or info.title) \
+                    and info.outcome == (known_outcome or info.outcome):
+                return
+            info = self._entry(asset)
+            info.title = known_title or info.title
+            info.outcome = known_outcome or info.outcome
+            self._dirty = True
+
+    def stale(self, assets):
+        """Assets sem tick size/neg risk ou com tick size expirado"""
+        now = time.time()
+        with self._lock:
+            result = []
+            for asset in assets:
+                info = self._entries.get(asset)
+                if info is None or info.neg_risk is None or not self._fresh(info, now):
+                    result.append(asset)
+            return result
+
+    def invalidate(self, asset):
+        """Descarta o tick size de um asset (ex.: ordem rejeitada por tick inválido)"""
+        with self._lock:
+            info = self._entries.get(asset)
+            if info is not None:
+                info.tick_size = None
+                info.fetched_at = 0.0
+                self._dirty = True
+        if self._client is not None:
+            self._client.clear_tick_size_cache(asset)
+
+    # --- CLOB ---
+
+    def _store_book(self, summary):
+        """Metadados de um book do CLOB (tick_size, neg_risk e o condition_id em `market`)"""
+        if not summary or not summary.asset_id:
+            return
+        with self._lock:
+            info = self._entry(summary.asset_id)
+            if summary.tick_size:
+                info.tick_size = str(summary.tick_size)
+                info.fetched_at = time.time()
+            if summary.neg_risk is not None:
+                info.neg_risk = bool(summary.neg_risk)
+            if summary.market and summary.market != info.condition_id:
+                info.condition_id = summary.market
+                self._index(summary.asset_id, info)
+            self._dirty = True
+
+    def fetch(self, client, assets):
+        """Busca no CLOB, em lote, os metadados dos assets desatualizados. Retorna os books lidos."""
+        from py_clob_client.clob_types import BookParams
+
+        books = []
+        pending = self.stale(dict.fromkeys(assets))
+        for start in range(0, len(pending), BOOKS_PER_REQUEST):
+            chunk = pending[start:start + BOOKS_PER_REQUEST]
+            try:
+                with metrics.span('get_order_books'):
+                    summaries = client.get_order_books([BookParams(token_id=asset) for asset in chunk])
+            except Exception as e:
+                # Mercado fechado/resolvido no lote: cada asset é resolvido no próprio trade
+                print(f"⚠️ Erro ao buscar metadados de {len(chunk)} mercado(s): {e}")
+                continue
+            for summary in summaries:
+                self._store_book(summary)
+            books.extend(summaries)
+        return books
+
+    def _fee_rate(self, asset):
+        """Fee rate em cache do asset ou de outro token do mesmo mercado"""
+        with self._lock:
+            info = self._entries.get(asset)
+            if info is None:
+                return None
+            if info.fee_rate_bps is None and info.condition_id:
+                for sibling in self._by_condition.get(info.condition_id, ()):
+                    fee = self._entries[sibling].fee_rate_bps
+                    if fee is not None:
+                        info.fee_rate_bps = fee
+                        self._dirty = True
+                        break
+            return info.fee_rate_bps
+
+    def _set(self, asset, field, value):
+        with self._lock:
+            info = self._entry(asset)
+            setattr(info, field, value)
+            if field == 'tick_size':
+                info.fetched_at = time.time()
+            self._dirty = True
+
+    def prefetch(self, client, position_maps):
+        """Lê títulos/outcomes das posições e busca em lote os metadados do CLOB dos assets"""
+        assets = []
+        for positions in position_maps:
+            for asset, position in positions.items():
+                self.remember(asset, position.title, position.outcome)
+                assets.append(asset)
+        if client is not None:
+            with metrics.span('market_prefetch'):
+                self.fetch(client, assets)
+        self.save()
+
+    def prefetch_async(self, client, position_maps):
+        """`prefetch` numa thread própria; ignorado se o anterior ainda estiver rodando.
+
+        Os mapas não podem ser alterados depois da chamada (o bot sempre troca o estado por um novo).
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return False
+            self._worker = threading.Thread(target=self._prefetch_safely, args=(client, list(position_maps)),
+                                            name='market-prefetch', daemon=True)
+            self._worker.start()
+            return True
+
+    def _prefetch_safely(self, client, position_maps):
+        try:
+            self.prefetch(client, position_maps)
+        except Exception as e:
+            print(f"⚠️ Erro no prefetch de mercados: {e}")
+
+    def attach(self, client):
+        """Consultas de tick size, neg risk e fee rate do cliente passam a usar o cache"""
+        self._client = client
+        for name, field in (('get_tick_size', 'tick_size'), ('get_neg_risk', 'neg_risk'),
+                            ('get_fee_rate_bps', 'fee_rate_bps')):
+            setattr(client, name, self._resolver(field, getattr(client, name)))
+
+    def _resolver(self, field, lookup):
+        def resolve(token_id):
+            with self._lock:
+                info = self._entries.get(token_id)
+                if field == 'fee_rate_bps':
+                    value = self._fee_rate(token_id)
+                elif info is None or (field == 'tick_size' and not self._fresh(info)):
+                    value = None
+                else:
+                    value = getattr(info, field)
+                if value is not None:
+                    self._entries.move_to_end(token_id)
+            if value is not None:
+                metrics.inc('market_cache_total', result='hit')
+                return value
+            metrics.inc('market_cache_total', result='miss')
+            value = lookup(token_id)
+            self._set(token_id, field, value)
+            return value
+        return resolve
+
+    def close(self, timeout=None):
+        """Espera o prefetch em andamento e grava o cache"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        self.save()
@@ -0,0 +1,192 @@
+"""
+Métricas do bot: tempo de cada etapa do ciclo e contadores de mudanças, ordens, erros e retries
+
+Sem dependências externas. As etapas são medidas com `span` e guardadas em histogramas
+com buckets fixos (mesmo modelo do Prometheus); no modo daemon ficam expostas em
+`/metrics` (formato texto do Prometheus) e, na execução única, vão para um resumo JSON:
+
+    with metrics.span('get_order_book'):
+        book = orderbook_cache.fetch(client, asset_id)
+    metrics.inc('orders_total', side='BUY', result='posted')
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'polybot_'
+# Limites superiores dos buckets, em segundos (de chamadas locais a requisições lentas)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # último = acima do maior bucket (+Inf)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(BUCKETS) and value > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimativa por interpolação linear dentro do bucket (como o histogram_quantile do Prometheus)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self.started_at = time.time()
+        self._counters = {}    # (nome, labels) -> valor
+        self._histograms = {}  # (nome, labels) -> Histogram
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Mede o bloco em `stage_seconds{stage=...}`; exceções contam em `errors_total{stage=...}`"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('errors_total', stage=stage)
+            raise
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - started, stage=stage, **labels)
+
+    def render(self):
+        """Formato texto de exposição do Prometheus"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                typed.add(name)
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Resumo em dict (execução única): tempo por etapa e contadores"""
+        with self._lock:
+            result = {
+                'started_at': self.started_at,
+                'duration_s': time.time() - self.started_at,
+                'stages': {},
+                'timings': {},
+                'counters': {},
+            }
+            for (name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0]):
+                stats = {
+                    'count': h.count,
+                    'total_ms': h.sum * 1000,
+                    'mean_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                    'p50_ms': h.quantile(0.5) * 1000,
+                    'p95_ms': h.quantile(0.95) * 1000,
+                    'max_ms': h.max * 1000,
+                }
+                label_map = dict(labels)
+                if name == 'stage_seconds' and list(label_map) == ['stage']:
+                    result['stages'][label_map['stage']] = stats
+                else:
+                    result['timings'][f"{name}{_labels(labels)}"] = stats
+            for (name, labels), value in sorted(self._counters.items()):
+                result['counters'][f"{name}{_labels(labels)}"] = value
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+# Registro do processo (usado por bot, order_batch, notifier e http_client)
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+span = registry.span
+render = registry.render
+summary = registry.summary
+
+
+def write_summary(path):
+    """Grava o resumo da execução em JSON"""
+    with open(path, 'w') as f:
+        json.dump(summary(), f, indent=2)
+
+
+def serve(port, host='127.0.0.1'):
+    """Expõe GET /metrics numa thread própria. Retorna o servidor (para `shutdown`)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
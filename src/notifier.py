@@ -0,0 +1,187 @@
+"""
+Fila de notificações do Telegram fora do caminho do trading
+
+Os alertas de um ciclo são acumulados e, ao final dele, agrupados num digest (partido
+em mensagens de até MAX_MESSAGE_LENGTH caracteres). Uma thread envia os digests
+respeitando o intervalo mínimo por chat e o `retry_after` das respostas 429. O que
+ainda não foi enviado fica num arquivo de spool e é reenviado na próxima execução.
+"""
+
+import json
+import os
+import threading
+import time
+
+import http_client
+import metrics
+from state_journal import atomic_write_json
+
+MAX_MESSAGE_LENGTH = 4096  # limite do Telegram por mensagem
+SEPARATOR = "\n\n"
+
+
+class TelegramNotifier:
+    def __init__(self, token, chat_id, spool_path=None, min_interval=1.0, api_url="https://api.telegram.org"):
+        self.url = f"{api_url}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.spool_path = spool_path
+        self.min_interval = min_interval  # segundos entre mensagens no mesmo chat
+
+        self._buffer = []   # alertas do ciclo atual
+        self._pending = self._load_spool()  # mensagens prontas para envio
+        self._cond = threading.Condition()
+        self._sending = False
+        self._stopped = False
+        self._thread = None
+        self._last_sent = 0.0
+
+    # --- API usada pelo bot ---
+
+    def enqueue(self, message):
+        """Adiciona um alerta ao digest do ciclo (não bloqueia)"""
+        with self._cond:
+            self._buffer.append(message)
+
+    def flush(self):
+        """Fecha o digest do ciclo e entrega à thread de envio"""
+        with self._cond:
+            if self._buffer:
+                self._pending.extend(build_digest(self._buffer))
+                self._buffer = []
+                self._save_spool()
+            if self._pending:
+                self._ensure_thread()
+                self._cond.notify_all()
+
+    def close(self, timeout=30):
+        """Envia o que der dentro de `timeout`; o resto fica no spool para a próxima execução"""
+        self.flush()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while (self._pending or self._sending) and self._thread is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"⚠️ {len(self._pending)} mensagem(ns) do Telegram mantida(s) no spool")
+                    break
+                self._cond.wait(remaining)
+            self._stopped = True
+            self._save_spool()
+            self._cond.notify_all()
+
+    # --- Thread de envio ---
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name='telegram', daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                message = self._pending[0]
+                self._sending = True
+
+            wait = self._last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            delivered, retry_after = self._send(message)
+            self._last_sent = time.monotonic()
+            metrics.inc('telegram_messages_total', result='delivered' if delivered else 'retry')
+
+            with self._cond:
+                self._sending = False
+                if delivered and self._pending and self._pending[0] is message:
+                    self._pending.pop(0)
+                    self._save_spool()
+                self._cond.notify_all()
+            if retry_after:
+                time.sleep(retry_after)
+
+    def _send(self, message, parse_mode='Markdown'):
+        """Retorna (entregue_ou_descartada, segundos_para_esperar)"""
+        data = {
+            'chat_id': self.chat_id,
+            'text': message,
+            'disable_web_page_preview': True
+        }
+        if parse_mode:
+            data['parse_mode'] = parse_mode
+        try:
+            response = http_client.post(self.url, json=data, timeout=10)
+        except Exception as e:
+            print(f"Erro ao enviar mensagem: {e}")
+            return False, 5
+
+        if response.status_code == 429:
+            retry_after = _retry_after(response)
+            print(f"⏳ Telegram rate limit: aguardando {retry_after}s")
+            return False, retry_after
+        if response.status_code == 400 and parse_mode:
+            # Markdown inválido (ex.: título com '_'): reenvia como texto puro
+            return self._send(message, parse_mode=None)
+        if not response.ok:
+            print(f"Erro ao enviar mensagem: HTTP {response.status_code} {response.text[:200]}")
+            # 4xx não melhora com nova tentativa: descarta; 5xx tenta de novo
+            return response.status_code < 500, 5 if response.status_code >= 500 else 0
+        print("Mensagem enviada com sucesso!")
+        return True, 0
+
+    # --- Spool ---
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return []
+        try:
+            with open(self.spool_path, 'r') as f:
+                pending = json.load(f)
+            if pending:
+                print(f"📬 {len(pending)} mensagem(ns) do Telegram pendente(s) da execução anterior")
+            return list(pending)
+        except Exception as e:
+            print(f"⚠️ Spool do Telegram ilegível: {e}")
+            return []
+
+    def _save_spool(self):
+        if not self.spool_path:
+            return
+        try:
+            if self._pending:
+                atomic_write_json(self.spool_path, self._pending)
+            elif os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+        except OSError as e:
+            print(f"⚠️ Erro ao gravar spool do Telegram: {e}")
+
+
+def build_digest(messages):
+    """Agrupa os alertas de um ciclo em mensagens de até MAX_MESSAGE_LENGTH caracteres"""
+    if len(messages) == 1:
+        return [messages[0][:MAX_MESSAGE_LENGTH]]
+    header = f"📬 *{len(messages)} alertas*"
+    digests = []
+    current = header
+    for message in messages:
+        message = message[:MAX_MESSAGE_LENGTH - len(header) - len(SEPARATOR)]
+        if len(current) + len(SEPARATOR) + len(message) > MAX_MESSAGE_LENGTH:
+            digests.append(current)
+            current = message
+        else:
+            current += SEPARATOR + message
+    digests.append(current)
+    return digests
+
+
+def _retry_after(response):
+    """Segundos pedidos pelo Telegram num 429 (corpo `parameters.retry_after` ou header Retry-After)"""
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except Exception:
+        pass
+    try:
+        return float(response.headers.get('Retry-After', 5))
+    except ValueError:
+        return 5.0
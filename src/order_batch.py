@@ -0,0 +1,306 @@
+"""
+Envio em lote das ordens de um ciclo de detecção
+
+As ordens geradas pelos copy trades de um ciclo são acumuladas, assinadas e enviadas pelo
+endpoint de múltiplas ordens do CLOB (`post_orders`, até MAX_ORDERS_PER_POST por requisição).
+Uma assinatura EIP-712 custa ~10ms de CPU: com o pool de processos já aquecido (modo daemon)
+as ordens são assinadas em paralelo; subir o pool leva segundos, então sem ele a assinatura
+é feita no processo atual. Se o endpoint falhar como um todo, cai para envios individuais em
+paralelo, reenviando só as ordens que o CLOB ainda não conhece (o lote pode ter sido aceito
+antes da falha).
+
+`WarmOrderBuilder` mantém o signer e o domínio EIP-712 de cada exchange prontos entre
+ordens (o builder da biblioteca os recria a cada assinatura).
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from py_clob_client.clob_types import CreateOrderOptions, OrderArgs, PostOrdersArgs
+from py_clob_client.config import get_contract_config
+from py_clob_client.exceptions import PolyApiException
+from py_clob_client.order_builder.builder import ROUNDING_CONFIG, OrderBuilder
+from py_clob_client.signer import Signer
+from py_clob_client.utilities import price_valid
+from py_order_utils.builders import OrderBuilder as UtilsOrderBuilder
+from py_order_utils.model import OrderData
+from py_order_utils.signer import Signer as UtilsSigner
+
+import metrics
+
+MAX_ORDERS_PER_POST = 15
+
+
+class WarmOrderBuilder(OrderBuilder):
+    """OrderBuilder que reaproveita signer e domínio EIP-712 por exchange (normal / neg risk)"""
+
+    def __init__(self, signer, sig_type=None, funder=None):
+        super().__init__(signer, sig_type=sig_type, funder=funder)
+        self._utils_signer = None
+        self._utils_builders = {}
+        self._lock = threading.Lock()
+
+    def _utils_builder(self, neg_risk):
+        builder = self._utils_builders.get(neg_risk)
+        if builder is None:
+            with self._lock:
+                if self._utils_signer is None:
+                    self._utils_signer = UtilsSigner(key=self.signer.private_key)
+                contract_config = get_contract_config(self.signer.get_chain_id(), neg_risk)
+                builder = UtilsOrderBuilder(contract_config.exchange, self.signer.get_chain_id(), self._utils_signer)
+                self._utils_builders[neg_risk] = builder
+        return builder
+
+    def create_order(self, order_args, options):
+        side, maker_amount, taker_amount = self.get_order_amounts(
+            order_args.side,
+            order_args.size,
+            order_args.price,
+            ROUNDING_CONFIG[options.tick_size],
+        )
+        data = OrderData(
+            maker=self.funder,
+            taker=order_args.taker,
+            tokenId=order_args.token_id,
+            makerAmount=str(maker_amount),
+            takerAmount=str(taker_amount),
+            side=side,
+            feeRateBps=str(order_args.fee_rate_bps),
+            nonce=str(order_args.nonce),
+            signer=self.signer.address(),
+            expiration=str(order_args.expiration),
+            signatureType=self.sig_type,
+        )
+        return self._utils_builder(bool(options.neg_risk)).build_signed_order(data)
+
+    def order_id(self, signed_order, neg_risk):
+        """Hash EIP-712 da ordem assinada: é o ID que o CLOB atribui a ela"""
+        return self._utils_builder(bool(neg_risk))._create_struct_hash(signed_order.order)
+
+    def warm_up(self):
+        """Prepara os dois exchanges e assina uma ordem descartável (nada é enviado)"""
+        for neg_risk in (False, True):
+            self.create_order(OrderArgs(token_id='1', price=0.5, size=10, side='BUY'),
+                              CreateOrderOptions(tick_size='0.01', neg_risk=neg_risk))
+
+
+# Builder do processo de assinatura (criado uma vez por worker)
+_worker_builder = None
+
+
+def _init_worker(private_key, chain_id, signature_type, funder):
+    global _worker_builder
+    _worker_builder = WarmOrderBuilder(Signer(private_key, chain_id), sig_type=signature_type, funder=funder)
+    _worker_builder.warm_up()
+
+
+def _ready():
+    return True
+
+
+def _sign(order_args, tick_size, neg_risk):
+    return _worker_builder.create_order(order_args, CreateOrderOptions(tick_size=tick_size, neg_risk=neg_risk))
+
+
+class SigningPool:
+    """Pool de processos que assina ordens fora do GIL"""
+
+    def __init__(self, private_key, chain_id, signature_type, funder, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._init_args = (private_key, chain_id, signature_type, funder)
+        self._pool = None
+        self._warming = []  # futures do warm_up: o pool só é usado depois que todos responderem
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: o processo principal tem threads (executor, WebSocket), fork não é seguro
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=self._init_args,
+                )
+            return self._pool
+
+    def warm_up(self):
+        """Sobe os processos de assinatura em segundo plano (sem esperar)"""
+        if self.workers <= 1:
+            return
+        pool = self._get_pool()
+        self._warming = [pool.submit(_ready) for _ in range(self.workers)]
+
+    def is_warm(self):
+        """Processos de assinatura já no ar (warm_up concluído sem erro)"""
+        warming = self._warming
+        return bool(warming) and all(future.done() and future.exception() is None for future in warming)
+
+    def sign_all(self, client, jobs):
+        """Assina [(order_args, tick_size, neg_risk)]. Retorna [(ordem_assinada, erro)] na mesma ordem."""
+        if len(jobs) <= 1 or not self.is_warm():
+            # Uma ordem só, ou pool ainda não no ar (spawn leva segundos): assinar aqui é mais rápido
+            return _sign_here(client, jobs)
+        pool = self._get_pool()
+        try:
+            futures = [pool.submit(_sign, args, tick, neg) for args, tick, neg in jobs]
+            results = [_call(future.result) for future in futures]
+        except BrokenProcessPool as e:
+            results = [(None, e)]
+        if not any(isinstance(error, BrokenProcessPool) for _, error in results):
+            return results
+        # Um worker morreu: o executor não se recupera sozinho, então é recriado para os próximos lotes
+        print("⚠️ Pool de assinatura quebrado. Recriando e assinando este lote no processo atual...")
+        self._discard(pool)
+        self.warm_up()
+        return _sign_here(client, jobs)
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self._warming = []
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+                self._warming = []
+
+
+def _sign_here(client, jobs):
+    """Assina no processo atual, com o builder do cliente"""
+    return [_call(lambda: client.builder.create_order(args, CreateOrderOptions(tick_size=tick, neg_risk=neg)))
+            for args, tick, neg in jobs]
+
+
+def _call(fn):
+    try:
+        return fn(), None
+    except Exception as e:
+        return None, e
+
+
+class OrderBatch:
+    """Ordens de um ciclo. `add` é chamado pelas threads do executor; `submit` ao final do ciclo."""
+
+    def __init__(self, client, signing_pool):
+        self.client = client
+        self.signing_pool = signing_pool
+        self._tickets = []  # [(jobs, on_done)]
+        self._lock = threading.Lock()
+
+    def add(self, orders, on_done):
+        """Enfileira as ordens de um trade. `on_done([(resposta, erro)])` é chamado após o envio.
+
+        Tick size, neg risk e fee rate são resolvidos aqui (em paralelo, nas threads do executor)
+        para que a assinatura no pool de processos não precise de rede.
+        """
+        jobs = []
+        with metrics.span('order_metadata'):
+            for order_args in orders:
+                tick_size = self.client.get_tick_size(order_args.token_id)
+                if not price_valid(order_args.price, tick_size):
+                    raise ValueError(f"preço ({order_args.price}) inválido para tick {tick_size}")
+                neg_risk = self.client.get_neg_risk(order_args.token_id)
+                order_args.fee_rate_bps = self.client.get_fee_rate_bps(order_args.token_id)
+                jobs.append((order_args, tick_size, neg_risk))
+        with self._lock:
+            self._tickets.append((jobs, on_done))
+
+    def __len__(self):
+        return sum(len(jobs) for jobs, _ in self._tickets)
+
+    def submit(self):
+        """Assina e envia todas as ordens acumuladas; repassa o resultado de cada uma ao seu trade"""
+        with self._lock:
+            tickets, self._tickets = self._tickets, []
+        if not tickets:
+            return
+
+        jobs = [job for ticket_jobs, _ in tickets for job in ticket_jobs]
+        results = [None] * len(jobs)
+        try:
+            self._sign_and_post(jobs, results)
+        except Exception as e:
+            # Falha fora de uma ordem específica: os trades ainda liquidam reservas e alertam o erro
+            print(f"❌ Erro no envio do lote: {e}")
+            results = [result or (None, e) for result in results]
+
+        offset = 0
+        for ticket_jobs, on_done in tickets:
+            try:
+                on_done(results[offset:offset + len(ticket_jobs)])
+            except Exception as e:
+                print(f"❌ Erro ao aplicar resultado do lote: {e}")
+            offset += len(ticket_jobs)
+
+    def _sign_and_post(self, jobs, results):
+        """Assina e posta `jobs`, preenchendo `results` [(resposta, erro)] na mesma ordem"""
+        with metrics.span('sign'):
+            signed = self.signing_pool.sign_all(self.client, jobs)
+
+        to_post = []
+        for i, ((order, error), (_, _, neg_risk)) in enumerate(zip(signed, jobs)):
+            if error is not None:
+                results[i] = (None, error)
+            else:
+                to_post.append((i, order, neg_risk))
+
+        for start in range(0, len(to_post), MAX_ORDERS_PER_POST):
+            chunk = to_post[start:start + MAX_ORDERS_PER_POST]
+            with metrics.span('post_orders'):
+                chunk_results = self._post_chunk([(order, neg_risk) for _, order, neg_risk in chunk])
+            for (i, _, _), result in zip(chunk, chunk_results):
+                results[i] = result
+
+        print(f"📦 Lote enviado: {len(to_post)}/{len(jobs)} ordem(ns) assinada(s) e postada(s)")
+
+    def _post_chunk(self, chunk):
+        """Posta até MAX_ORDERS_PER_POST ordens [(ordem_assinada, neg_risk)] em uma requisição.
+
+        Fallback: posts individuais em paralelo, só das ordens que o CLOB ainda não conhece.
+        """
+        orders = [order for order, _ in chunk]
+        if len(orders) == 1:
+            return [_order_result(*_call(lambda: self.client.post_order(orders[0])))]
+        try:
+            responses = self.client.post_orders([PostOrdersArgs(order=order) for order in orders])
+            if isinstance(responses, list) and len(responses) == len(orders):
+                return [_order_result(resp) for resp in responses]
+            print(f"⚠️ Resposta inesperada do envio em lote: {responses}. Enviando individualmente...")
+        except Exception as e:
+            print(f"⚠️ Envio em lote falhou ({e}). Enviando individualmente...")
+
+        with ThreadPoolExecutor(max_workers=min(len(orders), MAX_ORDERS_PER_POST)) as pool:
+            futures = [pool.submit(self._post_unless_known, order, neg_risk) for order, neg_risk in chunk]
+            return [_order_result(*_call(future.result)) for future in futures]
+
+    def _post_unless_known(self, order, neg_risk):
+        """Posta a ordem, a menos que o lote que falhou já a tenha registrado no CLOB.
+
+        Se a consulta falhar, a ordem fica com erro em vez de ser reenviada às cegas.
+        """
+        order_id = self.client.builder.order_id(order, neg_risk)
+        try:
+            known = self.client.get_order(order_id)
+        except PolyApiException as e:
+            if e.status_code != 404:
+                raise
+            known = None
+        if isinstance(known, dict) and known.get('id'):
+            print(f"🔁 Ordem {order_id[:10]}... já aceita pelo CLOB ({known.get('status')}); não reenviada")
+            return {'success': True, 'orderID': order_id, 'status': known.get('status')}
+        return self.client.post_order(order)
+
+
+def _order_result(resp, error=None):
+    """Normaliza a resposta de uma ordem: erro se a API marcou success=false"""
+    if error is None and isinstance(resp, dict) and resp.get('success') is False:
+        return resp, Exception(resp.get('errorMsg') or 'ordem rejeitada')
+    return resp, error
@@ -0,0 +1,152 @@
+"""
+Cache local de order books por asset_id
+
+Cada lado do book é mantido como lista de preços ordenada (bisect) + mapa preço -> size,
+então o melhor bid/ask é lido em O(1). Books vindos do REST expiram após `ttl` segundos;
+books alimentados pelo WebSocket ficam válidos enquanto o feed estiver conectado.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+
+
+class PriceLevels:
+    """Níveis de preço de um lado do book, ordenados de forma crescente"""
+    __slots__ = ('prices', 'sizes')
+
+    def __init__(self, levels=()):
+        self.sizes = {}
+        for price, size in levels:
+            if size > 0:
+                self.sizes[price] = size
+        self.prices = sorted(self.sizes)
+
+    def set(self, price, size):
+        """Atualiza um nível (size 0 remove)"""
+        if size > 0:
+            if price not in self.sizes:
+                insort(self.prices, price)
+            self.sizes[price] = size
+        elif price in self.sizes:
+            del self.sizes[price]
+            del self.prices[bisect_left(self.prices, price)]
+
+    def lowest(self):
+        return self.prices[0] if self.prices else None
+
+    def highest(self):
+        return self.prices[-1] if self.prices else None
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class OrderBook:
+    __slots__ = ('bids', 'asks', 'updated_at', 'live')
+
+    def __init__(self, bids=(), asks=(), live=False):
+        self.bids = PriceLevels(bids)
+        self.asks = PriceLevels(asks)
+        self.updated_at = time.monotonic()
+        self.live = live  # mantido pelo WebSocket (não expira por TTL)
+
+    def best_bid(self):
+        return self.bids.highest()
+
+    def best_ask(self):
+        return self.asks.lowest()
+
+    def depth(self, side):
+        """Níveis que executam uma ordem `side`, melhor primeiro: (preços, sizes).
+
+        BUY consome os asks (crescente); SELL consome os bids (decrescente).
+        """
+        if side.upper() == 'BUY':
+            prices = list(self.asks.prices)
+            sizes = self.asks.sizes
+        else:
+            prices = self.bids.prices[::-1]
+            sizes = self.bids.sizes
+        return prices, [sizes[price] for price in prices]
+
+
+def _levels(raw_levels):
+    """Converte níveis da API ([{price, size}] ou OrderSummary) em tuplas (float, float)"""
+    parsed = []
+    for level in raw_levels or []:
+        if isinstance(level, dict):
+            parsed.append((float(level['price']), float(level['size'])))
+        else:
+            parsed.append((float(level.price), float(level.size)))
+    return parsed
+
+
+class OrderBookCache:
+    def __init__(self, ttl=2.0):
+        self.ttl = ttl
+        self._books = {}
+        self._lock = threading.Lock()
+
+    def put_snapshot(self, asset_id, bids, asks, live=False):
+        """Substitui o book inteiro de um asset (REST ou evento `book` do WebSocket)"""
+        book = OrderBook(_levels(bids), _levels(asks), live=live)
+        with self._lock:
+            self._books[asset_id] = book
+        return book
+
+    def apply_change(self, asset_id, side, price, size):
+        """Aplica um update incremental (evento `price_change`): side BUY = bids, SELL = asks"""
+        with self._lock:
+            book = self._books.get(asset_id)
+            if book is None:
+                # Sem snapshot ainda: um book parcial daria preço errado
+                return
+            levels = book.bids if side.upper() == 'BUY' else book.asks
+            levels.set(float(price), float(size))
+            book.updated_at = time.monotonic()
+
+    def set_live(self, asset_ids, live):
+        """Marca books como mantidos (ou não mais) pelo WebSocket"""
+        with self._lock:
+            for asset_id in asset_ids:
+                book = self._books.get(asset_id)
+                if book is not None:
+                    book.live = live
+
+    def get(self, asset_id):
+        """Book em cache se ainda válido, senão None"""
+        with self._lock:
+            book = self._books.get(asset_id)
+        if book is None:
+            return None
+        if not book.live and time.monotonic() - book.updated_at > self.ttl:
+            return None
+        return book
+
+    def peek(self, asset_id):
+        """Book em cache independente da validade (None se nunca visto)"""
+        with self._lock:
+            return self._books.get(asset_id)
+
+    def fetch(self, client, asset_id):
+        """Book válido do cache ou, na falta, via REST (que atualiza o cache)"""
+        book = self.get(asset_id)
+        if book is None:
+            summary = client.get_order_book(asset_id)
+            book = self.put_snapshot(asset_id, summary.bids, summary.asks)
+        return book
+
+    def depth(self, client, asset_id, side):
+        """`OrderBook.depth` do book válido (REST na falta), lido sob o lock: o WebSocket altera
+        os níveis dos books ao vivo em outra thread"""
+        book = self.fetch(client, asset_id)
+        with self._lock:
+            return book.depth(side)
+
+    def invalidate(self, asset_id):
+        """Descarta um book do REST (ex.: após nossa ordem consumir liquidez); books ao vivo são mantidos"""
+        with self._lock:
+            book = self._books.get(asset_id)
+            if book is not None and not book.live:
+                del self._books[asset_id]
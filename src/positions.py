@@ -0,0 +1,64 @@
+"""
+Registro compacto de posição usado em todo o pipeline (detecção, alertas, trades e estado)
+
+A Data API devolve dezenas de campos por posição; só os lidos pelo bot são guardados,
+com os numéricos convertidos uma única vez na entrada. `__slots__` evita um dict por
+registro, o que pesa em carteiras com milhares de posições.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class Position:
+    asset: str
+    size: float = 0.0
+    title: str = 'Unknown'
+    outcome: str = 'Unknown'
+    avg_price: float = 0.0
+    current_value: float = 0.0
+    percent_pnl: float = 0.0
+
+    @classmethod
+    def from_api(cls, raw):
+        """Converte um item de /positions"""
+        return cls(
+            asset=raw['asset'],
+            size=_float(raw.get('size')),
+            title=raw.get('title') or 'Unknown',
+            outcome=raw.get('outcome') or 'Unknown',
+            avg_price=_float(raw.get('avgPrice')),
+            current_value=_float(raw.get('currentValue')),
+            percent_pnl=_float(raw.get('percentPnl')),
+        )
+
+    def to_api(self):
+        """Formato de /positions (gravação de snapshots para o replay offline)"""
+        return {
+            'asset': self.asset,
+            'size': self.size,
+            'title': self.title,
+            'outcome': self.outcome,
+            'avgPrice': self.avg_price,
+            'currentValue': self.current_value,
+            'percentPnl': self.percent_pnl,
+        }
+
+    def state(self):
+        """Registro reduzido ao que é persistido entre ciclos (size, title, outcome)"""
+        return Position(self.asset, self.size, self.title, self.outcome)
+
+    def to_state(self):
+        """Formato em disco do estado (mesmo JSON de last_positions_<carteira>.json)"""
+        return {'size': self.size, 'title': self.title, 'outcome': self.outcome}
+
+    @classmethod
+    def from_state(cls, asset, data):
+        return cls(asset, _float(data.get('size')), data.get('title') or 'Unknown', data.get('outcome') or 'Unknown')
+
+
+def _float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
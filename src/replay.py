@@ -0,0 +1,392 @@
+"""
+Replay offline da estratégia de copy trade contra um CLOB simulado
+
+Lê séries gravadas de snapshots de /positions (SNAPSHOT_RECORD_FILE do bot) e, opcionalmente,
+frames do canal `market` do CLOB (WS_RECORD_FILE), em ordem de tempo. Cada snapshot passa pela
+detecção real do bot (`detect_changes`) e cada mudança pelo `execute_trade` real, só que com
+um cliente simulado: as ordens executam contra a profundidade do book daquele instante (mais
+`--delay` segundos de atraso do copy), e saldo e posições ficam em memória.
+
+    python src/replay.py snapshots.jsonl frames.jsonl --amount 2 --max-slippage 0.05 --delay 2
+    python src/replay.py --synthetic 5000            # dados sintéticos (smoke test / throughput)
+
+Sem book gravado para um asset, usa um book sintético em torno do último preço conhecido
+(`--spread`, `--depth`). Ordens são IOC: o que não executa no limite é descartado.
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import bot
+from market_cache import MarketCache
+from orderbook_cache import OrderBookCache
+from positions import Position
+from scheduler import WalletTarget
+from sizing import SIZING_MODES, size_changes
+from ws_feed import apply_market_event
+
+
+class SimulatedClob:
+    """Cliente CLOB simulado: books do replay, execução contra a profundidade e carteira em memória"""
+
+    def __init__(self, balance, spread=0.02, depth=500.0):
+        self.books = OrderBookCache(ttl=math.inf)
+        self.cash = balance
+        self.holdings = {}   # asset -> shares
+        self.marks = {}      # asset -> último preço conhecido (mid do book ou preço da carteira seguida)
+        self.spread = spread
+        self.depth = depth
+        self.fills = []
+        self.context = None  # mudança sendo executada (para o relatório)
+        self._order_ids = itertools.count(1)
+
+    def get_address(self):
+        return '0xreplay'
+
+    def get_order_book(self, asset_id):
+        book = self.books.peek(asset_id)
+        if book is None:
+            book = self._synthetic_book(asset_id)
+        return SimpleNamespace(
+            bids=[{'price': p, 'size': s} for p, s in zip(*book.depth('SELL'))],
+            asks=[{'price': p, 'size': s} for p, s in zip(*book.depth('BUY'))],
+        )
+
+    def _synthetic_book(self, asset_id):
+        mark = self.marks.get(asset_id)
+        if not mark:
+            return self.books.put_snapshot(asset_id, [], [])
+        bid = round(max(0.01, mark - self.spread / 2), 2)
+        ask = round(min(0.99, mark + self.spread / 2), 2)
+        bids = [{'price': round(bid - i * 0.01, 2), 'size': self.depth} for i in range(5) if bid - i * 0.01 > 0]
+        asks = [{'price': round(ask + i * 0.01, 2), 'size': self.depth} for i in range(5) if ask + i * 0.01 < 1]
+        return self.books.put_snapshot(asset_id, bids, asks)
+
+    def create_and_post_order(self, order_args):
+        """Executa como IOC contra o book simulado, consumindo a liquidez usada"""
+        asset_id, side = order_args.token_id, order_args.side.upper()
+        book = self.books.peek(asset_id) or self._synthetic_book(asset_id)
+        levels = book.asks if side == 'BUY' else book.bids
+        prices, sizes = book.depth(side)
+
+        remaining, filled, cost = order_args.size, 0.0, 0.0
+        for price, size in zip(prices, sizes):
+            if remaining <= 1e-9:
+                break
+            if (side == 'BUY' and price > order_args.price) or (side == 'SELL' and price < order_args.price):
+                break
+            take = min(size, remaining)
+            levels.set(price, size - take)
+            remaining -= take
+            filled += take
+            cost += take * price
+
+        if filled > 0:
+            if side == 'BUY':
+                self.cash -= cost
+                self.holdings[asset_id] = self.holdings.get(asset_id, 0.0) + filled
+            else:
+                self.cash += cost
+                self.holdings[asset_id] = max(0.0, self.holdings.get(asset_id, 0.0) - filled)
+            self.fills.append({
+                'asset': asset_id, 'side': side, 'size': filled, 'price': cost / filled,
+                'limit': order_args.price, 'unfilled': remaining, **(self.context or {}),
+            })
+        return {
+            'success': True,
+            'orderID': f"sim-{next(self._order_ids)}",
+            'status': 'matched' if remaining <= 1e-9 else ('partial' if filled else 'unmatched'),
+            'makingAmount': str(cost if side == 'BUY' else filled),
+            'takingAmount': str(filled if side == 'BUY' else cost),
+        }
+
+
+class SimulatedBalance:
+    """Mesma interface do BalanceCache, sobre o caixa do CLOB simulado"""
+
+    def __init__(self, clob):
+        self.clob = clob
+        self.reserved = 0.0
+
+    def available(self):
+        return self.clob.cash - self.reserved
+
+    def reserve(self, amount):
+        free = self.available()
+        if amount > free:
+            return False, free
+        self.reserved += amount
+        return True, free
+
+    def commit(self, amount):
+        self.reserved = max(0.0, self.reserved - amount)
+
+    def release(self, amount):
+        self.reserved = max(0.0, self.reserved - amount)
+
+    def invalidate(self):
+        pass
+
+
+class SimulatedOwnPositions:
+    """Mesma interface do OwnPositions, lendo as posições do CLOB simulado"""
+
+    def __init__(self, clob):
+        self.clob = clob
+
+    def size(self, asset_id):
+        return self.clob.holdings.get(asset_id, 0.0)
+
+    def reduce(self, asset_id, sold_size):
+        pass  # o CLOB simulado já atualizou as posições na execução
+
+
+def load_events(paths):
+    """Eventos de todos os arquivos em ordem de tempo: ('snapshot', ts, dados) ou ('market', ts, evento)"""
+    events = []
+    for path in paths:
+        last_ts = 0.0
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line == 'PONG':
+                    continue
+                try:
+                    payload = json.loads(line)
+                except ValueError:
+                    continue
+                for item in payload if isinstance(payload, list) else [payload]:
+                    if 'positions' in item:
+                        last_ts = float(item.get('ts', last_ts))
+                        events.append(('snapshot', last_ts, item))
+                    elif 'event_type' in item:
+                        # Frames do CLOB trazem timestamp em ms; sem ele, herda o da linha anterior
+                        if item.get('timestamp'):
+                            last_ts = float(item['timestamp']) / 1000
+                        events.append(('market', last_ts, item))
+    events.sort(key=lambda event: event[1])  # estável: mesma ordem do arquivo para o mesmo instante
+    return events
+
+
+def synthetic_events(snapshots, wallets=1, positions=50, seed=42):
+    """Série sintética: carteiras que entram, aumentam, reduzem e saem de posições a cada 2s"""
+    rng = random.Random(seed)
+    events = []
+    books = {}
+    for w in range(wallets):
+        wallet = f"0x{w:040x}"
+        held = {}
+        for n in range(snapshots // wallets):
+            ts = 1_700_000_000 + n * 2.0
+            for asset in list(held):
+                roll = rng.random()
+                if roll < 0.02:
+                    del held[asset]
+                elif roll < 0.06:
+                    held[asset]['size'] = round(held[asset]['size'] * rng.uniform(0.3, 1.8), 2)
+            while len(held) < positions and rng.random() < 0.5:
+                asset = str(rng.getrandbits(250))
+                price = round(rng.uniform(0.05, 0.95), 2)
+                books[asset] = price
+                held[asset] = {'asset': asset, 'size': round(rng.uniform(10, 2000), 2), 'title': f"Market {asset[:6]}",
+                               'outcome': 'Yes', 'avgPrice': price}
+            for pos in held.values():
+                # Preço anda um pouco a cada snapshot
+                books[pos['asset']] = min(0.99, max(0.01, round(books[pos['asset']] + rng.gauss(0, 0.005), 3)))
+                pos['currentValue'] = pos['size'] * books[pos['asset']]
+            events.append(('snapshot', ts, {'ts': ts, 'wallet': wallet, 'positions': [dict(p) for p in held.values()]}))
+    events.sort(key=lambda event: event[1])
+    return events
+
+
+def configure_bot(args, clob):
+    """Aponta o bot para o ambiente simulado (sem rede, Telegram, histórico ou lote)"""
+    bot.DRY_RUN = False
+    bot.BATCH_ORDERS = False
+    bot.HISTORY_DB = ''
+    bot.TELEGRAM_TOKEN = None
+    bot.MAX_SLIPPAGE = args.max_slippage
+    bot.MAX_CHILD_ORDERS = args.max_children
+    bot.MAX_TRADE_AMOUNT = args.max_amount
+    bot.orderbook_cache = OrderBookCache(ttl=0)  # sempre relê o book simulado do instante atual
+    bot._balance_cache = SimulatedBalance(clob)
+    bot._market_cache = MarketCache()  # só em memória: o replay não grava o market_cache.json real
+    # O bot importa a pilha de trading sob demanda; importa antes para não medir isso na latência
+    import book_walk  # noqa: F401
+    import py_clob_client.clob_types  # noqa: F401
+    import py_clob_client.exceptions  # noqa: F401
+
+
+def run_replay(events, args):
+    clob = SimulatedClob(args.balance, spread=args.spread, depth=args.depth)
+    configure_bot(args, clob)
+    own_positions = SimulatedOwnPositions(clob)
+    targets = {}
+    pending = deque()  # (instante de execução, mudança, preço de referência, instante da detecção)
+    portfolio_values = {}  # valor de cada carteira no último snapshot (SIZING_MODE=portfolio)
+    stats = {'snapshots': 0, 'market_events': 0, 'changes': 0, 'skipped': 0, 'decision_ms': []}
+
+    def execute_due(until):
+        while pending and pending[0][0] <= until:
+            exec_ts, change, ref_price, detected_ts = pending.popleft()
+            clob.context = {'change': change['type'], 'ref_price': ref_price, 'delay': exec_ts - detected_ts,
+                            'best_price': None}
+            book = clob.get_order_book(change['asset'])
+            side_levels = book.asks if change['side'] == 'BUY' else book.bids
+            clob.context['best_price'] = side_levels[0]['price'] if side_levels else None
+            started = time.perf_counter()
+            copy = size_changes([change], args.sizing, max_amount=args.max_amount, own_size=own_positions.size,
+                                bankroll=lambda: clob.cash, portfolio_values=portfolio_values)[0]
+            if copy.skip:
+                stats['skipped'] += 1
+                continue
+            bot.execute_trade(clob, change['asset'], change['side'], change['title'], change['outcome'],
+                              own_positions=own_positions, trade_amount=copy.notional, sell_size=copy.shares)
+            stats['decision_ms'].append((time.perf_counter() - started) * 1000)
+
+    sink = io.StringIO() if not args.verbose else None
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sink) if sink is not None else contextlib.nullcontext():
+        for kind, ts, payload in events:
+            execute_due(ts)
+            if kind == 'market':
+                stats['market_events'] += 1
+                _, touched = apply_market_event(clob.books, payload)
+                for asset_id in touched:
+                    book = clob.books.peek(asset_id)
+                    if book and book.best_bid() and book.best_ask():
+                        clob.marks[asset_id] = (book.best_bid() + book.best_ask()) / 2
+                continue
+
+            stats['snapshots'] += 1
+            wallet = payload['wallet']
+            current = {}
+            for raw in payload['positions']:
+                pos = Position.from_api(raw)
+                current[pos.asset] = pos
+                if pos.size > 0 and pos.current_value > 0 and clob.books.peek(pos.asset) is None:
+                    clob.marks[pos.asset] = pos.current_value / pos.size
+
+            portfolio_values[wallet] = sum(pos.current_value for pos in current.values())
+            target = targets.get(wallet)
+            if target is None:
+                target = targets[wallet] = WalletTarget(wallet, args.amount, positions_file='')
+                if not args.copy_initial:
+                    # Como um bot já em execução: o primeiro snapshot é só a base de comparação
+                    target.last_positions = {asset: pos.state() for asset, pos in current.items()}
+                    continue
+
+            changes = bot.detect_changes(current, target.last_positions, target)
+            target.last_positions = {asset: pos.state() for asset, pos in current.items()}
+            for change in changes:
+                stats['changes'] += 1
+                pos = change['position']
+                ref_price = pos.current_value / pos.size if pos.size > 0 and pos.current_value > 0 \
+                    else clob.marks.get(change['asset'])
+                pending.append((ts + args.delay, change, ref_price, ts))
+        execute_due(math.inf)
+    stats['elapsed'] = time.perf_counter() - started
+    return clob, stats
+
+
+def report(clob, stats, args):
+    fills = clob.fills
+    equity = clob.cash + sum(size * clob.marks.get(asset, 0.0) for asset, size in clob.holdings.items())
+    slippages = []
+    for fill in fills:
+        if fill.get('ref_price'):
+            sign = 1 if fill['side'] == 'BUY' else -1
+            slippages.append(sign * (fill['price'] / fill['ref_price'] - 1))
+    bought = sum(f['size'] * f['price'] for f in fills if f['side'] == 'BUY')
+    sold = sum(f['size'] * f['price'] for f in fills if f['side'] == 'SELL')
+    decisions = sorted(stats['decision_ms'])
+
+    result = {
+        'snapshots': stats['snapshots'],
+        'market_events': stats['market_events'],
+        'snapshots_per_second': stats['snapshots'] / stats['elapsed'] if stats['elapsed'] else 0,
+        'changes': stats['changes'],
+        'skipped': stats['skipped'],
+        'fills': len(fills),
+        'unfilled_orders': sum(1 for f in fills if f['unfilled'] > 1e-9),
+        'copy_delay_s': args.delay,
+        'decision_ms_p50': _percentile(decisions, 0.5),
+        'decision_ms_p95': _percentile(decisions, 0.95),
+        'slippage_mean': statistics.fmean(slippages) if slippages else 0.0,
+        'slippage_p95': _percentile(sorted(slippages), 0.95),
+        'bought_usdc': bought,
+        'sold_usdc': sold,
+        'final_cash': clob.cash,
+        'open_positions': sum(1 for size in clob.holdings.values() if size > 0),
+        'equity': equity,
+        'pnl': equity - args.balance,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return result
+
+    print(f"📼 {result['snapshots']} snapshot(s), {result['market_events']} evento(s) de book em "
+          f"{stats['elapsed']:.2f}s ({result['snapshots_per_second']:.0f} snapshots/s)")
+    print(f"🔍 {result['changes']} mudança(s), {result['skipped']} ignorada(s) pelo dimensionamento → {result['fills']} execução(ões), "
+          f"{result['unfilled_orders']} com sobra não executada")
+    print(f"⏱️ Atraso do copy: {args.delay}s | decisão: p50 {result['decision_ms_p50']:.2f}ms, "
+          f"p95 {result['decision_ms_p95']:.2f}ms")
+    print(f"📐 Slippage vs carteira seguida: média {result['slippage_mean']:.2%}, p95 {result['slippage_p95']:.2%}")
+    print(f"💵 Comprado ${bought:.2f} | Vendido ${sold:.2f} | Caixa ${clob.cash:.2f} | "
+          f"{result['open_positions']} posição(ões) aberta(s)")
+    print(f"📊 Patrimônio ${equity:.2f} | PnL ${result['pnl']:+.2f} ({result['pnl'] / args.balance:+.2%})")
+    return result
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay/backtest da estratégia de copy trade")
+    parser.add_argument('files', nargs='*', help="JSONL de snapshots (SNAPSHOT_RECORD_FILE) e/ou frames (WS_RECORD_FILE)")
+    parser.add_argument('--synthetic', type=int, metavar='N', help="Gera N snapshots sintéticos em vez de ler arquivos")
+    parser.add_argument('--wallets', type=int, default=1, help="Carteiras na série sintética")
+    parser.add_argument('--amount', type=float, default=bot.FIXED_TRADE_AMOUNT, help="USDC por compra copiada")
+    parser.add_argument('--sizing', choices=SIZING_MODES, default=bot.SIZING_MODE, help="Dimensionamento dos copy trades")
+    parser.add_argument('--max-amount', type=float, default=bot.MAX_TRADE_AMOUNT, help="Teto de USDC por compra")
+    parser.add_argument('--max-slippage', type=float, default=bot.MAX_SLIPPAGE)
+    parser.add_argument('--max-children', type=int, default=bot.MAX_CHILD_ORDERS)
+    parser.add_argument('--delay', type=float, default=bot.POLL_INTERVAL, help="Segundos entre o snapshot e a nossa ordem")
+    parser.add_argument('--balance', type=float, default=1000.0, help="USDC inicial simulado")
+    parser.add_argument('--spread', type=float, default=0.02, help="Spread do book sintético")
+    parser.add_argument('--depth', type=float, default=500.0, help="Shares por nível do book sintético")
+    parser.add_argument('--copy-initial', action='store_true', help="Copia também as posições do primeiro snapshot")
+    parser.add_argument('--json', action='store_true', help="Relatório em JSON")
+    parser.add_argument('--verbose', action='store_true', help="Mostra a saída do bot durante o replay")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        events = synthetic_events(args.synthetic, wallets=args.wallets)
+    elif args.files:
+        missing = [path for path in args.files if not os.path.exists(path)]
+        if missing:
+            parser.error(f"arquivo(s) não encontrado(s): {', '.join(missing)}")
+        events = load_events(args.files)
+    else:
+        parser.error("informe arquivos gravados ou --synthetic N")
+
+    clob, stats = run_replay(events, args)
+    report(clob, stats, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Agendador de polling de múltiplas carteiras
+
+Cada rodada consulta todas as carteiras em paralelo (até `max_concurrency` ao mesmo
+tempo) pela sessão HTTP compartilhada; o rate limit global fica em http_client.
+No modo adaptativo, `AdaptiveSchedule` decide quais carteiras entram em cada rodada.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+
+@dataclass
+class WalletTarget:
+    """Carteira seguida, com estado e tamanho de copy trade próprios"""
+    wallet: str
+    trade_amount: float
+    positions_file: str
+    cursor_file: str = ''
+    last_positions: dict = field(default_factory=dict)
+    activity_cursor: dict = None  # usado apenas no modo DETECTION_MODE=activity
+    portfolio_value: float = 0.0  # valor atual das posições (último snapshot), usado pelo SIZING_MODE=portfolio
+    # Resultado da última consulta e agenda do polling adaptativo
+    last_poll_ok: bool = True
+    last_change_count: int = 0
+    poll_interval: float = 0.0
+    next_poll_at: float = 0.0
+    market_activity_at: float = 0.0  # última negociação vista no WebSocket em um asset da carteira (monotonic)
+
+    @property
+    def label(self):
+        return f"{self.wallet[:6]}..."
+
+
+class WalletScheduler:
+    def __init__(self, max_concurrency=8):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._pool = None
+
+    def poll(self, targets, poll_fn):
+        """Executa `poll_fn(target)` para todas as carteiras. Retorna [(target, resultado)] na ordem de entrada."""
+        if len(targets) <= 1:
+            return [(target, poll_fn(target)) for target in targets]
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='poll')
+        futures = [self._pool.submit(poll_fn, target) for target in targets]
+        return [(target, future.result()) for target, future in zip(targets, futures)]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+class AdaptiveSchedule:
+    """Intervalo de polling por carteira conforme a atividade dela.
+
+    Após mudanças o intervalo volta a `min_interval`; cada consulta sem mudança o multiplica
+    por `backoff`, até `max_interval`. Com `budget` (requisições/segundo para polling), cada
+    carteira recebe uma fatia igual do orçamento: quem custa mais requisições por consulta
+    (carteiras grandes, várias páginas) não é consultada mais rápido do que a fatia permite.
+    """
+
+    def __init__(self, min_interval=1.0, max_interval=30.0, backoff=1.5, budget=0.0):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = max(1.0, backoff)
+        self.budget = budget
+
+    def start(self, targets, now):
+        """Primeira rodada escalonada: as carteiras não são consultadas todas no mesmo instante"""
+        for index, target in enumerate(targets):
+            target.poll_interval = self.min_interval
+            target.next_poll_at = now + self.min_interval * index / max(1, len(targets))
+
+    def floor(self, cost, wallets):
+        """Menor intervalo que cabe na fatia do orçamento de uma carteira (`cost` requisições por consulta)"""
+        if not self.budget:
+            return self.min_interval
+        return max(self.min_interval, cost * wallets / self.budget)
+
+    def due(self, targets, now):
+        return [target for target in targets if target.next_poll_at <= now]
+
+    def record(self, target, cost, wallets, now):
+        """Atualiza a agenda de uma carteira depois de consultada"""
+        if target.last_poll_ok and target.last_change_count:
+            interval = self.min_interval
+        elif target.last_poll_ok:
+            interval = min(self.max_interval, (target.poll_interval or self.min_interval) * self.backoff)
+        else:
+            # Falha (rede, 5xx): tenta de novo sem apertar nem relaxar o ritmo
+            interval = target.poll_interval or self.min_interval
+        target.poll_interval = max(interval, self.floor(cost, wallets))
+        target.next_poll_at = now + target.poll_interval
+
+    def tighten(self, targets, now):
+        """Atividade vista fora do polling (ex.: negociação no WebSocket): consulta essas carteiras já"""
+        for target in targets:
+            target.poll_interval = self.min_interval
+            target.next_poll_at = min(target.next_poll_at, now)
+
+    def defer(self, targets, until):
+        """Rate limit da API: ninguém é consultado antes de `until`"""
+        for target in targets:
+            target.next_poll_at = max(target.next_poll_at, until)
+
+    def next_wait(self, targets, now):
+        """Segundos até a próxima carteira vencer"""
+        if not targets:
+            return self.max_interval
+        return max(0.0, min(target.next_poll_at for target in targets) - now)
@@ -0,0 +1,373 @@
+"""
+Simulador local das APIs usadas pelo bot (Data API, CLOB, RPC da Polygon e Telegram)
+
+Um único servidor HTTP atende todos os hosts, para testes de carga sem tocar em produção:
+
+- Data API: `/positions` paginado; carteiras seguidas com N posições que mudam ao longo
+  do tempo (aumentos, reduções, posições novas e fechadas); qualquer outra carteira
+  recebe as nossas posições (compras e vendas executadas aqui)
+- CLOB: `/auth/*`, `/book`, `/books`, `/tick-size`, `/neg-risk`, `/fee-rate`, `/order` e `/orders`
+  (ordens executam na hora, sem validar assinatura)
+- RPC: `eth_call` de `balanceOf` devolve o caixa simulado em USDC
+- Telegram: `/bot<token>/sendMessage` só conta as mensagens
+
+Latência (`--latency-ms`, com jitter) e erros (`--error-rate`: 500 ou 429 com Retry-After)
+são injetados em todas as rotas, menos `/auth`.
+
+    python src/sim_server.py --wallets 2 --positions 10000 --change-rate 2 --port 8900
+    DATA_API_URL=http://127.0.0.1:8900 CLOB_HOST=http://127.0.0.1:8900 \\
+    POLYGON_RPC_URL=http://127.0.0.1:8900 TELEGRAM_API_URL=http://127.0.0.1:8900 \\
+    TARGET_WALLETS=0x0000000000000000000000000000000000000001,... python src/bot.py --daemon
+
+O teste de carga completo (bot + simulador, com relatório) está em benchmarks/bench_load.py.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+USDC_SCALE = 10 ** 6
+
+
+def wallet_address(index):
+    """Endereço determinístico da carteira seguida número `index` (a partir de 1)"""
+    return f"0x{index:040x}"
+
+
+class SimMarket:
+    """Estado do simulador: carteiras seguidas, books, nossas posições e métricas"""
+
+    def __init__(self, wallets=1, positions=1000, balance=10000.0, depth=500.0, spread=0.02, seed=42):
+        self.rng = random.Random(seed)
+        self.depth = depth
+        self.spread = spread
+        self.cash = balance
+        self.holdings = {}  # nossas posições: asset -> shares
+        self.prices = {}    # asset -> preço de referência (meio do book)
+        self.wallets = {}   # carteira -> lista de posições (formato /positions)
+        self._asset_ids = itertools.count(1)
+        self._order_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.pending = {}        # asset -> [publicada_em, servida_em] de mudanças ainda sem ordem
+        self.order_latency = []  # (publicada→ordem, servida→ordem) em segundos
+        self.first_page_requests = 0
+        self.orders = 0
+        self.order_requests = 0
+        self.books_requests = 0  # lotes de /books (prefetch de metadados de mercado)
+        self.telegram_messages = 0
+        self.injected_errors = 0
+        self.changes = 0
+
+        for index in range(1, wallets + 1):
+            self.wallets[wallet_address(index)] = [self._new_position() for _ in range(positions)]
+
+    def _new_position(self):
+        asset = str(10 ** 70 + next(self._asset_ids))  # asset ids do CLOB são inteiros longos em string
+        price = round(self.rng.uniform(0.05, 0.95), 2)
+        size = round(self.rng.uniform(10, 2000), 2)
+        self.prices[asset] = price
+        return {'asset': asset, 'size': size, 'title': f"Sim market {asset[-6:]}", 'outcome': 'Yes',
+                'avgPrice': price, 'currentValue': round(size * price, 4), 'percentPnl': 0.0}
+
+    def initial_state(self, wallet):
+        """Estado no formato de last_positions_<carteira>.json (base para o bot não copiar a carteira inteira)"""
+        with self._lock:
+            return {p['asset']: {'size': p['size'], 'title': p['title'], 'outcome': p['outcome']}
+                    for p in self.wallets[wallet]}
+
+    # --- Mudanças nas carteiras seguidas ---
+
+    def mutate(self):
+        """Aplica uma mudança aleatória numa carteira seguida e marca o asset como pendente de ordem"""
+        with self._lock:
+            positions = self.wallets[self.rng.choice(list(self.wallets))]
+            roll = self.rng.random()
+            if roll < 0.2 or not positions:
+                position = self._new_position()
+                positions.append(position)
+            else:
+                index = self.rng.randrange(len(positions))
+                position = positions[index]
+                if roll < 0.3:
+                    positions[index] = positions[-1]
+                    positions.pop()  # fechada
+                else:
+                    factor = self.rng.uniform(1.2, 2.0) if roll < 0.75 else self.rng.uniform(0.3, 0.8)
+                    position['size'] = round(position['size'] * factor, 2)
+                    position['currentValue'] = round(position['size'] * self.prices[position['asset']], 4)
+            self.pending[position['asset']] = [time.monotonic(), None]
+            self.changes += 1
+
+    # --- Data API ---
+
+    def positions_page(self, user, limit, offset):
+        with self._lock:
+            if user not in self.wallets:
+                return [
+                    {'asset': asset, 'size': size, 'title': f"Sim market {asset[-6:]}", 'outcome': 'Yes',
+                     'avgPrice': self.prices.get(asset, 0.5), 'currentValue': size * self.prices.get(asset, 0.5)}
+                    for asset, size in self.holdings.items() if size > 0
+                ]
+            page = [dict(p) for p in self.wallets[user][offset:offset + limit]]
+            if offset == 0:
+                self.first_page_requests += 1
+            if self.pending:
+                now = time.monotonic()
+                for p in page:
+                    entry = self.pending.get(p['asset'])
+                    if entry is not None and entry[1] is None:
+                        entry[1] = now  # primeira vez que o bot vê a mudança
+            return page
+
+    # --- CLOB ---
+
+    def book(self, asset_id):
+        with self._lock:
+            mid = self.prices.get(asset_id, 0.5)
+        bid = round(max(0.01, mid - self.spread / 2), 2)
+        ask = round(min(0.99, mid + self.spread / 2), 2)
+        return {
+            'market': f"0x{int(asset_id) % 16 ** 8:064x}" if asset_id.isdigit() else '0x0',
+            'asset_id': asset_id,
+            'timestamp': str(int(time.time() * 1000)),
+            'bids': [{'price': f"{bid - i * 0.01:.2f}", 'size': str(self.depth)}
+                     for i in range(5) if bid - i * 0.01 > 0],
+            'asks': [{'price': f"{ask + i * 0.01:.2f}", 'size': str(self.depth)}
+                     for i in range(5) if ask + i * 0.01 < 1],
+            'min_order_size': '5',
+            'tick_size': '0.01',
+            'neg_risk': False,
+            'last_trade_price': f"{mid:.2f}",
+            'hash': '',
+        }
+
+    def fill(self, order):
+        """Executa uma ordem assinada inteira (BUY: maker = USDC; SELL: maker = shares)"""
+        asset = str(order['tokenId'])
+        maker = int(order['makerAmount']) / USDC_SCALE
+        taker = int(order['takerAmount']) / USDC_SCALE
+        side = order['side'] if isinstance(order['side'], str) else ('BUY' if order['side'] == 0 else 'SELL')
+        with self._lock:
+            now = time.monotonic()
+            entry = self.pending.pop(asset, None)
+            if entry is not None:
+                published, served = entry
+                self.order_latency.append((now - published, now - served if served else None))
+            self.orders += 1
+            if side == 'BUY':
+                self.cash -= maker
+                self.holdings[asset] = self.holdings.get(asset, 0.0) + taker
+            else:
+                self.cash += taker
+                self.holdings[asset] = max(0.0, self.holdings.get(asset, 0.0) - maker)
+            order_id = f"0xsim{next(self._order_ids):060x}"
+        return {'success': True, 'errorMsg': '', 'orderID': order_id, 'status': 'matched',
+                'makingAmount': str(maker), 'takingAmount': str(taker)}
+
+    # --- Relatório ---
+
+    def stats(self):
+        with self._lock:
+            return {
+                'changes': self.changes,
+                'changes_without_order': len(self.pending),
+                'first_page_requests': self.first_page_requests,
+                'orders': self.orders,
+                'order_requests': self.order_requests,
+                'books_requests': self.books_requests,
+                'telegram_messages': self.telegram_messages,
+                'injected_errors': self.injected_errors,
+                'order_latency': list(self.order_latency),
+                'cash': self.cash,
+            }
+
+
+def make_handler(market, latency_ms=0.0, error_rate=0.0):
+    rng = random.Random()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, como as APIs reais
+
+        def _reply(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'null') if length else None
+
+        def _inject(self, path):
+            """Latência e erros configurados. Retorna True se já respondeu com erro."""
+            if path.startswith('/auth'):
+                return False
+            if latency_ms:
+                time.sleep(max(0.0, rng.gauss(latency_ms, latency_ms * 0.25)) / 1000)
+            if error_rate and rng.random() < error_rate:
+                with market._lock:
+                    market.injected_errors += 1
+                if rng.random() < 0.5:
+                    self._reply(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+                else:
+                    self._reply(500, {'error': 'injected'})
+                return True
+            return False
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if self._inject(url.path):
+                return
+            if url.path == '/positions':
+                limit = int(query.get('limit', 500))
+                offset = int(query.get('offset', 0))
+                self._reply(200, market.positions_page(query.get('user', '').lower(), limit, offset))
+            elif url.path == '/book':
+                self._reply(200, market.book(query.get('token_id', '')))
+            elif url.path == '/tick-size':
+                self._reply(200, {'minimum_tick_size': 0.01})
+            elif url.path == '/neg-risk':
+                self._reply(200, {'neg_risk': False})
+            elif url.path == '/fee-rate':
+                self._reply(200, {'base_fee': 0})
+            elif url.path == '/auth/derive-api-key':
+                self._reply(200, {'apiKey': 'sim-key', 'secret': 'c2ltLXNlY3JldA==', 'passphrase': 'sim'})
+            elif url.path == '/auth/api-keys':
+                self._reply(200, {'apiKeys': ['sim-key']})
+            elif url.path == '/time':
+                self._reply(200, int(time.time()))
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._body()
+            if self._inject(url.path):
+                return
+            if url.path == '/auth/api-key':
+                self._reply(200, {'apiKey': 'sim-key', 'secret': 'c2ltLXNlY3JldA==', 'passphrase': 'sim'})
+            elif url.path == '/books':
+                with market._lock:
+                    market.books_requests += 1
+                self._reply(200, [market.book(item.get('token_id', '')) for item in body or []])
+            elif url.path == '/order':
+                with market._lock:
+                    market.order_requests += 1
+                self._reply(200, market.fill(body['order']))
+            elif url.path == '/orders':
+                with market._lock:
+                    market.order_requests += 1
+                self._reply(200, [market.fill(item['order']) for item in body])
+            elif url.path.endswith('/sendMessage'):
+                with market._lock:
+                    market.telegram_messages += 1
+                self._reply(200, {'ok': True, 'result': {}})
+            elif isinstance(body, (dict, list)):
+                self._reply(200, self._rpc(body))
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def _rpc(self, request):
+            """JSON-RPC mínimo da Polygon: chainId, blockNumber e eth_call (balanceOf)"""
+            if isinstance(request, list):
+                return [self._rpc(item) for item in request]
+            method = request.get('method')
+            if method == 'eth_call':
+                with market._lock:
+                    result = f"0x{max(0, int(market.cash * USDC_SCALE)):064x}"
+            elif method == 'eth_chainId':
+                result = hex(137)
+            elif method == 'net_version':
+                result = '137'
+            elif method == 'eth_blockNumber':
+                result = hex(int(time.time()))
+            else:
+                result = None
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class SimServer:
+    """Servidor em thread própria; `start_changes` liga o gerador de mudanças nas carteiras"""
+
+    def __init__(self, market, host='127.0.0.1', port=0, latency_ms=0.0, error_rate=0.0):
+        self.market = market
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(market, latency_ms, error_rate))
+        self.httpd.daemon_threads = True
+        self._stop_changes = threading.Event()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='sim-http', daemon=True).start()
+        return self
+
+    def start_changes(self, rate):
+        """Aplica `rate` mudanças por segundo nas carteiras seguidas até `stop_changes`"""
+        if rate <= 0:
+            return
+        self._stop_changes.clear()
+        threading.Thread(target=self._mutate_loop, args=(1.0 / rate,), name='sim-changes', daemon=True).start()
+
+    def stop_changes(self):
+        self._stop_changes.set()
+
+    def _mutate_loop(self, interval):
+        while not self._stop_changes.wait(interval):
+            self.market.mutate()
+
+    def stop(self):
+        self.stop_changes()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local da Data API, CLOB, RPC e Telegram")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--wallets', type=int, default=1, help="Carteiras seguidas simuladas")
+    parser.add_argument('--positions', type=int, default=1000, help="Posições por carteira")
+    parser.add_argument('--change-rate', type=float, default=1.0, help="Mudanças por segundo nas carteiras")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Latência média por requisição")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fração de respostas 429/500")
+    parser.add_argument('--balance', type=float, default=10000.0, help="USDC inicial da nossa carteira")
+    args = parser.parse_args()
+
+    market = SimMarket(args.wallets, args.positions, balance=args.balance)
+    server = SimServer(market, args.host, args.port, args.latency_ms, args.error_rate).start()
+    server.start_changes(args.change_rate)
+    print(f"🧪 Simulador em {server.url}: {args.wallets} carteira(s) x {args.positions} posições, "
+          f"{args.change_rate} mudança(s)/s")
+    print(f"   TARGET_WALLETS={','.join(market.wallets)}")
+    try:
+        while True:
+            time.sleep(10)
+            stats = market.stats()
+            print(f"📊 {stats['changes']} mudança(s), {stats['orders']} ordem(ns), "
+                  f"{stats['telegram_messages']} mensagem(ns), {stats['injected_errors']} erro(s) injetado(s)")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
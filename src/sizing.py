@@ -0,0 +1,109 @@
+"""
+Dimensionamento proporcional dos copy trades
+
+Em vez de comprar sempre FIXED_TRADE_AMOUNT e vender a posição inteira a cada redução,
+o tamanho das nossas ordens acompanha o movimento da carteira seguida:
+
+- `fixed`: compra o valor fixo da carteira; venda zera a nossa posição (comportamento original)
+- `position`: replica a variação relativa da posição dela (aumentou 20% → aumentamos 20%;
+  reduziu 5% → vendemos 5% da nossa). Posições novas entram com o valor fixo.
+- `portfolio`: compra a mesma fração do patrimônio que ela alocou (diff × preço / valor da
+  carteira dela × nossa banca). Vendas como em `position`.
+
+Todas as mudanças de um ciclo são dimensionadas juntas, antes de qualquer ordem: nossas
+posições e a banca são lidas no máximo uma vez, mudanças seguidas do mesmo asset se
+acumulam e as que ficariam abaixo do mínimo de $1 são descartadas sem consultar o book.
+"""
+
+import math
+from dataclasses import dataclass
+
+SIZING_MODES = ('fixed', 'position', 'portfolio')
+MIN_ORDER_VALUE = 1.0  # mínimo do CLOB por ordem (USDC)
+
+
+@dataclass(slots=True)
+class CopySize:
+    """Tamanho do copy trade de uma mudança"""
+    notional: float = None  # BUY: USDC a comprar
+    shares: float = None    # SELL: shares a vender
+    skip: str = None        # motivo para não operar (None = operar)
+
+
+def size_changes(changes, mode='fixed', max_amount=None, own_size=None, bankroll=None, portfolio_values=None):
+    """Dimensiona as mudanças do ciclo, na ordem de detecção. Retorna um CopySize por mudança.
+
+    `own_size(asset)` devolve o tamanho da nossa posição e `bankroll()` a nossa banca em USDC;
+    ambos só são chamados quando o modo precisa deles. `portfolio_values` é o valor atual de
+    cada carteira seguida ({wallet: USDC}), usado no modo `portfolio`.
+    """
+    if mode not in SIZING_MODES:
+        raise ValueError(f"SIZING_MODE inválido: {mode!r} (use {', '.join(SIZING_MODES)})")
+    portfolio_values = portfolio_values or {}
+    held = {}  # nossa posição por asset, já descontadas as mudanças anteriores do ciclo
+    bank = []
+
+    def ours(asset):
+        if asset not in held:
+            held[asset] = own_size(asset) if own_size else 0.0
+        return held[asset]
+
+    def our_bankroll():
+        if not bank:
+            bank.append(bankroll() if bankroll else 0.0)
+        return bank[0]
+
+    sizes = []
+    for change in changes:
+        position = change['position']
+        asset = change['asset']
+        price = _price(position)
+
+        if change['side'] == 'SELL':
+            mine = ours(asset)
+            if mine <= 0:
+                sizes.append(CopySize(skip="sem posição para vender"))
+                continue
+            if mode == 'fixed' or change['type'] == 'CLOSED':
+                shares = mine
+            else:
+                # diff < 0: ela tinha size - diff antes da redução
+                before = position.size - change['diff']
+                shares = mine * min(1.0, -change['diff'] / before) if before > 0 else mine
+            # Arredonda para baixo para não tentar vender mais do que temos
+            shares = math.floor(shares * 100) / 100
+            if shares <= 0 or (shares < mine and price and shares * price < MIN_ORDER_VALUE):
+                sizes.append(CopySize(skip=f"venda de {shares:.2f} shares abaixo do mínimo de ${MIN_ORDER_VALUE:.2f}"))
+                continue
+            held[asset] = mine - shares
+            sizes.append(CopySize(shares=shares))
+            continue
+
+        base = change['trade_amount']
+        # NEW no modo snapshot vem com diff 0: a variação é a posição inteira
+        delta = position.size if change['type'] == 'NEW' else change['diff']
+        notional = base
+        if mode == 'position':
+            before = position.size - delta
+            if before > 0 and price and ours(asset) > 0:
+                notional = ours(asset) * delta / before * price
+        elif mode == 'portfolio':
+            total = portfolio_values.get(change['wallet'])
+            if total and price:
+                notional = delta * price / total * our_bankroll()
+        if max_amount:
+            notional = min(notional, max_amount)
+        if notional < MIN_ORDER_VALUE:
+            sizes.append(CopySize(skip=f"compra de ${notional:.2f} abaixo do mínimo de ${MIN_ORDER_VALUE:.2f}"))
+            continue
+        if price and asset in held:
+            held[asset] += notional / price
+        sizes.append(CopySize(notional=notional))
+    return sizes
+
+
+def _price(position):
+    """Preço por share da carteira seguida (valor atual, senão preço médio)"""
+    if position.size > 0 and position.current_value > 0:
+        return position.current_value / position.size
+    return position.avg_price
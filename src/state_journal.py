@@ -0,0 +1,131 @@
+"""
+Estado das posições como snapshot + journal append-only
+
+O snapshot (`last_positions.json`, mesmo formato de antes) só é reescrito na compactação,
+sempre via arquivo temporário + rename atômico. Entre compactações cada ciclo com mudança
+acrescenta uma linha ao journal (`<snapshot>.journal`) com apenas os assets alterados;
+ciclos sem mudança não escrevem nada.
+
+Na carga o journal é reaplicado sobre o snapshot. Cada linha grava valores absolutos,
+então reaplicar linhas já incorporadas ao snapshot (crash entre o rename e a remoção
+do journal) leva ao mesmo estado; uma última linha incompleta (crash no meio do append)
+é descartada.
+"""
+
+import json
+import os
+
+
+def atomic_write_json(path, data):
+    """Grava JSON em `path` sem nunca deixar um arquivo parcial (tmp + fsync + rename)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class StateJournal:
+    def __init__(self, path, compact_every=100, encode=None, decode=None):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compact_every = compact_every
+        # Conversão registro <-> JSON (padrão: os registros já são dicts)
+        self.encode = encode or (lambda record: record)
+        self.decode = decode or (lambda asset, data: data)
+        self._entries = 0        # linhas no journal desde a última compactação
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
+
+    def load(self):
+        """Snapshot + journal reaplicado (asset -> dados da posição)"""
+        state = {}
+        try:
+            if os.path.exists(self.path):
+                self._snapshot_bytes = os.path.getsize(self.path)
+                with open(self.path, 'r') as f:
+                    raw = json.load(f)
+                # Migração: Se for formato antigo (apenas size), converte
+                if raw and isinstance(next(iter(raw.values())), (int, float)):
+                    print("📦 Migrando formato antigo de posições...")
+                    raw = {}  # Reseta para o novo formato
+                state = {asset: self.decode(asset, data) for asset, data in raw.items()}
+        except Exception as e:
+            print(f"⚠️ Snapshot de posições ilegível ({self.path}): {e}")
+            state = {}
+
+        self._entries = 0
+        self._journal_bytes = 0
+        torn = False
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        if not line.endswith('\n'):
+                            raise ValueError(line)
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Append interrompido: o que veio antes já é o estado exato
+                        print(f"⚠️ Linha incompleta no journal {self.journal_path} descartada")
+                        torn = True
+                        break
+                    apply_entry(state, entry, self.decode)
+                    self._entries += 1
+                    self._journal_bytes += len(line)
+        if torn:
+            # Novos appends não podem continuar depois da linha quebrada
+            self.compact(state)
+        return state
+
+    def save(self, state, previous):
+        """Registra a diferença entre `previous` e `state`. Retorna False se não havia nada a gravar."""
+        entry = diff_states(previous, state)
+        if not entry:
+            return False
+
+        if 'set' in entry:
+            entry = dict(entry, set={asset: self.encode(record) for asset, record in entry['set'].items()})
+        line = json.dumps(entry) + '\n'
+        # Journal maior que o snapshot (ou longo demais para reaplicar): reescrever sai mais barato
+        if self._entries + 1 >= self.compact_every or self._journal_bytes + len(line) > self._snapshot_bytes:
+            self.compact(state)
+            return True
+
+        with open(self.journal_path, 'a') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._entries += 1
+        self._journal_bytes += len(line)
+        return True
+
+    def compact(self, state):
+        """Grava o estado completo como snapshot e descarta o journal"""
+        atomic_write_json(self.path, {asset: self.encode(record) for asset, record in state.items()})
+        self._snapshot_bytes = os.path.getsize(self.path)
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        self._entries = 0
+        self._journal_bytes = 0
+
+
+def diff_states(previous, state):
+    """Linha do journal: {"set": {asset: dados}, "del": [asset]} (vazia se nada mudou)"""
+    changed = {asset: data for asset, data in state.items() if previous.get(asset) != data}
+    removed = [asset for asset in previous if asset not in state]
+    entry = {}
+    if changed:
+        entry['set'] = changed
+    if removed:
+        entry['del'] = removed
+    return entry
+
+
+def apply_entry(state, entry, decode=lambda asset, data: data):
+    for asset, data in entry.get('set', {}).items():
+        state[asset] = decode(asset, data)
+    for asset in entry.get('del', ()):
+        state.pop(asset, None)
@@ -0,0 +1,166 @@
+"""
+Feed push do CLOB via WebSocket (canal `market`)
+
+Assina os assets que as carteiras seguidas possuem, mantém os books locais no
+OrderBookCache (melhor bid/ask sempre atualizado) e avisa via `on_trade` quando há
+negociação em algum deles, para o daemon refazer a checagem de posições sem esperar
+o próximo intervalo de polling.
+"""
+
+import asyncio
+import json
+import threading
+
+from orderbook_cache import OrderBookCache
+
+try:
+    import websockets
+except ImportError:  # dependência opcional: só o modo --push precisa dela
+    websockets = None
+
+CLOB_WS_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+PING_INTERVAL = 10  # o servidor derruba conexões sem "PING" periódico
+RECONNECT_DELAY = 2
+
+
+class MarketFeed:
+    def __init__(self, url=CLOB_WS_URL, on_trade=None, record_path=None, book_cache=None):
+        if websockets is None:
+            raise RuntimeError("Pacote 'websockets' não instalado (pip install websockets)")
+        self.url = url
+        self.on_trade = on_trade        # on_trade(asset_id, evento)
+        self.record_path = record_path  # grava os frames recebidos (JSONL) para replay offline
+
+        self.book_cache = book_cache if book_cache is not None else OrderBookCache()
+
+        self._assets = frozenset()
+        self._thread = None
+        self._loop = None
+        self._resubscribe = None
+        self._stopped = False
+
+    # --- API usada pelo daemon (thread principal) ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._thread_main, name='ws-feed', daemon=True)
+        self._thread.start()
+
+    def set_assets(self, asset_ids):
+        """Atualiza os assets assinados (reconecta só se o conjunto mudou)"""
+        asset_ids = frozenset(a for a in asset_ids if a)
+        if asset_ids == self._assets:
+            return
+        self._assets = asset_ids
+        self._wake_loop()
+
+    def stop(self):
+        self._stopped = True
+        self._wake_loop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _wake_loop(self):
+        if self._loop is not None and self._resubscribe is not None:
+            self._loop.call_soon_threadsafe(self._resubscribe.set)
+
+    # --- Loop asyncio (thread do feed) ---
+
+    def _thread_main(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._resubscribe = asyncio.Event()
+        while not self._stopped:
+            assets = self._assets
+            if not assets:
+                # Nada para assinar: espera o daemon informar os assets
+                await self._resubscribe.wait()
+                self._resubscribe.clear()
+                continue
+
+            self._resubscribe.clear()
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    await ws.send(json.dumps({'assets_ids': sorted(assets), 'type': 'market'}))
+                    print(f"📡 WebSocket conectado ({len(assets)} asset(s))")
+                    await self._session(ws)
+            except Exception as e:
+                if self._stopped:
+                    break
+                print(f"⚠️ WebSocket desconectado: {e}. Reconectando em {RECONNECT_DELAY}s...")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                # Sem conexão os books voltam a expirar por TTL (e ao REST)
+                self.book_cache.set_live(assets, False)
+
+    async def _session(self, ws):
+        """Recebe frames até a conexão cair ou a lista de assets mudar"""
+        async def ping():
+            while True:
+                await asyncio.sleep(PING_INTERVAL)
+                await ws.send("PING")
+
+        async def receive():
+            async for raw in ws:
+                self._handle_frame(raw)
+
+        tasks = [
+            asyncio.create_task(ping()),
+            asyncio.create_task(receive()),
+            asyncio.create_task(self._resubscribe.wait()),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            # Propaga erro de conexão para o loop de reconexão
+            if task.exception() is not None:
+                raise task.exception()
+
+    # --- Processamento dos eventos ---
+
+    def _handle_frame(self, raw):
+        if raw == "PONG":
+            return
+        if self.record_path:
+            with open(self.record_path, 'a') as f:
+                f.write(raw if raw.endswith('\n') else raw + '\n')
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return
+        for event in payload if isinstance(payload, list) else [payload]:
+            self.handle_event(event)
+
+    def handle_event(self, event):
+        event_type, _ = apply_market_event(self.book_cache, event)
+        if event_type == 'last_trade_price' and self.on_trade:
+            self.on_trade(event.get('asset_id'), event)
+
+
+def apply_market_event(book_cache, event):
+    """Aplica um evento do canal `market` ao cache de books (também usado no replay offline).
+
+    Retorna (tipo do evento, assets cujos books mudaram).
+    """
+    event_type = event.get('event_type')
+    if event_type == 'book':
+        asset_id = event.get('asset_id')
+        book_cache.put_snapshot(asset_id, event.get('bids'), event.get('asks'), live=True)
+        return event_type, [asset_id]
+
+    if event_type == 'price_change':
+        # Formato novo: price_changes=[{asset_id, price, size, side}]; antigo: asset_id + changes=[...]
+        changes = event.get('price_changes') or [
+            dict(change, asset_id=event.get('asset_id')) for change in event.get('changes', [])
+        ]
+        touched = []
+        for change in changes:
+            asset_id = change.get('asset_id')
+            book_cache.apply_change(asset_id, change.get('side', ''), change['price'], change['size'])
+            if asset_id not in touched:
+                touched.append(asset_id)
+        return event_type, touched
+
+    return event_type, []
@@ -0,0 +1,95 @@
+"""
+Servidor WebSocket local que reproduz frames gravados do canal `market` do CLOB
+
+Permite exercitar o modo --push offline. Grave frames reais com WS_RECORD_FILE no bot
+(ou escreva um JSONL à mão, um frame por linha) e aponte o bot para este servidor:
+
+    python src/ws_replay_server.py frames.jsonl --port 8765 --delay 0.5
+    CLOB_WS_URL=ws://localhost:8765 python src/bot.py --push
+"""
+
+import argparse
+import asyncio
+import json
+
+import websockets
+
+
+def load_frames(path):
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def filter_frame(raw, assets):
+    """Mantém apenas eventos dos assets assinados (None se não sobrar nenhum)"""
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        return raw
+    events = payload if isinstance(payload, list) else [payload]
+    kept = []
+    for event in events:
+        if 'price_changes' in event:
+            changes = [c for c in event['price_changes'] if c.get('asset_id') in assets]
+            if changes:
+                kept.append(dict(event, price_changes=changes))
+        elif event.get('asset_id') in assets or 'asset_id' not in event:
+            kept.append(event)
+    if not kept:
+        return None
+    return json.dumps(kept if isinstance(payload, list) else kept[0])
+
+
+async def replay(websocket, frames, delay, loop_forever):
+    """Espera a assinatura e envia os frames gravados, respondendo PING com PONG"""
+    subscription = json.loads(await websocket.recv())
+    assets = set(subscription.get('assets_ids', []))
+    print(f"🔌 Cliente assinou {len(assets)} asset(s)")
+
+    async def pong():
+        async for message in websocket:
+            if message == "PING":
+                await websocket.send("PONG")
+
+    pong_task = asyncio.create_task(pong())
+    try:
+        while True:
+            for raw in frames:
+                frame = filter_frame(raw, assets)
+                if frame is not None:
+                    await websocket.send(frame)
+                    await asyncio.sleep(delay)
+            if not loop_forever:
+                break
+        # Mantém a conexão aberta até o cliente sair
+        await pong_task
+    finally:
+        pong_task.cancel()
+
+
+async def serve(frames, host, port, delay, loop_forever):
+    async def handler(websocket, path=None):
+        await replay(websocket, frames, delay, loop_forever)
+
+    async with websockets.serve(handler, host, port):
+        print(f"📼 Reproduzindo {len(frames)} frame(s) em ws://{host}:{port}")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor WebSocket de replay do canal market do CLOB")
+    parser.add_argument('frames', help="Arquivo JSONL com um frame por linha")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.5, help="Segundos entre frames")
+    parser.add_argument('--loop', action='store_true', help="Repete os frames indefinidamente")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(load_frames(args.frames), args.host, args.port, args.delay, args.loop))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# O bot roda como `python src/bot.py`: os módulos se importam pelo nome
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,86 @@
+"""
+plan_order/walk_book (src/book_walk.py): profundidade, slippage, ordens filhas e arredondamento
+"""
+
+import pytest
+
+from book_walk import plan_order, walk_book
+
+
+def test_walk_book_stops_at_target_level():
+    taken, last = walk_book([0.50, 0.51, 0.52], [10, 10, 10], quantity=15)
+    assert last == 1
+    assert taken == [10, 5]
+
+
+def test_walk_book_by_notional_uses_all_levels_when_book_is_short():
+    taken, last = walk_book([0.50, 0.60], [10, 10], notional=100)
+    assert last == 1
+    assert taken == [10, 10]
+
+
+def test_walk_book_empty():
+    assert walk_book([], [], quantity=10) == ([], -1)
+
+
+def test_single_level_buy():
+    plan = plan_order('buy', [0.50, 0.60], [100, 100], notional=10)
+    assert plan.side == 'BUY'
+    assert plan.best_price == 0.50
+    assert plan.filled_size == pytest.approx(20)
+    assert plan.vwap == pytest.approx(0.50)
+    assert plan.limit_price == 0.50
+    assert plan.children == [(0.50, 20.0)]
+    assert plan.unfilled == pytest.approx(0)
+
+
+def test_level_below_minimum_is_merged_into_next_child():
+    # Nível do meio vale $0.51: sozinho ficaria abaixo do mínimo de $1 e vai para a filha seguinte
+    plan = plan_order('BUY', [0.50, 0.51, 0.52], [4, 1, 100], notional=10)
+    assert plan.children == [(0.50, 4.0), (0.52, 15.41)]
+    assert plan.limit_price == 0.52
+    assert plan.vwap == pytest.approx(10 / plan.filled_size)
+
+
+def test_max_children_puts_the_rest_in_the_last_child():
+    plan = plan_order('BUY', [0.50, 0.51, 0.52, 0.53], [10, 10, 10, 10], notional=15, max_children=2)
+    assert len(plan.children) == 2
+    assert plan.children[0] == (0.50, 10.0)
+    # Excedente com o preço limite do nível mais profundo usado
+    assert plan.children[1][0] == plan.limit_price == 0.52
+
+
+def test_buy_sizes_round_up_and_sell_sizes_round_down():
+    buy = plan_order('BUY', [0.30], [100], notional=1.001)
+    assert buy.children == [(0.30, 3.34)]
+    sell = plan_order('SELL', [0.60], [100], quantity=10.555)
+    assert sell.children == [(0.60, 10.55)]
+
+
+def test_order_below_minimum_has_no_children():
+    plan = plan_order('BUY', [0.50], [100], notional=0.5)
+    assert plan.filled_size == pytest.approx(1)
+    assert plan.children == []
+
+
+def test_max_slippage_cuts_buy_levels_and_reports_unfilled():
+    plan = plan_order('BUY', [0.50, 0.52, 0.60], [10, 10, 1000], notional=50, max_slippage=0.05)
+    assert plan.limit_price == 0.52
+    assert plan.filled_size == pytest.approx(20)
+    assert plan.unfilled == pytest.approx(50 - 0.50 * 10 - 0.52 * 10)
+    assert plan.slippage == pytest.approx(plan.vwap / 0.50 - 1)
+
+
+def test_max_slippage_cuts_sell_levels():
+    plan = plan_order('SELL', [0.60, 0.58, 0.50], [10, 10, 1000], quantity=100, max_slippage=0.05)
+    assert plan.limit_price == 0.58
+    assert plan.total_size == pytest.approx(20)
+    assert plan.unfilled == pytest.approx(80)
+    assert plan.slippage == pytest.approx(1 - plan.vwap / 0.60)
+
+
+def test_empty_book():
+    plan = plan_order('SELL', [], [], quantity=10)
+    assert plan.best_price == 0.0
+    assert plan.children == []
+    assert plan.unfilled == 10
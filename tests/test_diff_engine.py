@@ -0,0 +1,95 @@
+"""
+DiffEngine (src/diff_engine.py) contra o diff em dicts do bot, com os mesmos snapshots
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+import bot  # noqa: E402
+from diff_engine import DiffEngine  # noqa: E402
+from positions import Position  # noqa: E402
+from scheduler import WalletTarget  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def memory_market_cache(monkeypatch):
+    # Cache de mercados só em memória e motor novo a cada teste
+    monkeypatch.setattr(bot, 'MARKET_CACHE_FILE', '')
+    monkeypatch.setattr(bot, '_market_cache', None)
+    monkeypatch.setattr(bot, '_diff_engine', None)
+
+
+def _snapshots(positions, seed):
+    """Estado anterior e atual com posições novas, fechadas, alteradas e ruído abaixo de 0.1"""
+    rng = random.Random(seed)
+    last = {f'asset{i}': Position(f'asset{i}', round(rng.uniform(1, 5000), 2), f'Market {i}', 'Yes')
+            for i in range(positions)}
+    current = {asset: Position(asset, pos.size, pos.title, pos.outcome) for asset, pos in last.items()}
+    for n, asset in enumerate(rng.sample(sorted(last), positions // 5)):
+        if n % 5 == 0:
+            del current[asset]
+        elif n % 5 == 1:
+            current[f'new-{asset}'] = Position(f'new-{asset}', 10.0, 'New', 'No')
+        elif n % 5 == 2:
+            current[asset].size += 5.0
+        elif n % 5 == 3:
+            current[asset].size -= 5.0
+        else:
+            current[asset].size += rng.choice((0.05, -0.05, 0.1, -0.1))
+    return last, current
+
+
+def _as_sets(changes, closed):
+    return {(kind, asset, round(diff, 6)) for kind, asset, diff in changes}, set(closed)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_engine_matches_diff_positions(seed):
+    last, current = _snapshots(200, seed)
+    _, changes, closed = DiffEngine(dust=0.1).diff('0xabc', current, last)
+    expected = bot.diff_positions(current, last)
+    assert _as_sets(changes, closed) == _as_sets(*expected)
+    # Mesma ordem do dict atual
+    assert [asset for _, asset, _ in changes] == [asset for _, asset, _ in expected[0]]
+
+
+def test_dust_is_ignored_at_the_threshold():
+    last = {'a': Position('a', 10.0), 'b': Position('b', 10.0), 'c': Position('c', 10.0)}
+    current = {'a': Position('a', 10.1), 'b': Position('b', 9.9), 'c': Position('c', 10.11)}
+    _, changes, closed = DiffEngine(dust=0.1).diff('0xabc', current, last)
+    assert [(kind, asset) for kind, asset, _ in changes] == [('INCREASE', 'c')]
+    assert closed == []
+    assert [(kind, asset) for kind, asset, _ in bot.diff_positions(current, last)[0]] == [('INCREASE', 'c')]
+
+
+def test_detect_changes_is_the_same_with_and_without_engine(monkeypatch):
+    last, current = _snapshots(300, 7)
+    target = WalletTarget('0xabc', 5.0, 'last_positions_0xabc.json')
+
+    def run(min_positions):
+        monkeypatch.setattr(bot, 'VECTOR_DIFF_MIN_POSITIONS', min_positions)
+        changes = bot.detect_changes(current, last, target, next_state=dict(current))
+        return [(c['type'], c['asset'], round(c['diff'], 6), c['side'], c['title'], c['outcome'], c['wallet'])
+                for c in changes]
+
+    vector = run(1)
+    assert bot._diff_engine is not None
+    assert vector == run(0)
+    assert {kind for kind, *_ in vector} == {'NEW', 'INCREASE', 'DECREASE', 'CLOSED'}
+
+
+def test_next_state_reuses_cached_snapshot(monkeypatch):
+    monkeypatch.setattr(bot, 'VECTOR_DIFF_MIN_POSITIONS', 1)
+    engine = bot.get_diff_engine()
+    last, current = _snapshots(50, 3)
+    next_state = dict(current)
+    bot.detect_changes(current, last, next_state=next_state)
+
+    cached_state, cached_snapshot = engine._previous[bot.TARGET_WALLET]
+    assert cached_state is next_state
+    # No ciclo seguinte o "anterior" é o next_state: o snapshot não é reconstruído
+    assert engine._previous_snapshot(bot.TARGET_WALLET, next_state) is cached_snapshot
+    assert bot.detect_changes(dict(current), next_state) == []
@@ -0,0 +1,208 @@
+"""
+OrderBatch (src/order_batch.py): assinatura, envio em lote, repasse por trade e fallback individual
+
+Cliente falso com o WarmOrderBuilder de verdade (chave de teste): as ordens são assinadas no
+processo atual, já que o pool de assinatura nunca é aquecido.
+"""
+
+import pytest
+
+pytest.importorskip('py_clob_client')
+
+from py_clob_client.clob_types import OrderArgs  # noqa: E402
+from py_clob_client.exceptions import PolyApiException  # noqa: E402
+from py_clob_client.signer import Signer  # noqa: E402
+
+import order_batch  # noqa: E402
+from order_batch import MAX_ORDERS_PER_POST, OrderBatch, SigningPool, WarmOrderBuilder  # noqa: E402
+
+KEY = '0x' + '11' * 32
+
+
+class FakeResponse:
+    """Resposta HTTP mínima para PolyApiException"""
+
+    def __init__(self, status_code, error):
+        self.status_code = status_code
+        self.text = error
+
+    def json(self):
+        return {'error': self.text}
+
+
+class FakeClient:
+    def __init__(self):
+        signer = Signer(KEY, 137)
+        self.builder = WarmOrderBuilder(signer, sig_type=0, funder=signer.address())
+        self.batches = []      # ids de cada post_orders
+        self.posted = []       # ids de cada post_order
+        self.known = {}        # id -> status já registrado no CLOB
+        self.batch_error = None
+        self.lookup_error = None
+
+    def get_tick_size(self, token_id):
+        return '0.01'
+
+    def get_neg_risk(self, token_id):
+        return False
+
+    def get_fee_rate_bps(self, token_id):
+        return 0
+
+    def order_id(self, order):
+        return self.builder.order_id(order, False)
+
+    def post_orders(self, args):
+        ids = [self.order_id(arg.order) for arg in args]
+        self.batches.append(ids)
+        if self.batch_error is not None:
+            # O CLOB registrou a primeira ordem antes de a requisição falhar
+            self.known[ids[0]] = 'LIVE'
+            raise self.batch_error
+        return [{'success': True, 'orderID': order_id} for order_id in ids]
+
+    def post_order(self, order):
+        order_id = self.order_id(order)
+        self.posted.append(order_id)
+        return {'success': True, 'orderID': order_id}
+
+    def get_order(self, order_id):
+        if self.lookup_error is not None:
+            raise self.lookup_error
+        if order_id in self.known:
+            return {'id': order_id, 'status': self.known[order_id]}
+        raise PolyApiException(FakeResponse(404, 'not found'))
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+@pytest.fixture
+def batch(client):
+    pool = SigningPool(KEY, 137, 0, client.builder.funder, workers=2)
+    yield OrderBatch(client, pool)
+    # Nunca aquecido: nenhum processo de assinatura foi criado
+    assert pool._pool is None
+
+
+def _orders(count, price=0.50, token_id='1'):
+    return [OrderArgs(token_id=token_id, price=round(price + i / 100, 2), size=10, side='BUY') for i in range(count)]
+
+
+def _add(batch, orders):
+    results = []
+    batch.add(orders, results.extend)
+    return results
+
+
+def test_results_are_sliced_back_to_each_trade(client, batch):
+    first = _add(batch, _orders(2))
+    second = _add(batch, _orders(3, price=0.60))
+    assert len(batch) == 5
+    batch.submit()
+
+    assert len(batch) == 0
+    assert len(client.batches) == 1
+    ids = client.batches[0]
+    assert [resp['orderID'] for resp, _ in first] == ids[:2]
+    assert [resp['orderID'] for resp, _ in second] == ids[2:]
+    assert all(error is None for _, error in first + second)
+
+
+def test_rejected_order_becomes_an_error(client, batch, monkeypatch):
+    monkeypatch.setattr(client, 'post_orders',
+                        lambda args: [{'success': True, 'orderID': 'a'},
+                                      {'success': False, 'errorMsg': 'not enough balance'}])
+    results = _add(batch, _orders(2))
+    batch.submit()
+    assert results[0][1] is None
+    assert str(results[1][1]) == 'not enough balance'
+
+
+def test_single_order_uses_post_order(client, batch):
+    results = _add(batch, _orders(1))
+    batch.submit()
+    assert client.batches == []
+    assert client.posted == [results[0][0]['orderID']]
+
+
+def test_large_batches_are_chunked(client, batch):
+    results = _add(batch, _orders(MAX_ORDERS_PER_POST + 2))
+    batch.submit()
+    assert [len(ids) for ids in client.batches] == [MAX_ORDERS_PER_POST, 2]
+    assert [resp['orderID'] for resp, _ in results] == client.batches[0] + client.batches[1]
+
+
+def test_failed_batch_does_not_repost_orders_the_clob_already_has(client, batch):
+    client.batch_error = TimeoutError('read timeout')
+    results = _add(batch, _orders(3))
+    batch.submit()
+
+    ids = client.batches[0]
+    # A primeira já estava no CLOB; só as outras duas são enviadas individualmente
+    assert sorted(client.posted) == sorted(ids[1:])
+    assert results[0] == ({'success': True, 'orderID': ids[0], 'status': 'LIVE'}, None)
+    assert [resp['orderID'] for resp, _ in results[1:]] == ids[1:]
+    assert all(error is None for _, error in results)
+
+
+def test_failed_lookup_is_an_error_not_a_blind_repost(client, batch):
+    client.batch_error = TimeoutError('read timeout')
+    client.lookup_error = PolyApiException(FakeResponse(500, 'internal error'))
+    results = _add(batch, _orders(2))
+    batch.submit()
+
+    assert client.posted == []
+    assert all(resp is None and isinstance(error, PolyApiException) for resp, error in results)
+
+
+def test_unexpected_batch_response_falls_back(client, batch, monkeypatch):
+    monkeypatch.setattr(client, 'post_orders', lambda args: {'error': 'bad request'})
+    results = _add(batch, _orders(2))
+    batch.submit()
+    assert len(client.posted) == 2
+    assert all(error is None for _, error in results)
+
+
+def test_signing_failure_settles_every_trade(client, batch, monkeypatch):
+    def broken(client, jobs):
+        raise RuntimeError('signer unavailable')
+
+    monkeypatch.setattr(batch.signing_pool, 'sign_all', broken)
+    first = _add(batch, _orders(1))
+    second = _add(batch, _orders(2))
+    batch.submit()
+    assert [str(error) for _, error in first + second] == ['signer unavailable'] * 3
+
+
+def test_invalid_order_signature_only_fails_that_order(client, batch, monkeypatch):
+    signed = order_batch._sign_here
+
+    def one_bad(client, jobs):
+        results = signed(client, jobs)
+        results[0] = (None, ValueError('bad order'))
+        return results
+
+    monkeypatch.setattr(order_batch, '_sign_here', one_bad)
+    results = _add(batch, _orders(3))
+    batch.submit()
+    assert str(results[0][1]) == 'bad order'
+    assert [resp['orderID'] for resp, _ in results[1:]] == client.batches[0]
+
+
+def test_failing_callback_does_not_block_the_others(client, batch):
+    def explode(results):
+        raise KeyError('reservation')
+
+    batch.add(_orders(1), explode)
+    results = _add(batch, _orders(1, price=0.70))
+    batch.submit()
+    assert len(results) == 1 and results[0][1] is None
+
+
+def test_add_rejects_price_outside_the_tick_range(batch):
+    with pytest.raises(ValueError):
+        batch.add([OrderArgs(token_id='1', price=0.995, size=10, side='BUY')], lambda results: None)
+    assert len(batch) == 0
@@ -0,0 +1,125 @@
+"""
+size_changes (src/sizing.py): modos fixed/position/portfolio, mínimos e acumulação no ciclo
+"""
+
+import pytest
+
+from positions import Position
+from sizing import MIN_ORDER_VALUE, size_changes
+
+
+def _change(type_, side, size, diff, asset='asset1', wallet='0xabc', price=0.5, trade_amount=10.0):
+    position = Position(asset, size, 'Market', 'Yes', avg_price=price, current_value=size * price)
+    return {'type': type_, 'asset': asset, 'side': side, 'position': position,
+            'diff': diff, 'wallet': wallet, 'trade_amount': trade_amount}
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        size_changes([], mode='kelly')
+
+
+def test_fixed_buys_trade_amount_and_sells_everything():
+    sizes = size_changes([_change('NEW', 'BUY', 100, 100), _change('CLOSED', 'SELL', 0, -50, asset='asset2')],
+                         own_size=lambda asset: 40.0)
+    assert sizes[0].notional == 10.0
+    assert sizes[1].shares == 40.0
+    assert sizes[1].skip is None
+
+
+def test_fixed_reduction_also_sells_everything():
+    sizes = size_changes([_change('DECREASED', 'SELL', 80, -20)], own_size=lambda asset: 40.0)
+    assert sizes[0].shares == 40.0
+
+
+def test_max_amount_caps_buys():
+    sizes = size_changes([_change('NEW', 'BUY', 100, 100, trade_amount=50.0)], max_amount=20.0)
+    assert sizes[0].notional == 20.0
+
+
+def test_buy_below_minimum_is_skipped():
+    sizes = size_changes([_change('NEW', 'BUY', 100, 100, trade_amount=MIN_ORDER_VALUE / 2)])
+    assert sizes[0].notional is None
+    assert 'abaixo do mínimo' in sizes[0].skip
+
+
+def test_sell_without_position_is_skipped():
+    sizes = size_changes([_change('CLOSED', 'SELL', 0, -50)], own_size=lambda asset: 0.0)
+    assert sizes[0].skip == "sem posição para vender"
+
+
+def test_position_mode_mirrors_relative_change():
+    # Ela foi de 100 para 120 (+20%): compramos 20% dos nossos 50 shares a $0.50
+    sizes = size_changes([_change('INCREASED', 'BUY', 120, 20)], mode='position', own_size=lambda asset: 50.0)
+    assert sizes[0].notional == pytest.approx(50 * 0.2 * 0.5)
+
+
+def test_position_mode_new_position_uses_trade_amount():
+    sizes = size_changes([_change('NEW', 'BUY', 100, 100)], mode='position', own_size=lambda asset: 0.0)
+    assert sizes[0].notional == 10.0
+
+
+def test_position_mode_sells_the_same_fraction_rounded_down():
+    # Ela foi de 100 para 75 (-25%): vendemos 25% dos nossos 33.33 shares
+    sizes = size_changes([_change('DECREASED', 'SELL', 75, -25)], mode='position', own_size=lambda asset: 33.33)
+    assert sizes[0].shares == 8.33
+
+
+def test_partial_sell_below_minimum_is_skipped():
+    sizes = size_changes([_change('DECREASED', 'SELL', 99, -1)], mode='position', own_size=lambda asset: 10.0)
+    assert sizes[0].shares is None
+    assert 'abaixo do mínimo' in sizes[0].skip
+
+
+def test_portfolio_mode_matches_allocated_fraction():
+    # Ela alocou 20 × $0.50 = $10 de uma carteira de $1000 (1%); nossa banca é $500 → $5
+    sizes = size_changes([_change('INCREASED', 'BUY', 120, 20)], mode='portfolio',
+                         bankroll=lambda: 500.0, portfolio_values={'0xabc': 1000.0})
+    assert sizes[0].notional == pytest.approx(5.0)
+
+
+def test_portfolio_mode_without_wallet_value_uses_trade_amount():
+    sizes = size_changes([_change('INCREASED', 'BUY', 120, 20)], mode='portfolio', bankroll=lambda: 500.0)
+    assert sizes[0].notional == 10.0
+
+
+def test_changes_to_the_same_asset_accumulate():
+    # Duas reduções de 50% no mesmo ciclo: a segunda parte do que sobrou da primeira
+    changes = [_change('DECREASED', 'SELL', 50, -50), _change('DECREASED', 'SELL', 25, -25)]
+    sizes = size_changes(changes, mode='position', own_size=lambda asset: 40.0)
+    assert [s.shares for s in sizes] == [20.0, 10.0]
+
+
+def test_buy_then_sell_in_the_same_cycle_counts_the_buy():
+    changes = [_change('INCREASED', 'BUY', 100, 50, wallet='0xa'), _change('CLOSED', 'SELL', 0, -100, wallet='0xb')]
+    sizes = size_changes(changes, mode='position', own_size=lambda asset: 10.0)
+    # +100% dos nossos 10 shares: compra de $5 a $0.50 = 10 shares, e a venda zera os 20
+    assert sizes[0].notional == pytest.approx(5.0)
+    assert sizes[1].shares == 20.0
+
+
+def test_own_size_and_bankroll_are_read_once():
+    calls = {'own': 0, 'bank': 0}
+
+    def own_size(asset):
+        calls['own'] += 1
+        return 50.0
+
+    def bankroll():
+        calls['bank'] += 1
+        return 500.0
+
+    changes = [_change('INCREASED', 'BUY', 120, 20, wallet='0xa'),
+               _change('INCREASED', 'BUY', 140, 20, wallet='0xb'),
+               _change('DECREASED', 'SELL', 100, -40, wallet='0xa')]
+    size_changes(changes, mode='portfolio', own_size=own_size, bankroll=bankroll,
+                 portfolio_values={'0xa': 1000.0, '0xb': 2000.0})
+    assert calls == {'own': 1, 'bank': 1}
+
+
+def test_fixed_mode_never_reads_bankroll():
+    def bankroll():
+        raise AssertionError("banca não deveria ser consultada")
+
+    sizes = size_changes([_change('NEW', 'BUY', 100, 100)], bankroll=bankroll)
+    assert sizes[0].notional == 10.0
@@ -0,0 +1,146 @@
+"""
+StateJournal (src/state_journal.py): carga, reaplicação do journal e compactação
+"""
+
+import json
+import os
+
+from positions import Position
+from state_journal import StateJournal, apply_entry, diff_states
+
+
+def _journal(tmp_path, compact_every=100):
+    return StateJournal(str(tmp_path / 'last_positions.json'), compact_every,
+                        encode=Position.to_state, decode=Position.from_state)
+
+
+def _state(n, size=10.0):
+    return {f"asset{i}": Position(f"asset{i}", size, f"Market {i}", 'Yes') for i in range(n)}
+
+
+def _journal_lines(journal):
+    if not os.path.exists(journal.journal_path):
+        return []
+    with open(journal.journal_path) as f:
+        return f.readlines()
+
+
+def test_first_save_writes_snapshot(tmp_path):
+    journal = _journal(tmp_path)
+    state = _state(3)
+    assert journal.save(state, {}) is True
+    assert not os.path.exists(journal.journal_path)
+    with open(journal.path) as f:
+        assert json.load(f)['asset0'] == {'size': 10.0, 'title': 'Market 0', 'outcome': 'Yes'}
+    assert _journal(tmp_path).load() == state
+
+
+def test_changes_are_appended_and_replayed(tmp_path):
+    journal = _journal(tmp_path)
+    first = _state(20)
+    journal.save(first, {})
+
+    second = dict(first)
+    second['asset1'] = Position('asset1', 25.0, 'Market 1', 'Yes')
+    del second['asset2']
+    assert journal.save(second, first) is True
+    lines = _journal_lines(journal)
+    assert len(lines) == 1
+    assert json.loads(lines[0]) == {'set': {'asset1': {'size': 25.0, 'title': 'Market 1', 'outcome': 'Yes'}},
+                                    'del': ['asset2']}
+
+    # O snapshot fica intacto até a compactação
+    with open(journal.path) as f:
+        assert 'asset2' in json.load(f)
+    assert _journal(tmp_path).load() == second
+
+
+def test_unchanged_state_writes_nothing(tmp_path):
+    journal = _journal(tmp_path)
+    state = _state(5)
+    journal.save(state, {})
+    mtime = os.path.getmtime(journal.path)
+    assert journal.save(_state(5), state) is False
+    assert not os.path.exists(journal.journal_path)
+    assert os.path.getmtime(journal.path) == mtime
+
+
+def test_compact_every_rewrites_snapshot(tmp_path):
+    journal = _journal(tmp_path, compact_every=3)
+    state = _state(20)
+    journal.save(state, {})
+    for size in (11.0, 12.0):
+        new = dict(state, asset0=Position('asset0', size, 'Market 0', 'Yes'))
+        journal.save(new, state)
+        state = new
+    assert len(_journal_lines(journal)) == 2
+
+    new = dict(state, asset0=Position('asset0', 13.0, 'Market 0', 'Yes'))
+    journal.save(new, state)
+    assert not os.path.exists(journal.journal_path)
+    with open(journal.path) as f:
+        assert json.load(f)['asset0']['size'] == 13.0
+
+
+def test_journal_larger_than_snapshot_is_compacted(tmp_path):
+    journal = _journal(tmp_path)
+    state = _state(1)
+    journal.save(state, {})
+    # A linha do journal já passaria do tamanho do snapshot de um asset
+    new = dict(state, asset0=Position('asset0', 11.0, 'Market 0', 'Yes'))
+    journal.save(new, state)
+    assert not os.path.exists(journal.journal_path)
+    assert _journal(tmp_path).load() == new
+
+
+def test_torn_last_line_is_dropped_and_compacted(tmp_path):
+    journal = _journal(tmp_path)
+    first = _state(20)
+    journal.save(first, {})
+    second = dict(first, asset0=Position('asset0', 30.0, 'Market 0', 'Yes'))
+    journal.save(second, first)
+    with open(journal.journal_path, 'a') as f:
+        f.write('{"set": {"asset1": {"si')
+
+    reloaded = _journal(tmp_path)
+    assert reloaded.load() == second
+    assert not os.path.exists(reloaded.journal_path)
+    assert _journal(tmp_path).load() == second
+
+
+def test_replaying_lines_already_in_snapshot_is_idempotent(tmp_path):
+    journal = _journal(tmp_path)
+    first = _state(20)
+    journal.save(first, {})
+    second = dict(first, asset0=Position('asset0', 30.0, 'Market 0', 'Yes'))
+    del second['asset3']
+    journal.save(second, first)
+    lines = _journal_lines(journal)
+
+    # Crash entre o rename do snapshot e a remoção do journal
+    journal.compact(second)
+    with open(journal.journal_path, 'w') as f:
+        f.writelines(lines)
+    assert _journal(tmp_path).load() == second
+
+
+def test_legacy_size_only_format_is_reset(tmp_path):
+    path = tmp_path / 'last_positions.json'
+    path.write_text(json.dumps({'asset0': 10.0, 'asset1': 5.0}))
+    assert _journal(tmp_path).load() == {}
+
+
+def test_unreadable_snapshot_loads_empty(tmp_path):
+    (tmp_path / 'last_positions.json').write_text('{not json')
+    assert _journal(tmp_path).load() == {}
+
+
+def test_diff_and_apply_roundtrip():
+    previous = {'a': {'size': 1}, 'b': {'size': 2}}
+    state = {'a': {'size': 3}, 'c': {'size': 4}}
+    entry = diff_states(previous, state)
+    assert entry == {'set': {'a': {'size': 3}, 'c': {'size': 4}}, 'del': ['b']}
+    replayed = dict(previous)
+    apply_entry(replayed, entry)
+    assert replayed == state
+    assert diff_states(state, dict(state)) == {}
@@ -0,0 +1,149 @@
+"""
+MarketFeed contra o servidor de replay (src/ws_replay_server.py) com frames gravados
+
+Os frames de tests/fixtures/market_frames.jsonl trazem books, price_changes (formato novo
+e antigo) e negociações de dois assets assinados e de um terceiro que o servidor filtra.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+websockets = pytest.importorskip('websockets')
+
+import ws_feed  # noqa: E402
+import ws_replay_server  # noqa: E402
+from orderbook_cache import OrderBookCache  # noqa: E402
+from ws_feed import MarketFeed  # noqa: E402
+
+FRAMES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'market_frames.jsonl')
+ASSETS = {'101', '202'}
+
+
+class ReplayServer:
+    """Servidor WebSocket numa thread própria; `handler(websocket)` atende cada conexão"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.connections = 0
+        self.port = None
+        self._ready = threading.Event()
+        self._loop = None
+        self._stop = None
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), daemon=True)
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = self._loop.create_future()
+
+        async def handle(websocket, path=None):
+            self.connections += 1
+            await self.handler(websocket, self.connections)
+
+        async with websockets.serve(handle, '127.0.0.1', 0) as server:
+            self.port = next(iter(server.sockets)).getsockname()[1]
+            self._ready.set()
+            await self._stop
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._thread.start()
+        assert self._ready.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._stop.set_result, None)
+        self._thread.join(5)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def run_feed(url, tmp_path=None):
+    trades = []
+    feed = MarketFeed(url, on_trade=lambda asset_id, event: trades.append((asset_id, event['price'])),
+                      record_path=str(tmp_path / 'frames.jsonl') if tmp_path else None,
+                      book_cache=OrderBookCache(ttl=0))
+    feed.set_assets(ASSETS)
+    feed.start()
+    return feed, trades
+
+
+def assert_books(cache):
+    first, second = cache.get('101'), cache.get('202')
+    # Books ao vivo não expiram, mesmo com ttl=0
+    assert first is not None and first.live
+    assert (first.best_bid(), first.best_ask()) == (0.49, 0.53)
+    assert first.depth('BUY') == ([0.53], [300.0])
+    assert (second.best_bid(), second.best_ask()) == (0.31, 0.35)
+    assert cache.peek('999') is None
+
+
+def test_replayed_frames_update_books_and_report_trades(tmp_path):
+    frames = ws_replay_server.load_frames(FRAMES)
+
+    async def handler(websocket, connection):
+        await ws_replay_server.replay(websocket, frames, delay=0, loop_forever=False)
+
+    with ReplayServer(handler) as server:
+        feed, trades = run_feed(server.url, tmp_path)
+        try:
+            assert wait_for(lambda: len(trades) >= 2)
+            assert_books(feed.book_cache)
+        finally:
+            feed.stop()
+
+    assert trades == [('101', '0.52'), ('202', '0.30')]
+    # Frames gravados para replay: só os que o servidor enviou (o asset 999 foi filtrado)
+    with open(tmp_path / 'frames.jsonl') as f:
+        recorded = [line for line in f if line.strip()]
+    assert len(recorded) == 6
+    assert all('"999"' not in line for line in recorded)
+
+
+def test_feed_reconnects_and_books_expire_while_disconnected(monkeypatch):
+    monkeypatch.setattr(ws_feed, 'RECONNECT_DELAY', 0.05)
+    frames = ws_replay_server.load_frames(FRAMES)
+    dropped = threading.Event()
+    resume = threading.Event()
+
+    async def handler(websocket, connection):
+        if connection == 1:
+            # Primeira conexão: só o primeiro book, depois cai
+            await websocket.recv()
+            await websocket.send(frames[0])
+            await asyncio.sleep(0.1)
+            await websocket.close()
+            dropped.set()
+            return
+        while not resume.is_set():
+            await asyncio.sleep(0.01)
+        await ws_replay_server.replay(websocket, frames, delay=0, loop_forever=False)
+
+    with ReplayServer(handler) as server:
+        feed, trades = run_feed(server.url)
+        try:
+            assert dropped.wait(5)
+            # Sem conexão o book deixa de ser mantido pelo WebSocket e volta a expirar por TTL
+            assert wait_for(lambda: feed.book_cache.peek('101') is not None and not feed.book_cache.peek('101').live)
+            assert feed.book_cache.get('101') is None
+            resume.set()
+            assert wait_for(lambda: len(trades) >= 2)
+            assert server.connections >= 2
+            assert_books(feed.book_cache)
+        finally:
+            feed.stop()
+
+    assert trades == [('101', '0.52'), ('202', '0.30')]